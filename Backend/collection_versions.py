@@ -0,0 +1,369 @@
+"""
+Vector Collection Versioning
+Blue/green versions of the vector collection (module_vectors_v{n}) behind an alias document.
+Readers resolve the alias to the active collection; ingestion builds the next version
+off to the side and `promote` flips the alias with one atomic update.
+
+Retention: promoting drops every version except the active one, the previous one (the
+rollback target) and unpromoted builds newer than the active one; an unpromoted build
+is where the next ingestion run continues (see pending_version).
+
+Each collection records the layout it was built with (collection_settings), e.g. whether
+it carries 256/512-dim first-pass vectors for two-pass search or passage chunk documents,
+so readers follow whatever version the alias points at.
+
+Usage:
+    python -m Backend.collection_versions status
+    python -m Backend.collection_versions promote [--version N] [--force]
+    python -m Backend.collection_versions rollback
+    python -m Backend.collection_versions drop --version N
+    python -m Backend.collection_versions prune
+"""
+import os
+import re
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.operations import SearchIndexModel
+from Backend.vector_codec import VECTOR_STORAGE
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTOR_ALIAS = os.getenv("VECTOR_COLLECTION_ALIAS", "module_vectors")
+ALIAS_COLLECTION = os.getenv("COLLECTION_ALIASES", "collection_aliases")
+SETTINGS_COLLECTION = os.getenv("COLLECTION_SETTINGS", "collection_settings")
+VECTOR_INDEX_NAME = "vector_index"
+EMBEDDING_DIMENSIONS = 1024
+# Optional low-dimension first-pass vectors for two-pass search, written at ingestion:
+# 0 (off) | 256 | 512, either "truncate"d from the 1024-dim vector or "native" Titan output
+SHORT_EMBEDDING_FIELD = "embedding_short"
+SHORT_EMBEDDING_DIMENSIONS = int(os.getenv("SHORT_EMBEDDING_DIMENSIONS", "0"))
+SHORT_EMBEDDING_MODE = os.getenv("SHORT_EMBEDDING_MODE", "truncate").lower()
+# Fields usable in $vectorSearch.filter (pre_filters)
+FILTER_FIELDS = ["source", "module_name", "category", "level"]
+# Atlas-side quantization of float vectors in the index (none | scalar | binary);
+# not applicable when vectors are already stored as int8 (VECTOR_STORAGE=int8)
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none").lower()
+
+
+def version_name(version: int, alias: str = VECTOR_ALIAS) -> str:
+    """Collection name for a version; version 0 is the legacy unversioned collection."""
+    return alias if version == 0 else f"{alias}_v{version}"
+
+
+def resolve_active(db, alias: str = VECTOR_ALIAS) -> Tuple[str, int]:
+    """
+    Resolve the alias to (collection_name, version).
+    Without an alias document the legacy unversioned collection is active (version 0).
+    """
+    doc = db[ALIAS_COLLECTION].find_one({"_id": alias})
+    if not doc:
+        return alias, 0
+    return doc["active"], int(doc.get("version", 0))
+
+
+def list_versions(db, alias: str = VECTOR_ALIAS) -> List[int]:
+    """Existing version numbers, ascending."""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    return sorted(
+        int(match.group(1))
+        for match in (pattern.match(name) for name in db.list_collection_names())
+        if match
+    )
+
+
+def next_version(db, alias: str = VECTOR_ALIAS) -> int:
+    return max(list_versions(db, alias) + [resolve_active(db, alias)[1]]) + 1
+
+
+def _live_versions(db, alias: str) -> Tuple[int, Optional[int]]:
+    """(active version, previous version or None) recorded in the alias document."""
+    doc = db[ALIAS_COLLECTION].find_one({"_id": alias}) or {}
+    previous = doc.get("previous_version")
+    return int(doc.get("version", 0)), int(previous) if previous is not None else None
+
+
+def pending_version(db, alias: str = VECTOR_ALIAS) -> Optional[int]:
+    """
+    Newest version built after the active one and never promoted (a failed or interrupted
+    build, or one awaiting promotion). Ingestion continues in it instead of cloning again,
+    so the documents it already upserted are kept.
+    """
+    active, previous = _live_versions(db, alias)
+    pending = [v for v in list_versions(db, alias) if v > active and v != previous]
+    return pending[-1] if pending else None
+
+
+def ingestion_settings() -> Dict[str, Any]:
+    """Embedding layout the current environment ingests with."""
+    if SHORT_EMBEDDING_DIMENSIONS not in (0, 256, 512):
+        raise ValueError(f"[VERSIONS_ERR] SHORT_EMBEDDING_DIMENSIONS must be 0, 256 or 512, got {SHORT_EMBEDDING_DIMENSIONS}")
+    if SHORT_EMBEDDING_MODE not in ("truncate", "native"):
+        raise ValueError(f"[VERSIONS_ERR] SHORT_EMBEDDING_MODE must be truncate or native, got {SHORT_EMBEDDING_MODE}")
+    return {
+        "dimensions": EMBEDDING_DIMENSIONS,
+        "short_dimensions": SHORT_EMBEDDING_DIMENSIONS,
+        "short_mode": SHORT_EMBEDDING_MODE,
+        "chunks": True  # knowledge_base_chunk documents next to every topic document
+    }
+
+
+def get_collection_settings(db, name: str) -> Dict[str, Any]:
+    """
+    Recorded layout of a collection; collections without a record are 1024-dim only and
+    hold topic documents only (ingested before passage chunks, or never fully synced).
+    """
+    settings = {"dimensions": EMBEDDING_DIMENSIONS, "short_dimensions": 0, "short_mode": "truncate", "chunks": False}
+    doc = db[SETTINGS_COLLECTION].find_one({"_id": name}) or {}
+    settings.update({key: doc[key] for key in settings if key in doc})
+    return settings
+
+
+def save_collection_settings(db, name: str, settings: Dict[str, Any]):
+    """Record the layout `name` was (re)built with; done after a successful sync."""
+    db[SETTINGS_COLLECTION].update_one(
+        {"_id": name},
+        {"$set": {**settings, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"[VERSIONS] {name} settings: {settings}")
+
+
+def vector_index_model(short_dimensions: int = 0) -> SearchIndexModel:
+    """
+    Atlas Vector Search index definition shared by every version.
+    Works for BinData float32/int8 and legacy array vectors alike; cosine keeps per-vector
+    int8 scales irrelevant. With `short_dimensions` the first-pass field is indexed too.
+    """
+    vector_field: Dict[str, Any] = {
+        "type": "vector",
+        "path": "embedding",
+        "numDimensions": EMBEDDING_DIMENSIONS,
+        "similarity": "cosine"
+    }
+    if VECTOR_INDEX_QUANTIZATION in ("scalar", "binary") and VECTOR_STORAGE != "int8":
+        vector_field["quantization"] = VECTOR_INDEX_QUANTIZATION
+    fields: List[Dict[str, Any]] = [vector_field]
+    if short_dimensions:
+        fields.append({
+            "type": "vector",
+            "path": SHORT_EMBEDDING_FIELD,
+            "numDimensions": short_dimensions,
+            "similarity": "cosine"
+        })
+    fields += [{"type": "filter", "path": path} for path in FILTER_FIELDS]
+    return SearchIndexModel(definition={"fields": fields}, name=VECTOR_INDEX_NAME, type="vectorSearch")
+
+
+def _indexed_short_dimensions(index: Dict[str, Any]) -> int:
+    fields = (index.get("latestDefinition") or index.get("definition") or {}).get("fields", [])
+    return next((f.get("numDimensions", 0) for f in fields if f.get("path") == SHORT_EMBEDDING_FIELD), 0)
+
+
+def ensure_vector_index(collection, short_dimensions: int = 0) -> bool:
+    """
+    Create the vector search index on `collection` if it does not exist yet, or update it
+    when the first-pass field differs (Atlas keeps serving the old definition while rebuilding).
+    """
+    try:
+        existing = next(
+            (index for index in collection.list_search_indexes() if index.get("name") == VECTOR_INDEX_NAME),
+            None
+        )
+        model = vector_index_model(short_dimensions)
+        if existing is None:
+            collection.create_search_index(model)
+            logger.info(f"[VERSIONS] Creating {VECTOR_INDEX_NAME} on {collection.name}")
+        elif _indexed_short_dimensions(existing) != short_dimensions:
+            collection.update_search_index(VECTOR_INDEX_NAME, model.document["definition"])
+            logger.info(f"[VERSIONS] Updating {VECTOR_INDEX_NAME} on {collection.name} ({SHORT_EMBEDDING_FIELD}={short_dimensions})")
+        return True
+    except Exception as e:
+        logger.error(f"[VERSIONS_ERR] Could not create search index on {collection.name}: {e}")
+        return False
+
+
+def index_queryable(collection) -> bool:
+    try:
+        return any(
+            index.get("name") == VECTOR_INDEX_NAME and index.get("queryable")
+            for index in collection.list_search_indexes(VECTOR_INDEX_NAME)
+        )
+    except Exception as e:
+        logger.warning(f"[VERSIONS] Could not read search index status for {collection.name}: {e}")
+        return False
+
+
+def wait_until_queryable(collection, timeout: float = 600, poll_seconds: float = 10) -> bool:
+    """Block until the search index has finished its initial build."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if index_queryable(collection):
+            logger.info(f"[VERSIONS] {collection.name}.{VECTOR_INDEX_NAME} is queryable")
+            return True
+        time.sleep(poll_seconds)
+    logger.error(f"[VERSIONS_ERR] {collection.name}.{VECTOR_INDEX_NAME} not queryable after {timeout}s")
+    return False
+
+
+def clone_collection(db, source: str, target: str) -> int:
+    """
+    Server-side copy of `source` into a fresh `target` collection ($out), so the next
+    version starts from the active data and incremental ingestion only re-embeds changes.
+    The recorded settings are copied too: the clone has the same layout until a full sync.
+    """
+    if source not in db.list_collection_names():
+        logger.info(f"[VERSIONS] {source} does not exist, {target} starts empty")
+        return 0
+    db[source].aggregate([{"$match": {}}, {"$out": target}])
+    recorded = db[SETTINGS_COLLECTION].find_one({"_id": source})
+    if recorded:
+        recorded.pop("_id")
+        recorded.pop("updated_at", None)
+        save_collection_settings(db, target, recorded)
+    count = db[target].estimated_document_count()
+    logger.info(f"[VERSIONS] Cloned {count} documents {source} -> {target}")
+    return count
+
+
+def promote(db, version: int, alias: str = VECTOR_ALIAS, force: bool = False) -> bool:
+    """
+    Atomically point the alias at `version`; the previously active version is kept for rollback.
+    Refuses empty collections or ones whose vector index is not queryable unless `force`.
+    """
+    target = version_name(version, alias)
+    if target not in db.list_collection_names():
+        logger.error(f"[VERSIONS_ERR] {target} does not exist")
+        return False
+    if not force:
+        if db[target].estimated_document_count() == 0:
+            logger.error(f"[VERSIONS_ERR] {target} is empty")
+            return False
+        if not index_queryable(db[target]):
+            logger.error(f"[VERSIONS_ERR] {target}.{VECTOR_INDEX_NAME} is not queryable yet")
+            return False
+
+    current, current_version = resolve_active(db, alias)
+    if current == target:
+        logger.info(f"[VERSIONS] {alias} already points at {target}")
+        return True
+
+    db[ALIAS_COLLECTION].update_one(
+        {"_id": alias},
+        {"$set": {
+            "active": target,
+            "version": version,
+            "previous": current,
+            "previous_version": current_version,
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+    logger.info(f"✅ [VERSIONS] {alias}: {current} (v{current_version}) -> {target} (v{version})")
+    return True
+
+
+def drop_version(db, version: int, alias: str = VECTOR_ALIAS) -> bool:
+    """
+    Drop a version with its search index and recorded settings.
+    Refuses the legacy collection and the active and previous (rollback) versions.
+    """
+    if version == 0 or version in _live_versions(db, alias):
+        logger.error(f"[VERSIONS_ERR] Refusing to drop v{version} of {alias}: it is live or the rollback target")
+        return False
+    name = version_name(version, alias)
+    db.drop_collection(name)
+    db[SETTINGS_COLLECTION].delete_one({"_id": name})
+    logger.warning(f"[VERSIONS] Dropped {name}")
+    return True
+
+
+def prune_versions(db, alias: str = VECTOR_ALIAS) -> List[int]:
+    """
+    Drop every version except the active one, the previous one and unpromoted builds newer
+    than the active one, so each promotion does not leave a collection and search index behind.
+    Returns the dropped versions.
+    """
+    active, previous = _live_versions(db, alias)
+    stale = [v for v in list_versions(db, alias) if v < active and v != previous]
+    return [v for v in stale if drop_version(db, v, alias)]
+
+
+def rollback(db, alias: str = VECTOR_ALIAS) -> bool:
+    """Swap the alias back to the previously active version."""
+    doc = db[ALIAS_COLLECTION].find_one({"_id": alias})
+    if not doc or "previous_version" not in doc:
+        logger.error(f"[VERSIONS_ERR] No previous version recorded for {alias}")
+        return False
+    return promote(db, int(doc["previous_version"]), alias, force=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI: show status, promote or roll back the vector collection alias, drop old versions."""
+    import argparse
+    from Backend.mongodb_client import MongoDBClient
+
+    arg_parser = argparse.ArgumentParser(description="Manage blue/green vector collection versions")
+    arg_parser.add_argument("--alias", default=VECTOR_ALIAS)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the active version and all existing versions")
+    promote_parser = commands.add_parser("promote", help="Point the alias at a version (default: newest)")
+    promote_parser.add_argument("--version", type=int, default=None)
+    promote_parser.add_argument("--force", action="store_true", help="Skip the emptiness and index checks")
+    promote_parser.add_argument("--keep-old", action="store_true", help="Do not drop versions older than the previous one")
+    commands.add_parser("rollback", help="Point the alias back at the previous version")
+    drop_parser = commands.add_parser("drop", help="Drop a version that is neither active nor previous")
+    drop_parser.add_argument("--version", type=int, required=True)
+    commands.add_parser("prune", help="Drop all versions except the active, previous and pending ones")
+    args = arg_parser.parse_args(argv)
+
+    mongo_client = MongoDBClient()
+    db = mongo_client.db
+    try:
+        if args.command == "status":
+            active, version = resolve_active(db, args.alias)
+            logger.info(f"[VERSIONS] {args.alias} -> {active} (v{version})")
+            _, previous = _live_versions(db, args.alias)
+            pending = pending_version(db, args.alias)
+            roles = {version: " (active)", previous: " (previous)", pending: " (pending)"}
+            for v in list_versions(db, args.alias):
+                name = version_name(v, args.alias)
+                settings = get_collection_settings(db, name)
+                short = f"{settings['short_dimensions']}/{settings['short_mode']}" if settings["short_dimensions"] else "off"
+                logger.info(
+                    f"  v{v}: {name} docs={db[name].estimated_document_count()} short={short} chunks={settings['chunks']} "
+                    f"queryable={index_queryable(db[name])}{roles.get(v, '')}"
+                )
+            return 0
+
+        if args.command == "promote":
+            versions = list_versions(db, args.alias)
+            version = args.version if args.version is not None else (versions[-1] if versions else None)
+            if version is None:
+                logger.error(f"[VERSIONS_ERR] No versions of {args.alias} exist")
+                return 1
+            if not promote(db, version, args.alias, force=args.force):
+                return 1
+            if not args.keep_old:
+                prune_versions(db, args.alias)
+            return 0
+
+        if args.command == "drop":
+            return 0 if drop_version(db, args.version, args.alias) else 1
+
+        if args.command == "prune":
+            logger.info(f"[VERSIONS] Dropped {len(prune_versions(db, args.alias))} old versions")
+            return 0
+
+        return 0 if rollback(db, args.alias) else 1
+    finally:
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
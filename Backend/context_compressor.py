@@ -0,0 +1,93 @@
+"""
+Context Compressor
+Query-focused extractive compression of KB content. Ingestion stores each KB document's
+passages with their embeddings; at query time the passages are scored against the
+query vector with one NumPy matrix-vector product and only the best ones are kept.
+
+Lists are never compressed: the prompt requires every item of an enumeration to appear,
+and dropping passages would drop items.
+"""
+import os
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from Backend.text_splitter import estimate_tokens, is_enumeration, split_passages
+from Backend.vector_codec import decode_matrix
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# KB documents repeat across requests; the list check runs once per distinct content
+_is_list = lru_cache(maxsize=1024)(is_enumeration)
+
+
+def build_passages(content: str, embedding_client, max_tokens: int = 80) -> List[Dict[str, Any]]:
+    """
+    Split KB content into passages and embed each one (ingestion side).
+
+    Returns:
+        List of {"text", "embedding"} dicts; passages that fail to embed are skipped
+    """
+    passages = []
+    for text in split_passages(content, max_tokens=max_tokens):
+        embedding = embedding_client.generate_embedding(text)
+        if embedding:
+            passages.append({"text": text, "embedding": embedding})
+    return passages
+
+
+class ExtractiveCompressor:
+    """Selects the passages of a document most relevant to the query vector."""
+
+    def __init__(self):
+        self.enabled = os.getenv("CONTEXT_COMPRESSION_ENABLED", "true").lower() == "true"
+        self.max_passages = int(os.getenv("COMPRESSION_MAX_PASSAGES", "4"))
+        # Short documents are sent whole; compressing them saves little
+        self.min_tokens = int(os.getenv("COMPRESSION_MIN_TOKENS", "300"))
+
+    def compressible(self, content: str) -> bool:
+        """
+        True if `content` may be compressed: long enough and not a list.
+        Checked before passages are fetched, so documents sent whole cost no extra reads.
+        """
+        return self.enabled and estimate_tokens(content) >= self.min_tokens and not _is_list(content)
+
+    def compress(
+        self,
+        content: str,
+        passages: Optional[List[Dict[str, Any]]],
+        query_embedding: Optional[List[float]]
+    ) -> Tuple[str, bool]:
+        """
+        Compress one document's content.
+
+        Args:
+            content: Full document content (returned unchanged if not compressible)
+            passages: Stored passages with embeddings
+            query_embedding: Query vector already computed for retrieval
+
+        Returns:
+            (text, compressed) where compressed is False if the full content was kept
+        """
+        if (
+            not passages
+            or query_embedding is None
+            or len(passages) <= self.max_passages
+            or not self.compressible(content)
+        ):
+            return content, False
+
+        try:
+            matrix = decode_matrix(p["embedding"] for p in passages)
+            query_vec = np.asarray(query_embedding, dtype=np.float32)
+            scores = matrix @ query_vec
+            # Top passages by score, re-ordered by position to keep the text readable
+            top = np.sort(np.argpartition(-scores, self.max_passages - 1)[: self.max_passages])
+            return " ".join(passages[i]["text"] for i in top), True
+        except Exception as e:
+            logger.warning(f"[COMPRESS] Falling back to full content: {e}")
+            return content, False
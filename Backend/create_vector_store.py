@@ -3,13 +3,33 @@
 Vector Store Creation Script
 Ingests KB JSON and presentation.json, generates embeddings, and populates MongoDB.
 Handles both knowledge base and presentation prompts in unified collection.
+Incremental: documents carry a stable doc_key and a content_hash; unchanged documents
+are not re-embedded, changed ones are upserted and removed ones deleted.
+Streaming: sources are turned into lazy job generators and fed through IngestionPipeline
+(parse -> concurrent embed -> batched bulk_write).
+
+Usage: python -m Backend.create_vector_store --manifest ingestion_manifest.json [--modules module1_kb]
+                                            [--promote | --in-place]
+Sources listed in the manifest are ingested in parallel worker processes. By default the
+active collection is cloned into module_vectors_v{n+1}, synced there and only served after
+promotion (blue/green), so readers never see a half-written KB. A version whose sync fails
+is kept unpromoted and the next run resumes in it; a fresh clone that no source changed is
+dropped again. Promotion drops versions older than the previous one. --in-place syncs the
+live collection directly (the pre-versioning behaviour).
+--snapshot DIR exports the synced KB vectors for offline local-index bootstrapping.
 """
 import os
 import json
+import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
 from Backend.embedding_client import BedrockEmbeddingClient
 from Backend.mongodb_client import MongoDBClient
+from Backend import collection_versions
+from Backend.ingestion_pipeline import IngestionPipeline, embed_job
+from Backend.local_vector_index import export_collection_snapshot
+from Backend.text_splitter import chunk_structured
+from Backend.vector_codec import VECTOR_STORAGE
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +38,47 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Bump when the document layout or embedding text changes so every document is re-embedded
+INGESTION_SCHEMA_VERSION = 1
+
+
+def make_parent_key(module_name: str, topic: str) -> str:
+    """Stable back-reference from passage chunks to their parent topic document."""
+    return f"{module_name}:{topic}"
+
+
+def compute_content_hash(payload: Any, embedding_client: BedrockEmbeddingClient) -> str:
+    """Hash of everything that determines a document's stored text and embedding."""
+    hashed = {
+        "schema": INGESTION_SCHEMA_VERSION,
+        "model": getattr(embedding_client, "model_id", ""),
+        "storage": VECTOR_STORAGE,
+        "payload": payload
+    }
+    if collection_versions.SHORT_EMBEDDING_DIMENSIONS:
+        # Only when enabled, so collections without first-pass vectors keep their hashes
+        hashed["short"] = [collection_versions.SHORT_EMBEDDING_DIMENSIONS, collection_versions.SHORT_EMBEDDING_MODE]
+    data = json.dumps(
+        hashed,
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _is_unchanged(
+    doc_key: str,
+    content_hash: str,
+    existing_hashes: Optional[Dict[str, str]],
+    current_keys: Optional[Set[str]]
+) -> bool:
+    """Record the key as present in this run and report whether its stored hash matches."""
+    if current_keys is not None:
+        current_keys.add(doc_key)
+    return bool(existing_hashes) and existing_hashes.get(doc_key) == content_hash
+
+
 def load_json_file(file_path: str) -> Any:
     """Load any JSON file."""
     try:
@@ -70,17 +131,25 @@ def extract_presentation_keywords(prompt: Dict[str, Any]) -> List[str]:
     return keywords
 
 
-def create_presentation_documents(
+def iter_presentation_jobs(
     presentation_json: Dict[str, Any],
-    embedding_client: BedrockEmbeddingClient
-) -> List[Dict[str, Any]]:
+    embedding_client: BedrockEmbeddingClient,
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None
+) -> Iterator[Dict[str, Any]]:
     """
-    Convert presentation.json prompts into MongoDB documents with embeddings.
+    Yield ingestion jobs (document + text to embed) for presentation.json prompts.
+    Prompts whose content_hash matches existing_hashes are skipped (not re-embedded).
     """
-    documents = []
     prompts = presentation_json.get('prompts', [])
     
     for idx, prompt in enumerate(prompts):
+        doc_key = f"presentation:{prompt.get('title', '')}"
+        content_hash = compute_content_hash(prompt, embedding_client)
+        if _is_unchanged(doc_key, content_hash, existing_hashes, current_keys):
+            logger.info(f"[PRESENTATION] Unchanged {idx+1}/{len(prompts)}: {prompt.get('title')}")
+            continue
+        
         logger.info(f"[PRESENTATION] Processing {idx+1}/{len(prompts)}: {prompt.get('title')}")
         
         # Extract response content for embedding
@@ -107,13 +176,6 @@ def create_presentation_documents(
         
         embedding_text = "\n".join(embedding_parts)
         
-        # Generate embedding
-        embedding = embedding_client.generate_embedding(embedding_text)
-        
-        if not embedding:
-            logger.warning(f"[SKIP] Failed to generate embedding for {prompt.get('title')}")
-            continue
-        
         # Create summary from response
         summary_parts = []
         if 'intro' in response:
@@ -139,42 +201,48 @@ def create_presentation_documents(
             "module_name": "presentation",
             "source": "presentation",
             "presentation_data": response,  # Store full response for formatting
-            "embedding": embedding
+            "doc_key": doc_key,
+            "content_hash": content_hash
         }
         
-        documents.append(document)
-    
-    return documents
+        yield {"document": document, "embedding_text": embedding_text, "passages_text": None}
 
 
-def create_kb_documents(
-    kb_json: List[Dict[str, Any]],
+def iter_kb_jobs(
+    kb_json: Iterable[Dict[str, Any]],
     embedding_client: BedrockEmbeddingClient,
-    module_name: str = "module1_kb"
-) -> List[Dict[str, Any]]:
+    module_name: str = "module1_kb",
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None,
+    start_index: int = 0
+) -> Iterator[Dict[str, Any]]:
     """
-    Convert KB JSON entries into MongoDB documents with embeddings.
+    Yield ingestion jobs for KB entries. Each document also stores its content split
+    into embedded passages, used at query time for extractive context compression.
+    Entries whose content_hash matches existing_hashes are skipped (not re-embedded).
     """
-    documents = []
-    
-    for idx, entry in enumerate(kb_json):
-        logger.info(f"[KB] Processing {idx+1}/{len(kb_json)}: {entry.get('topic')}")
+    for idx, entry in enumerate(kb_json, start_index):
+        topic = entry.get('topic', '')
+        doc_key = make_parent_key(module_name, topic)
+        if current_keys is not None and doc_key in current_keys:
+            logger.warning(f"[KB] Duplicate topic in {module_name}, later entry replaces earlier: {topic}")
+        content_hash = compute_content_hash(
+            {"module_name": module_name, "entry": {k: v for k, v in entry.items() if k != 'module_name'}},
+            embedding_client
+        )
+        if _is_unchanged(doc_key, content_hash, existing_hashes, current_keys):
+            logger.info(f"[KB] Unchanged {idx+1}: {topic}")
+            continue
+        
+        logger.info(f"[KB] Processing {idx+1}: {entry.get('topic')}")
         
         # Create embedding text (topic + summary + content + keywords)
-        topic = entry.get('topic', '')
         summary = entry.get('summary', '')
         content = entry.get('content', '')
         keywords = ' '.join(entry.get('keywords', []))
         
         embedding_text = f"Topic: {topic}\n\nSummary: {summary}\n\nContent: {content}\n\nKeywords: {keywords}"
         
-        # Generate embedding
-        embedding = embedding_client.generate_embedding(embedding_text)
-        
-        if not embedding:
-            logger.warning(f"[SKIP] Failed to generate embedding for {topic}")
-            continue
-        
         # Create document
         document = {
             "topic": entry.get('topic', ''),
@@ -186,71 +254,431 @@ def create_kb_documents(
             "keywords": entry.get('keywords', []),
             "module_name": module_name,
             "source": "knowledge_base",
-            "embedding": embedding
+            "parent_key": doc_key,
+            "doc_key": doc_key,
+            "content_hash": content_hash
         }
         
-        documents.append(document)
-    
-    return documents
+        yield {"document": document, "embedding_text": embedding_text, "passages_text": content}
+
+
+def iter_chunk_jobs(
+    kb_json: Iterable[Dict[str, Any]],
+    embedding_client: BedrockEmbeddingClient,
+    module_name: str = "module1_kb",
+    max_tokens: int = 200,
+    overlap_sentences: int = 1,
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None,
+    start_index: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield jobs for structure-aware passage chunks of each KB topic.
+    Chunks reference their topic document via parent_key so retrieval can expand to it.
+    Chunks whose content_hash matches existing_hashes are skipped (not re-embedded).
+    """
+    for idx, entry in enumerate(kb_json, start_index):
+        topic = entry.get('topic', '')
+        parent_key = make_parent_key(module_name, topic)
+        chunks = chunk_structured(entry.get('content', ''), max_tokens=max_tokens, overlap_sentences=overlap_sentences)
+        logger.info(f"[CHUNK] {idx+1}: {topic} -> {len(chunks)} chunks")
+        
+        for chunk in chunks:
+            section = chunk['section'] or ''
+            doc_key = f"{parent_key}#{chunk['chunk_index']}"
+            metadata = {k: entry.get(k, '') for k in ('category', 'level', 'type', 'summary', 'keywords')}
+            content_hash = compute_content_hash(
+                {"parent_key": parent_key, "chunk": chunk, "metadata": metadata},
+                embedding_client
+            )
+            if _is_unchanged(doc_key, content_hash, existing_hashes, current_keys):
+                continue
+            
+            # Topic and section give a short passage the context it lacks on its own
+            embedding_text = f"Topic: {topic}\n\nSection: {section}\n\n{chunk['text']}" if section else f"Topic: {topic}\n\n{chunk['text']}"
+            
+            document = {
+                "topic": topic,
+                "category": entry.get('category', ''),
+                "level": entry.get('level', ''),
+                "type": entry.get('type', ''),
+                "summary": entry.get('summary', ''),
+                "content": chunk['text'],
+                "section": section,
+                "keywords": entry.get('keywords', []),
+                "module_name": module_name,
+                "source": "knowledge_base_chunk",
+                "parent_key": parent_key,
+                "chunk_index": chunk['chunk_index'],
+                "doc_key": doc_key,
+                "content_hash": content_hash
+            }
+            
+            yield {"document": document, "embedding_text": embedding_text, "passages_text": None}
+
 
+def iter_module_jobs(
+    entries: Iterable[Dict[str, Any]],
+    embedding_client: BedrockEmbeddingClient,
+    module_name: str = "module1_kb",
+    max_tokens: int = 200,
+    overlap_sentences: int = 1,
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Single pass over KB entries: each topic's document job followed by its chunk jobs,
+    so streamed entries (JSON-Lines or a live DOCX parse) are consumed one at a time.
+    """
+    for idx, entry in enumerate(entries):
+        yield from iter_kb_jobs([entry], embedding_client, module_name, existing_hashes, current_keys, idx)
+        yield from iter_chunk_jobs(
+            [entry], embedding_client, module_name, max_tokens, overlap_sentences,
+            existing_hashes=existing_hashes, current_keys=current_keys, start_index=idx
+        )
 
-def main():
-    """Main execution: ingest both KB and presentation into unified collection."""
+
+def _embed_all(jobs: Iterable[Dict[str, Any]], embedding_client: BedrockEmbeddingClient) -> List[Dict[str, Any]]:
+    """Serially embed jobs (in-memory path; main() streams through IngestionPipeline)."""
+    return [doc for doc in (embed_job(job, embedding_client) for job in jobs) if doc]
+
+
+def create_presentation_documents(
+    presentation_json: Dict[str, Any],
+    embedding_client: BedrockEmbeddingClient,
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None
+) -> List[Dict[str, Any]]:
+    """Convert presentation.json prompts into MongoDB documents with embeddings."""
+    return _embed_all(
+        iter_presentation_jobs(presentation_json, embedding_client, existing_hashes, current_keys),
+        embedding_client
+    )
+
+
+def create_kb_documents(
+    kb_json: List[Dict[str, Any]],
+    embedding_client: BedrockEmbeddingClient,
+    module_name: str = "module1_kb",
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None
+) -> List[Dict[str, Any]]:
+    """Convert KB JSON entries into MongoDB documents with embeddings and passages."""
+    return _embed_all(
+        iter_kb_jobs(kb_json, embedding_client, module_name, existing_hashes, current_keys),
+        embedding_client
+    )
+
+
+def create_chunk_documents(
+    kb_json: List[Dict[str, Any]],
+    embedding_client: BedrockEmbeddingClient,
+    module_name: str = "module1_kb",
+    max_tokens: int = 200,
+    overlap_sentences: int = 1,
+    existing_hashes: Optional[Dict[str, str]] = None,
+    current_keys: Optional[Set[str]] = None
+) -> List[Dict[str, Any]]:
+    """Split KB topics into embedded passage chunk documents."""
+    return _embed_all(
+        iter_chunk_jobs(
+            kb_json, embedding_client, module_name, max_tokens, overlap_sentences,
+            existing_hashes, current_keys
+        ),
+        embedding_client
+    )
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    """
+    Load an ingestion manifest; relative paths resolve against the manifest's directory.
     
-    # Initialize clients
-    embedding_client = BedrockEmbeddingClient()
-    mongo_client = MongoDBClient()
+    Manifest layout:
+        {
+          "presentation": "presentation.json",            (optional)
+          "modules": [
+            {"module_name": "module1_kb",
+             "kb_json": "Parsed_Module1_KB.json",         (parsed KB, read or written; .jsonl streams)
+             "docx": "MODULE-1 KB.docx",                  (optional, parsed when kb_json is missing)
+             "enhanced_kb": "Enhanced_Module1_KB.json",   (keyword/metadata mapping for docx)
+             "max_tokens": 200, "overlap_sentences": 1}   (optional chunking overrides)
+          ]
+        }
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
     
-    all_documents = []
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
     
-    # ===== 1. Process Presentation.json =====
-    logger.info("\n" + "="*60)
-    logger.info("PROCESSING PRESENTATION.JSON")
-    logger.info("="*60 + "\n")
+    def resolve(path: Optional[str]) -> Optional[str]:
+        return os.path.join(base_dir, path) if path else None
+    
+    if manifest.get('presentation'):
+        manifest['presentation'] = resolve(manifest['presentation'])
     
-    presentation_path = r"C:\Users\newbr\OneDrive\Desktop\AISHINEBE_CLAUDE\presentation.json"
+    names = set()
+    for module in manifest.get('modules', []):
+        name = module.get('module_name')
+        if not name or name in names:
+            raise ValueError(f"[MANIFEST_ERR] Missing or duplicate module_name: {name!r}")
+        if not module.get('kb_json'):
+            raise ValueError(f"[MANIFEST_ERR] Module {name} has no kb_json")
+        names.add(name)
+        for key in ('kb_json', 'docx', 'enhanced_kb'):
+            module[key] = resolve(module.get(key))
+    
+    return manifest
+
+
+def _sync(
+    jobs_factory,
+    scope: Dict[str, Any],
+    embedding_client: BedrockEmbeddingClient,
+    mongo_client: MongoDBClient
+) -> Dict[str, Any]:
+    """Stream one source's changed documents and prune what it no longer produces."""
+    existing_hashes = mongo_client.get_content_hashes(scope)
+    keys: Set[str] = set()
+    stats = IngestionPipeline(embedding_client, mongo_client).run(jobs_factory(existing_hashes, keys))
+    
+    # Only prune after a complete, non-empty parse so a crash or empty source never wipes documents
+    stats["deleted"] = mongo_client.delete_stale_documents(scope, keys) if stats["completed"] and keys else 0
+    stats["documents"] = len(keys)
+    return stats
+
+
+def ingest_presentation(presentation_path: str, collection_name: Optional[str] = None) -> Dict[str, Any]:
+    """Sync presentation.json prompts (runs in a worker process)."""
     presentation_json = load_json_file(presentation_path)
+    if not presentation_json:
+        logger.error(f"❌ Failed to load {presentation_path}")
+        return {"name": "presentation", "ok": False}
+    
+    embedding_client = BedrockEmbeddingClient()
+    mongo_client = MongoDBClient(collection_name=collection_name)
+    try:
+        stats = _sync(
+            lambda hashes, keys: iter_presentation_jobs(presentation_json, embedding_client, hashes, keys),
+            {"source": "presentation"},
+            embedding_client,
+            mongo_client
+        )
+    finally:
+        mongo_client.close()
+    return {"name": "presentation", "ok": stats["completed"] and not stats["failed_writes"], **stats}
+
+
+def ingest_module(
+    module: Dict[str, Any],
+    reparse: bool = False,
+    collection_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Parse (if needed) and sync one KB module (runs in a worker process).
     
-    if presentation_json:
-        pres_docs = create_presentation_documents(presentation_json, embedding_client)
-        all_documents.extend(pres_docs)
-        logger.info(f"✅ Created {len(pres_docs)} presentation documents")
+    Args:
+        module: Manifest module entry with resolved paths
+        reparse: Re-run the DOCX parser even if kb_json already exists
+        collection_name: Target collection (default: the alias's active version)
+    """
+    from docx_parser import DOCXParser, iter_jsonl, tee_jsonl
+    
+    module_name = module['module_name']
+    kb_path = module['kb_json']
+    streaming = kb_path.endswith('.jsonl')
+    
+    if module.get('docx') and (reparse or not os.path.exists(kb_path)):
+        parser = DOCXParser(module.get('enhanced_kb') or '', module_name=module_name)
+        if streaming:
+            # Parse, persist and embed in one pass: topics flow into the pipeline as they close
+            entries = tee_jsonl(parser.iter_chunks(module['docx']), kb_path)
+        else:
+            entries = parser.parse_docx(module['docx'])
+            if not entries:
+                logger.error(f"❌ [{module_name}] DOCX parsing produced no topics")
+                return {"name": module_name, "ok": False}
+            parser.save_parsed_kb(entries, kb_path)
+    elif streaming:
+        if not os.path.exists(kb_path):
+            logger.error(f"❌ [{module_name}] Missing {kb_path}")
+            return {"name": module_name, "ok": False}
+        entries = iter_jsonl(kb_path)
     else:
-        logger.error("❌ Failed to load presentation.json")
+        entries = load_json_file(kb_path)
+        if not entries:
+            logger.error(f"❌ [{module_name}] Failed to load {kb_path}")
+            return {"name": module_name, "ok": False}
     
-    # ===== 2. Process KB JSON =====
-    logger.info("\n" + "="*60)
-    logger.info("PROCESSING KNOWLEDGE BASE")
-    logger.info("="*60 + "\n")
+    max_tokens = module.get('max_tokens', 200)
+    overlap_sentences = module.get('overlap_sentences', 1)
     
-    kb_path = r"C:\Users\newbr\OneDrive\Desktop\AISHINEBE_CLAUDE\Parsed_Module1_KB.json"
-    kb_json = load_json_file(kb_path)
+    def jobs(existing_hashes, keys):
+        return iter_module_jobs(
+            entries, embedding_client, module_name, max_tokens, overlap_sentences,
+            existing_hashes, keys
+        )
     
-    if kb_json:
-        kb_docs = create_kb_documents(kb_json, embedding_client, module_name="module1_kb")
-        all_documents.extend(kb_docs)
-        logger.info(f"✅ Created {len(kb_docs)} KB documents")
+    embedding_client = BedrockEmbeddingClient()
+    mongo_client = MongoDBClient(collection_name=collection_name)
+    try:
+        stats = _sync(
+            jobs,
+            {"module_name": module_name, "source": {"$in": ["knowledge_base", "knowledge_base_chunk"]}},
+            embedding_client,
+            mongo_client
+        )
+    finally:
+        mongo_client.close()
+    ok = stats["completed"] and stats["documents"] > 0 and not stats["failed_writes"]
+    return {"name": module_name, "ok": ok, **stats}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI: incrementally sync every source in the manifest into the unified collection."""
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    arg_parser = argparse.ArgumentParser(description="Sync KB modules and presentation prompts into MongoDB")
+    arg_parser.add_argument(
+        "--manifest",
+        default=os.getenv("INGESTION_MANIFEST", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingestion_manifest.json")),
+        help="Path to ingestion manifest JSON"
+    )
+    arg_parser.add_argument("--modules", nargs="*", help="Only ingest these module names")
+    arg_parser.add_argument("--skip-presentation", action="store_true", help="Do not sync presentation.json")
+    arg_parser.add_argument("--reparse", action="store_true", help="Re-parse DOCX sources even if kb_json exists")
+    arg_parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per source, capped at CPU count)")
+    target_group = arg_parser.add_mutually_exclusive_group()
+    target_group.add_argument("--new-version", action="store_true", help="Build the next collection version (the default)")
+    target_group.add_argument("--in-place", action="store_true", help="Sync the live collection directly; readers see partial writes")
+    arg_parser.add_argument("--promote", action="store_true", help="Promote the new version once its index is queryable")
+    arg_parser.add_argument(
+        "--snapshot",
+        default=os.getenv("LOCAL_INDEX_SNAPSHOT"),
+        help="After a successful sync, export the KB vectors as a local index snapshot to this directory"
+    )
+    args = arg_parser.parse_args(argv)
+    if args.in_place and args.promote:
+        arg_parser.error("--promote applies to a new version, not to --in-place")
+    new_version = not args.in_place
+    
+    manifest = load_manifest(args.manifest)
+    modules = [m for m in manifest.get('modules', []) if not args.modules or m['module_name'] in args.modules]
+    if args.modules:
+        unknown = set(args.modules) - {m['module_name'] for m in modules}
+        if unknown:
+            logger.error(f"❌ Unknown modules: {', '.join(sorted(unknown))}")
+            return 2
+    
+    # Resolve the target collection and create the ingestion indexes once, before workers start upserting
+    settings = collection_versions.ingestion_settings()
+    mongo_client = MongoDBClient()
+    active_collection = mongo_client.collection_name
+    target_collection = None
+    target_version = None
+    resumed = False
+    if new_version:
+        target_version = collection_versions.pending_version(mongo_client.db)
+        resumed = target_version is not None
+        if not resumed:
+            target_version = collection_versions.next_version(mongo_client.db)
+        target_collection = collection_versions.version_name(target_version)
+        if resumed:
+            logger.info(f"[SYNC] Resuming unpromoted {target_collection} (active: {active_collection})")
+        else:
+            logger.info(f"[SYNC] Building {target_collection} (active: {active_collection})")
     else:
-        logger.error("❌ Failed to load KB JSON")
+        logger.warning(
+            f"⚠️ [SYNC] Syncing the LIVE collection {mongo_client.collection_name} in place: requests served "
+            f"during the sync see a partially written KB. Drop --in-place to build a new version instead."
+        )
+    mongo_client.close()
+    
+    if new_version and not resumed:
+        mongo_client = MongoDBClient()
+        collection_versions.clone_collection(mongo_client.db, active_collection, target_collection)
+        mongo_client.close()
+    
+    # An interrupted or failed build stays unpromoted; the next run resumes in it
+    mongo_client = MongoDBClient(collection_name=target_collection)
+    mongo_client.ensure_ingestion_indexes()
+    
+    processes = args.processes or min(max(1, len(modules) + 1), os.cpu_count() or 1)
+    logger.info(f"[SYNC] {len(modules)} modules across {processes} processes")
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            executor.submit(ingest_module, module, args.reparse, target_collection): module['module_name']
+            for module in modules
+        }
+        if manifest.get('presentation') and not args.skip_presentation:
+            futures[executor.submit(ingest_presentation, manifest['presentation'], target_collection)] = "presentation"
+        
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"❌ [{futures[future]}] Ingestion crashed: {e}")
+                results.append({"name": futures[future], "ok": False})
     
-    # ===== 3. Bulk Insert =====
     logger.info("\n" + "="*60)
-    logger.info(f"INSERTING {len(all_documents)} TOTAL DOCUMENTS")
-    logger.info("="*60 + "\n")
+    logger.info("INGESTION SUMMARY")
+    logger.info("="*60)
+    for result in sorted(results, key=lambda r: r['name']):
+        if result.get('ok'):
+            logger.info(
+                f"✅ {result['name']}: {result['written']} upserted / {result['documents']} documents, "
+                f"{result['deleted']} deleted ({result['docs_per_sec']} docs/s)"
+            )
+        else:
+            logger.error(f"❌ {result['name']}: failed - re-run to resume")
     
-    if all_documents:
-        success = mongo_client.insert_documents(all_documents)
-        if success:
-            logger.info(f"✅ Successfully inserted all documents into module_vectors collection")
+    ok = all(r.get('ok') for r in results)
+    changed = any(r.get('jobs') or r.get('deleted') for r in results)
+    if ok and collection_versions.get_collection_settings(mongo_client.db, mongo_client.collection_name) != settings:
+        # Readers switch search layout only once every document carries it
+        if args.modules:
+            logger.warning(f"[SYNC] Embedding settings {settings} not recorded: only some modules were synced, re-run without --modules")
         else:
-            logger.error("❌ Failed to insert documents")
-    else:
-        logger.error("❌ No documents to insert")
+            collection_versions.save_collection_settings(mongo_client.db, mongo_client.collection_name, settings)
+            changed = True
     
-    # Close connections
+    if new_version and ok and not changed and not resumed:
+        # Nothing to promote: drop the clone before it gets a search index of its own
+        logger.info(f"[SYNC] No source changed; dropping {target_collection}, {active_collection} stays active")
+        collection_versions.drop_version(mongo_client.db, target_version)
+        mongo_client.close()
+        mongo_client = MongoDBClient()
+        target_version = None
+    elif ok and (new_version or settings["short_dimensions"]):
+        # Created once the documents are in; Atlas indexes the existing data on creation
+        if not collection_versions.ensure_vector_index(mongo_client.collection, settings["short_dimensions"]):
+            logger.error(f"❌ {mongo_client.collection_name} has no usable {collection_versions.VECTOR_INDEX_NAME}; fix the error above and re-run")
+            ok = False
+    
+    if new_version and target_version is not None:
+        if not ok:
+            logger.error(
+                f"❌ {target_collection} not promoted; fix failures and re-run to resume in it "
+                f"(or discard it: python -m Backend.collection_versions drop --version {target_version})"
+            )
+        elif args.promote:
+            ok = (
+                collection_versions.wait_until_queryable(mongo_client.collection)
+                and collection_versions.promote(mongo_client.db, target_version)
+            )
+            if ok:
+                collection_versions.prune_versions(mongo_client.db)
+        else:
+            logger.info(f"[SYNC] Promote with: python -m Backend.collection_versions promote --version {target_version}")
+    if ok and args.snapshot:
+        ok = export_collection_snapshot(mongo_client, args.snapshot, version=target_version)
     mongo_client.close()
-    logger.info("\n[COMPLETE] Vector store creation finished")
+    
+    logger.info("\n[COMPLETE] Vector store sync finished")
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,6 +1,8 @@
 """
 AWS Bedrock Embedding Client
 Uses Amazon Titan Embed Text v2 for generating 1024-dimensional embeddings.
+Titan v2 also serves 512- and 256-dim vectors, used as the cheap first pass of
+two-pass (Matryoshka-style) search.
 """
 import os
 import logging
@@ -9,6 +11,7 @@ from typing import List, Optional
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv
+from Backend.vector_codec import truncate_embedding
 
 load_dotenv()
 
@@ -16,16 +19,27 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Output sizes Titan Embed Text v2 accepts for "dimensions"
+VALID_DIMENSIONS = (256, 512, 1024)
 
 class BedrockEmbeddingClient:
     """AWS Bedrock client for Titan v2 embeddings."""
     
-    def __init__(self):
+    def __init__(self, client=None):
+        """
+        Args:
+            client: bedrock-runtime client to use instead of creating one
+                (e.g. the offline stand-in in benchmarks/fakes.py)
+        """
         self.aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
         self.aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         self.aws_region = os.getenv("AWS_DEFAULT_REGION", "ap-south-1")
         self.model_id = os.getenv("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v2:0")
         
+        if client is not None:
+            self.client = client
+            return
+        
         if not all([self.aws_access_key, self.aws_secret_key]):
             raise ValueError("[BEDROCK_ERR] AWS credentials not set")
         
@@ -54,22 +68,25 @@ class BedrockEmbeddingClient:
         text = ' '.join(text.split())  # Collapse multiple spaces
         return text
     
-    def generate_embedding(self, text: str) -> Optional[List[float]]:
+    def generate_embedding(self, text: str, dimensions: int = 1024) -> Optional[List[float]]:
         """
-        Generate a 1024-dim embedding for a single text.
+        Generate an embedding for a single text.
         
         Args:
             text: Input text to embed
+            dimensions: 1024 (default), 512 or 256
         
         Returns:
-            List of 1024 floats, or None on failure
+            List of `dimensions` floats, or None on failure
         """
+        if dimensions not in VALID_DIMENSIONS:
+            raise ValueError(f"[EMBEDDING_ERR] Unsupported dimensions {dimensions}, expected one of {VALID_DIMENSIONS}")
         try:
             normalized = self.normalize_text(text)
             
             body = json.dumps({
                 "inputText": normalized,
-                "dimensions": 1024,
+                "dimensions": dimensions,
                 "normalize": True
             })
             
@@ -83,11 +100,11 @@ class BedrockEmbeddingClient:
             response_body = json.loads(response['body'].read())
             embedding = response_body.get('embedding')
             
-            if not embedding or len(embedding) != 1024:
+            if not embedding or len(embedding) != dimensions:
                 logger.error(f"[EMBEDDING_ERR] Invalid embedding dimension: {len(embedding) if embedding else 0}")
                 return None
             
-            logger.info(f"[EMBEDDING_OK] Generated 1024-dim vector")
+            logger.debug("[EMBEDDING_OK] Generated %d-dim vector", dimensions)
             return embedding
             
         except (BotoCoreError, ClientError) as e:
@@ -97,6 +114,32 @@ class BedrockEmbeddingClient:
             logger.error(f"[EMBEDDING_ERR] Unexpected error: {e}")
             return None
     
+    def generate_short_embedding(
+        self,
+        text: str,
+        embedding: Optional[List[float]],
+        dimensions: int,
+        mode: str = "truncate"
+    ) -> Optional[List[float]]:
+        """
+        First-pass vector for two-pass search.
+        
+        Args:
+            text: Text the full embedding was generated from
+            embedding: Its 1024-dim embedding
+            dimensions: 256 or 512
+            mode: "truncate" (renormalized prefix of `embedding`, no API call) or
+                "native" (separate Titan request at `dimensions`)
+        
+        Returns:
+            List of `dimensions` floats, or None on failure
+        """
+        if mode == "native":
+            return self.generate_embedding(text, dimensions)
+        if not embedding:
+            return None
+        return truncate_embedding(embedding, dimensions).tolist()
+    
     def generate_batch_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
         Generate embeddings for multiple texts.
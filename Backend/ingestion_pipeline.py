@@ -0,0 +1,209 @@
+"""
+Ingestion Pipeline
+Streams ingestion jobs through bounded-queue stages: parse (producer) -> concurrent
+embedding (thread pool) -> batched bulk_write upserts. Memory stays constant because at
+most `queue_size` jobs and one write batch are in flight, and a full queue blocks the
+stage before it (backpressure).
+
+Checkpointing: every committed batch stores each document's content_hash in MongoDB, so an
+interrupted run resumes by simply re-running - committed documents hash-match and are skipped.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from Backend.collection_versions import SHORT_EMBEDDING_DIMENSIONS, SHORT_EMBEDDING_FIELD, SHORT_EMBEDDING_MODE
+from Backend.context_compressor import build_passages
+from Backend.text_splitter import estimate_tokens, split_passages
+from Backend.vector_codec import encode_vector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # queue sentinel
+
+
+def embed_job(
+    job: Dict[str, Any],
+    embedding_client,
+    short_dimensions: int = SHORT_EMBEDDING_DIMENSIONS,
+    short_mode: str = SHORT_EMBEDDING_MODE
+) -> Optional[Dict[str, Any]]:
+    """
+    Turn an ingestion job into a finished document.
+
+    Args:
+        job: {"document": dict without embedding, "embedding_text": str,
+              "passages_text": Optional[str] content to split into embedded passages}
+        embedding_client: BedrockEmbeddingClient
+        short_dimensions: Also store a first-pass vector of this size (0 = off)
+        short_mode: "truncate" or "native" (see generate_short_embedding)
+
+    Returns:
+        Document with "embedding" (and "embedding_short", "passages") set as packed
+        BSON vectors, or None if embedding failed
+    """
+    document = job["document"]
+    embedding = embedding_client.generate_embedding(job["embedding_text"])
+    if not embedding:
+        logger.warning(f"[SKIP] Failed to generate embedding for {document.get('doc_key')}")
+        return None
+
+    document["embedding"] = encode_vector(embedding)
+    if short_dimensions:
+        short = embedding_client.generate_short_embedding(job["embedding_text"], embedding, short_dimensions, short_mode)
+        if not short:
+            logger.warning(f"[SKIP] Failed to generate {short_dimensions}-dim embedding for {document.get('doc_key')}")
+            return None
+        document[SHORT_EMBEDDING_FIELD] = encode_vector(short)
+    if job.get("passages_text") is not None:
+        document["passages"] = [
+            {"text": p["text"], "embedding": encode_vector(p["embedding"])}
+            for p in build_passages(job["passages_text"], embedding_client)
+        ]
+    return document
+
+
+def job_tokens(job: Dict[str, Any]) -> int:
+    """Estimated tokens sent to the embedding model for one job."""
+    tokens = estimate_tokens(job["embedding_text"])
+    if SHORT_EMBEDDING_DIMENSIONS and SHORT_EMBEDDING_MODE == "native":
+        tokens *= 2  # the text is embedded a second time at the short size
+    if job.get("passages_text"):
+        tokens += sum(estimate_tokens(p) for p in split_passages(job["passages_text"]))
+    return tokens
+
+
+class IngestionPipeline:
+    """Three-stage streaming ingestion with bounded queues."""
+
+    def __init__(
+        self,
+        embedding_client,
+        mongo_client,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        embed_fn: Callable[[Dict[str, Any], Any], Optional[Dict[str, Any]]] = embed_job
+    ):
+        """
+        Args:
+            embedding_client: Client passed to embed_fn (must be thread-safe; boto3 clients are)
+            mongo_client: MongoDBClient used for upsert_documents
+            workers: Concurrent embedding threads
+            queue_size: Capacity of each inter-stage queue
+            batch_size: Documents per bulk_write
+            embed_fn: Job -> document function (defaults to embed_job)
+        """
+        self.embedding_client = embedding_client
+        self.mongo_client = mongo_client
+        self.workers = workers or int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+        self.queue_size = queue_size or int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+        self.batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", "100"))
+        self.embed_fn = embed_fn
+
+    def run(self, jobs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Consume `jobs` lazily and write finished documents in batches.
+
+        Args:
+            jobs: Iterable of ingestion jobs (unchanged documents already filtered out)
+
+        Returns:
+            Stats dict: jobs, written, failed_embeddings, failed_writes, batches,
+            tokens, seconds, docs_per_sec, tokens_per_sec
+        """
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        write_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stats = {"jobs": 0, "written": 0, "failed_embeddings": 0, "failed_writes": 0, "batches": 0, "tokens": 0}
+        lock = threading.Lock()
+        errors: List[BaseException] = []
+        start = time.perf_counter()
+
+        def produce():
+            try:
+                for job in jobs:
+                    embed_queue.put(job)  # blocks while embedders are behind
+                    stats["jobs"] += 1
+            except BaseException as e:
+                logger.error(f"[PIPELINE_ERR] Parse stage failed: {e}")
+                errors.append(e)
+            finally:
+                for _ in range(self.workers):
+                    embed_queue.put(_DONE)
+
+        def embed():
+            while True:
+                job = embed_queue.get()
+                if job is _DONE:
+                    write_queue.put(_DONE)
+                    return
+                try:
+                    tokens = job_tokens(job)
+                    document = self.embed_fn(job, self.embedding_client)
+                except Exception as e:
+                    logger.error(f"[PIPELINE_ERR] Embedding failed for {job['document'].get('doc_key')}: {e}")
+                    document, tokens = None, 0
+                with lock:
+                    stats["tokens"] += tokens
+                    if document is None:
+                        stats["failed_embeddings"] += 1
+                if document is not None:
+                    write_queue.put(document)
+
+        threads = [threading.Thread(target=produce, name="ingest-parse", daemon=True)]
+        threads += [
+            threading.Thread(target=embed, name=f"ingest-embed-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Write stage runs on the calling thread
+        batch: List[Dict[str, Any]] = []
+        finished_workers = 0
+        while finished_workers < self.workers:
+            item = write_queue.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, stats, start)
+                batch = []
+        if batch:
+            self._flush(batch, stats, start)
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = round(elapsed, 2)
+        stats["docs_per_sec"] = round(stats["written"] / elapsed, 2) if elapsed else 0.0
+        stats["tokens_per_sec"] = round(stats["tokens"] / elapsed, 1) if elapsed else 0.0
+        stats["completed"] = not errors
+        logger.info(
+            f"[PIPELINE] {stats['written']}/{stats['jobs']} documents written in {stats['seconds']}s "
+            f"({stats['docs_per_sec']} docs/s, {stats['tokens_per_sec']} tokens/s, "
+            f"{stats['failed_embeddings']} embed failures, {stats['failed_writes']} write failures)"
+        )
+        return stats
+
+    def _flush(self, batch: List[Dict[str, Any]], stats: Dict[str, Any], start: float):
+        """Commit one batch; committed content hashes are the resume checkpoint."""
+        stats["batches"] += 1
+        if self.mongo_client.upsert_documents(batch, batch_size=len(batch)):
+            stats["written"] += len(batch)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"[CHECKPOINT] Batch {stats['batches']}: {stats['written']} documents committed "
+                f"({stats['written'] / elapsed:.1f} docs/s)"
+            )
+        else:
+            stats["failed_writes"] += len(batch)
+            logger.error(f"[CHECKPOINT] Batch {stats['batches']} failed ({len(batch)} documents will be retried next run)")
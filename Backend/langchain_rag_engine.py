@@ -3,8 +3,10 @@ LangChain RAG Engine
 Main orchestrator using ConversationalRetrievalChain with memory.
 Replaces regex intent detection with natural conversation understanding.
 """
+import os
+import time
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationSummaryMemory
 from langchain_core.prompts import PromptTemplate
@@ -12,10 +14,27 @@ from Backend.models import Message
 from Backend.langchain_retriever import LangChainMongoRetriever
 from Backend.langchain_llm_client import create_langchain_gemini_client
 from Backend.prompt_builder import PromptBuilder
+from Backend import metrics
+from Backend.metrics import RequestTimer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stages recorded by components while the chain runs; the rest of the chain counts as "llm"
+CHAIN_SUBSTAGES = ("embedding", "vector_search", "memory")
+
+
+class TimedSummaryMemory(ConversationSummaryMemory):
+    """ConversationSummaryMemory whose loads and saves (incl. summarization) are the "memory" stage."""
+    
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with metrics.stage("memory"):
+            return super().load_memory_variables(inputs)
+    
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        with metrics.stage("memory"):
+            super().save_context(inputs, outputs)
+
 
 class LangChainRAGEngine:
     """
@@ -23,19 +42,26 @@ class LangChainRAGEngine:
     Eliminates regex intent detection and manual context tracking.
     """
     
-    def __init__(self):
-        """Initialize LangChain RAG components."""
+    def __init__(self, retriever: Optional[LangChainMongoRetriever] = None, llm: Optional[Any] = None):
+        """
+        Initialize LangChain RAG components.
+        
+        Args:
+            retriever: Retriever to use instead of a new LangChainMongoRetriever
+            llm: LangChain chat model to use instead of Gemini
+        """
         try:
             # Initialize components
-            self.retriever = LangChainMongoRetriever()
-            self.llm = create_langchain_gemini_client()
+            self.retriever = retriever or LangChainMongoRetriever()
+            self.llm = llm or create_langchain_gemini_client()
             self.prompt_builder = PromptBuilder()  # Reuse for greeting/farewell
+            self.verbose = os.getenv("LANGCHAIN_VERBOSE", "false").lower() == "true"
             
             # HALLUCINATION GUARDRAIL: ConversationSummaryMemory reduces token usage
             # by 85-90% while maintaining context quality. This prevents token exhaustion
             # that can lead to incomplete responses where LLM might fill gaps with invented content.
             # Summary is triggered when context exceeds 1000 tokens.
-            self.memory = ConversationSummaryMemory(
+            self.memory = TimedSummaryMemory(
                 llm=self.llm,
                 memory_key="chat_history",
                 return_messages=True,
@@ -124,7 +150,7 @@ Answer:"""
             condense_question_prompt=condense_prompt,
             combine_docs_chain_kwargs={"prompt": qa_prompt},
             return_source_documents=True,
-            verbose=True  # Enable logging for debugging
+            verbose=self.verbose  # Chain/prompt dumps to stdout: local debugging only
         )
         
         logger.info("[LANGCHAIN_RAG_ENGINE] ✅ ConversationalRetrievalChain built")
@@ -133,7 +159,8 @@ Answer:"""
     def process_query(
         self,
         query: str,
-        chat_history: List[Message]
+        chat_history: List[Message],
+        timer: Optional[RequestTimer] = None
     ) -> Dict[str, Any]:
         """
         Process user query with LangChain conversation chain.
@@ -141,15 +168,28 @@ Answer:"""
         Args:
             query: Current user query
             chat_history: Full conversation history (for greeting detection)
+            timer: Request trace to record into (see RAGEngine.process_query)
         
         Returns:
             Dict with 'answer' (str) and 'type' (str)
         """
+        with (timer or RequestTimer("langchain")) as timer:
+            result = self._process_query(query, timer)
+            timer.finish(result["type"])
+            return result
+    
+    def _process_query(self, query: str, timer: RequestTimer) -> Dict[str, Any]:
+        """process_query pipeline; each step is timed into `timer` (see Backend.metrics)."""
         try:
-            logger.info(f"[LANGCHAIN_RAG_ENGINE] Processing query: {query}")
+            logger.debug("[LANGCHAIN_RAG_ENGINE] Processing query: %s", query)
+            
+            # Single memoized regex pass for greeting/farewell (quick check before invoking chain)
+            with timer.stage("intent"):
+                intent_type = self.prompt_builder.match_intent(query)
+            timer.intent = intent_type or "query"
             
-            # Handle greetings (quick check before invoking chain)
-            if self.prompt_builder.greeting_regex.match(query.strip()):
+            # Handle greetings
+            if intent_type == "greeting":
                 logger.info("[LANGCHAIN_RAG_ENGINE] Greeting detected")
                 self.memory.clear()  # Reset memory on new greeting
                 return {
@@ -158,7 +198,7 @@ Answer:"""
                 }
             
             # Handle farewells
-            if self.prompt_builder.farewell_regex.match(query.strip()):
+            if intent_type == "farewell":
                 logger.info("[LANGCHAIN_RAG_ENGINE] Farewell detected")
                 self.memory.clear()  # Reset memory
                 return {
@@ -171,18 +211,24 @@ Answer:"""
             # continuation detection, and context management. This eliminates the "be descriptive" → CRAFT
             # bug caused by regex misinterpretation. The chain understands "be descriptive" is a style
             # modifier for the previous response, not a new query about descriptiveness.
+            # The chain interleaves memory, condensing, retrieval and generation; embedding,
+            # vector search and memory are recorded by their components, the rest counts as "llm"
+            chain_start = time.perf_counter()
+            before = sum(timer.seconds(stage) for stage in CHAIN_SUBSTAGES)
             response = self.chain.invoke({"question": query})
+            substages = sum(timer.seconds(stage) for stage in CHAIN_SUBSTAGES) - before
+            timer.add("llm", time.perf_counter() - chain_start - substages)
             
             answer = response.get("answer", "")
             
-            # Clean response
-            answer = self._clean_response(answer)
-            
-            # Classify response type
-            response_type = self._classify_response(answer)
+            with timer.stage("postprocess"):
+                # Clean response
+                answer = self._clean_response(answer)
+                
+                # Classify response type
+                response_type = self._classify_response(answer)
             
-            logger.info(f"[LANGCHAIN_RAG_ENGINE] ✅ Response generated ({len(answer)} chars)")
-            logger.info(f"[LANGCHAIN_RAG_ENGINE] Response type: {response_type}")
+            logger.info("[LANGCHAIN_RAG_ENGINE] ✅ Response generated (%d chars), type: %s", len(answer), response_type)
             
             return {
                 "answer": answer,
@@ -3,16 +3,19 @@ LangChain MongoDB Retriever
 Wraps MongoDB Atlas vector search with LangChain's BaseRetriever interface.
 """
 import os
+import time
 import logging
 from typing import List, Dict, Any
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_mongodb import MongoDBAtlasVectorSearch
 from langchain_aws import BedrockEmbeddings
-from pymongo import MongoClient
 from dotenv import load_dotenv
-import certifi
+from Backend.collection_versions import VECTOR_ALIAS, VECTOR_INDEX_NAME, resolve_active
+from Backend.mongodb_client import create_mongo_client
+from Backend import metrics
 
 load_dotenv()
 
@@ -20,6 +23,32 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class TimedEmbeddings(Embeddings):
+    """
+    Wraps the query embeddings of the vector store: each call is timed as the request's
+    "embedding" stage, and the lower-threshold search reuses the vector of the first one.
+    """
+    
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._last = None  # (text, vector) of the most recent query
+    
+    def embed_query(self, text: str) -> List[float]:
+        last = self._last
+        if last is not None and last[0] == text:
+            timer = metrics.current_timer()
+            if timer is not None:
+                timer.add("embedding", 0.0, cache_hit=True)
+            return last[1]
+        with metrics.stage("embedding"):
+            vector = self.embeddings.embed_query(text)
+        self._last = (text, vector)
+        return vector
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+
 class LangChainMongoRetriever(BaseRetriever):
     """
     LangChain-compatible retriever for MongoDB Atlas vector search.
@@ -29,61 +58,69 @@ class LangChainMongoRetriever(BaseRetriever):
     # Pydantic fields - must be class attributes
     vector_search: Any = None
     similarity_threshold: float = 0.55
+    lower_threshold: float = 0.45  # Fallback tier when nothing meets the main threshold
     max_results: int = 3
+    db: Any = None
+    embeddings: Any = None
+    collection_name: str = VECTOR_ALIAS
+    alias_checked_at: float = 0.0
+    alias_refresh_seconds: float = float(os.getenv("ALIAS_REFRESH_SECONDS", "30"))
     
     class Config:
         arbitrary_types_allowed = True
     
-    def __init__(self, **kwargs):
-        """Initialize MongoDB vector search with LangChain components."""
+    def __init__(self, mongo_client: Any = None, embeddings: Any = None, **kwargs):
+        """
+        Initialize MongoDB vector search with LangChain components.
+        
+        Args:
+            mongo_client: MongoClient-compatible object to use instead of connecting to MONGO_DB_URI
+            embeddings: LangChain Embeddings to use instead of BedrockEmbeddings
+        """
         # Get MongoDB connection details
         mongo_uri = os.getenv("MONGO_DB_URI")
         db_name = os.getenv("DB_NAME")
-        collection_name = "module_vectors"
         
-        if not mongo_uri or not db_name:
+        if not db_name or (not mongo_uri and mongo_client is None):
             raise ValueError("[LANGCHAIN_RETRIEVER] MONGO_DB_URI or DB_NAME not set")
         
         # Initialize MongoDB client
-        client = MongoClient(
-            mongo_uri,
-            tls=True,
-            tlsCAFile=certifi.where(),
-            tlsAllowInvalidCertificates=True,
-            tlsAllowInvalidHostnames=True,
-            retryWrites=True,
-            retryReads=True,
-            serverSelectionTimeoutMS=20000,
-            connectTimeoutMS=20000,
-            socketTimeoutMS=30000,
-            maxPoolSize=10,
-            minPoolSize=2,
-        )
+        client = mongo_client or create_mongo_client(mongo_uri)
         
         # Test connection
         client.admin.command('ping')
+        
+        db = client[db_name]
+        collection_name, _ = resolve_active(db)
         logger.info(f"[LANGCHAIN_RETRIEVER] Connected to {db_name}.{collection_name}")
         
-        collection = client[db_name][collection_name]
+        collection = db[collection_name]
         
         # Initialize Bedrock embeddings with LangChain wrapper
-        embeddings = BedrockEmbeddings(
+        embeddings = TimedEmbeddings(embeddings or BedrockEmbeddings(
             model_id="amazon.titan-embed-text-v2:0",
             region_name=os.getenv("AWS_DEFAULT_REGION", "ap-south-1"),
             credentials_profile_name=None  # Uses env vars
-        )
+        ))
         
         # Initialize LangChain's MongoDB vector search
         vector_search_instance = MongoDBAtlasVectorSearch(
             collection=collection,
             embedding=embeddings,
-            index_name="vector_index",
+            index_name=VECTOR_INDEX_NAME,
             text_key="content",
             embedding_key="embedding"
         )
         
         # Initialize parent with vector_search set
-        super().__init__(vector_search=vector_search_instance, **kwargs)
+        super().__init__(
+            vector_search=vector_search_instance,
+            db=db,
+            embeddings=embeddings,
+            collection_name=collection_name,
+            alias_checked_at=time.monotonic(),
+            **kwargs
+        )
         
         logger.info(f"[LANGCHAIN_RETRIEVER] Initialized with threshold={self.similarity_threshold}")
     
@@ -104,14 +141,16 @@ class LangChainMongoRetriever(BaseRetriever):
             List of LangChain Document objects
         """
         try:
-            logger.info(f"[LANGCHAIN_RETRIEVER] Query: {query}")
+            logger.debug("[LANGCHAIN_RETRIEVER] Query: %s", query)
+            self._refresh_collection()
             
-            # Primary search with threshold 0.55
-            results = self.vector_search.similarity_search_with_score(
-                query=query,
-                k=self.max_results,
-                pre_filter={"source": "knowledge_base"}
-            )
+            # Primary search with threshold 0.55 (the query embedding is timed separately)
+            with metrics.vector_search(str(self.similarity_threshold), "langchain"):
+                results = self.vector_search.similarity_search_with_score(
+                    query=query,
+                    k=self.max_results,
+                    pre_filter={"source": "knowledge_base"}
+                )
             
             # Filter by similarity threshold
             filtered_results = [
@@ -120,35 +159,38 @@ class LangChainMongoRetriever(BaseRetriever):
             ]
             
             if filtered_results:
-                logger.info(f"[LANGCHAIN_RETRIEVER] ✅ Found {len(filtered_results)} documents")
+                logger.info("[LANGCHAIN_RETRIEVER] ✅ Found %d documents", len(filtered_results))
                 documents = [doc for doc, _ in filtered_results]
                 
                 # Log top result for debugging
                 if documents:
                     top_metadata = documents[0].metadata
-                    logger.info(f"[LANGCHAIN_RETRIEVER] Top: {top_metadata.get('topic', 'N/A')}")
+                    logger.debug("[LANGCHAIN_RETRIEVER] Top: %s", top_metadata.get('topic', 'N/A'))
                 
+                self._record_provenance(filtered_results)
                 return documents
             
-            # HALLUCINATION GUARDRAIL: Fallback to lower threshold (0.45)
+            # HALLUCINATION GUARDRAIL: Fallback to lower threshold (0.45, reusing the query vector)
             # This allows LLM to synthesize from lower-scoring but relevant chunks
             # rather than inventing content when no high-confidence matches exist
-            logger.info(f"[LANGCHAIN_RETRIEVER] No results above {self.similarity_threshold}, trying lower threshold")
+            logger.info("[LANGCHAIN_RETRIEVER] No results above %s, trying lower threshold", self.similarity_threshold)
             
-            results_lower = self.vector_search.similarity_search_with_score(
-                query=query,
-                k=self.max_results,
-                pre_filter={"source": "knowledge_base"}
-            )
+            with metrics.vector_search(str(self.lower_threshold), "langchain"):
+                results_lower = self.vector_search.similarity_search_with_score(
+                    query=query,
+                    k=self.max_results,
+                    pre_filter={"source": "knowledge_base"}
+                )
             
             filtered_lower = [
                 (doc, score) for doc, score in results_lower 
-                if score >= 0.45
+                if score >= self.lower_threshold
             ]
             
             if filtered_lower:
-                logger.info(f"[LANGCHAIN_RETRIEVER] ✅ Found {len(filtered_lower)} documents with lower threshold")
+                logger.info("[LANGCHAIN_RETRIEVER] ✅ Found %d documents with lower threshold", len(filtered_lower))
                 documents = [doc for doc, _ in filtered_lower]
+                self._record_provenance(filtered_lower)
                 return documents
             
             logger.warning("[LANGCHAIN_RETRIEVER] ❌ No results found even with lower threshold")
@@ -158,6 +200,45 @@ class LangChainMongoRetriever(BaseRetriever):
             logger.error(f"[LANGCHAIN_RETRIEVER] Error: {e}", exc_info=True)
             return []
     
+    @staticmethod
+    def _record_provenance(results: List[tuple]):
+        """Attach the returned documents to the active request trace (the chain hides them from the engine)."""
+        timer = metrics.current_timer()
+        if timer is None:
+            return
+        timer.provenance = [
+            {
+                "doc_id": str(doc.metadata.get("_id", "")),
+                "topic": doc.metadata.get("topic", ""),
+                "score": round(float(score), 4),
+                "source": doc.metadata.get("source", "")
+            }
+            for doc, score in results
+        ]
+    
+    def _refresh_collection(self):
+        """Follow the collection alias (checked at most every ALIAS_REFRESH_SECONDS) after promote/rollback."""
+        if time.monotonic() - self.alias_checked_at < self.alias_refresh_seconds:
+            return
+        self.alias_checked_at = time.monotonic()
+        try:
+            collection_name, version = resolve_active(self.db)
+        except Exception as e:
+            logger.warning(f"[LANGCHAIN_RETRIEVER] Could not resolve collection alias: {e}")
+            return
+        if collection_name == self.collection_name:
+            return
+        
+        self.vector_search = MongoDBAtlasVectorSearch(
+            collection=self.db[collection_name],
+            embedding=self.embeddings,
+            index_name=VECTOR_INDEX_NAME,
+            text_key="content",
+            embedding_key="embedding"
+        )
+        logger.info(f"[LANGCHAIN_RETRIEVER] Switched {self.collection_name} -> {collection_name} (v{version})")
+        self.collection_name = collection_name
+    
     async def _aget_relevant_documents(
         self,
         query: str,
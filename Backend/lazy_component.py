@@ -0,0 +1,85 @@
+"""
+Lazy Components
+Holder for expensive objects (RAG engines, the shared MongoDB client) that are built on
+first use or in a background thread at startup, exactly once, so the API answers /health
+while engines are still importing their SDKs and connecting.
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LazyComponent:
+    """Thread-safe build-once wrapper around a factory; a failed build is retried after a pause."""
+
+    def __init__(self, name: str, factory: Callable[[], Any], retry_seconds: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.retry_seconds = retry_seconds
+        self.status = "idle"  # idle | building | ready | failed
+        self.build_seconds: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self._value = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        The component, building it first if needed (callers wait for a build in progress).
+
+        Raises:
+            The factory's exception (or the last one, within retry_seconds of a failure)
+        """
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is not None:
+                return self._value
+            if self.status == "failed" and time.monotonic() - self._failed_at < self.retry_seconds:
+                raise self.error
+
+            self.status = "building"
+            start = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.status, self.error, self._failed_at = "failed", e, time.monotonic()
+                logger.error(f"[STARTUP] ❌ {self.name} failed after {time.perf_counter() - start:.2f}s: {e}")
+                raise
+            self.build_seconds = time.perf_counter() - start
+            self._value, self.status, self.error = value, "ready", None
+            logger.info(f"[STARTUP] ✅ {self.name} ready in {self.build_seconds:.2f}s")
+            return value
+
+    def peek(self) -> Any:
+        """The component if it has been built, without building it."""
+        return self._value
+
+    def start_background(self, on_ready: Optional[Callable[[Any], None]] = None):
+        """
+        Build in a daemon thread; errors are logged and the next get() retries.
+
+        Args:
+            on_ready: Called with the component in the same thread once it is built (e.g. warm-up)
+        """
+        def build():
+            try:
+                value = self.get()
+            except Exception:
+                return
+            if on_ready is not None:
+                on_ready(value)
+
+        threading.Thread(target=build, name=f"build-{self.name}", daemon=True).start()
+
+    def report(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"status": self.status}
+        if self.build_seconds is not None:
+            report["build_seconds"] = round(self.build_seconds, 3)
+        if self.error is not None:
+            report["error"] = str(self.error)
+        return report
@@ -18,12 +18,18 @@ logger = logging.getLogger(__name__)
 class GeminiClient:
     """Google Gemini 2.5 Flash client."""
     
-    def __init__(self):
+    def __init__(self, model=None):
+        """
+        Args:
+            model: GenerativeModel-compatible object to use instead of Gemini
+                (e.g. the offline stand-in in benchmarks/fakes.py)
+        """
         self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        if model is None and not self.api_key:
             raise ValueError("[GEMINI_ERR] GOOGLE_API_KEY not set")
         
-        genai.configure(api_key=self.api_key)
+        if model is None:
+            genai.configure(api_key=self.api_key)
         
         # Configure generation settings
         self.generation_config = {
@@ -41,7 +47,7 @@ class GeminiClient:
             HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
         }
         
-        self.model = genai.GenerativeModel(
+        self.model = model or genai.GenerativeModel(
             model_name='gemini-2.5-flash',
             generation_config=self.generation_config,
             safety_settings=self.safety_settings
@@ -88,7 +94,7 @@ class GeminiClient:
             # Clean markdown bold to HTML
             cleaned_response = self.clean_markdown_bold(response.text)
             
-            logger.info(f"[GEMINI_OK] Generated {len(cleaned_response)} chars")
+            logger.info("[GEMINI_OK] Generated %d chars", len(cleaned_response))
             return {
                 "response": cleaned_response,
                 "success": True,
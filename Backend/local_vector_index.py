@@ -0,0 +1,492 @@
+"""
+Local Vector Index
+In-process copy of the active collection's KB vectors. Embeddings are bulk-loaded from
+BSON BinData into one contiguous NumPy matrix; search is a single matrix-vector product,
+skipping the Atlas round-trip. Reloads in the background when the collection version changes.
+
+Large corpora can use two-stage search: a compact copy (sign bits scored by Hamming
+distance, int8 codes, or 256/512-dim Matryoshka-style vectors) shortlists candidates over
+the whole corpus and only the shortlist is rescored with the full float32 vectors.
+
+Snapshots (export_snapshot / load_snapshot) let a worker start without Atlas or Bedrock:
+the matrix is a .npy file opened with mmap_mode="r", so loading takes milliseconds and
+every worker process on a host shares the same page-cache pages.
+"""
+import os
+import json
+import mmap
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import bson
+import numpy as np
+from dotenv import load_dotenv
+from Backend.collection_versions import SHORT_EMBEDDING_FIELD
+from Backend.vector_codec import cosine_to_score, decode_matrix, truncate_embedding
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Same fields vector_search projects
+RESULT_FIELDS = [
+    "topic", "category", "level", "summary", "content", "keywords", "module_name",
+    "source", "presentation_data", "parent_key", "section", "chunk_index"
+]
+
+PREFILTER_MODES = ("none", "binary", "int8", "short")
+SNAPSHOT_FORMAT = 1
+# Snapshot directory layout
+SNAPSHOT_META = "snapshot.json"          # version, collection, row ranges per source, ...
+SNAPSHOT_VECTORS = "vectors.npy"         # (n, dim) float32, L2-normalized, rows grouped by source
+SNAPSHOT_SHORT = "short.npy"             # native first-pass vectors, when the collection has them
+SNAPSHOT_DOCUMENTS = "documents.bson"    # RESULT_FIELDS of each row, concatenated BSON
+SNAPSHOT_OFFSETS = "offsets.npy"         # (n + 1,) int64 byte offsets into documents.bson
+_INT8_BLOCK_ROWS = 4096  # int8 -> float32 conversion is done per cache-sized block
+
+
+def binary_codes(matrix: np.ndarray) -> np.ndarray:
+    """Sign-bit codes, dim/8 bytes per row."""
+    return np.packbits(matrix > 0, axis=-1)
+
+
+def int8_codes(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row symmetric int8 codes and the per-row scales that map them back to floats."""
+    peaks = np.max(np.abs(matrix), axis=-1, keepdims=True)
+    peaks[peaks == 0] = 1.0
+    return np.rint(matrix * (127.0 / peaks)).astype(np.int8), (peaks[:, 0] / 127.0).astype(np.float32)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance of every code row to the query code (XOR + popcount)."""
+    return np.bitwise_count(np.bitwise_xor(codes, query_code)).sum(axis=-1, dtype=np.uint16)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Approximate dot products against int8 codes, converted block by block."""
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], _INT8_BLOCK_ROWS):
+        block = codes[start:start + _INT8_BLOCK_ROWS]
+        scores[start:start + block.shape[0]] = block.astype(np.float32) @ query_vec
+    return scores * scales
+
+
+class MappedDocuments(Sequence):
+    """Read-only sequence over a memory-mapped BSON file; a row is decoded only when accessed."""
+
+    def __init__(self, path: str, offsets: np.ndarray):
+        self._offsets = offsets
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return bson.decode(self._buffer[start:end])
+
+
+class LocalVectorIndex:
+    """Cosine search over an in-memory embedding matrix, exact or quantized two-stage."""
+
+    def __init__(
+        self,
+        mongo_client,
+        sources: Sequence[str] = ("knowledge_base", "knowledge_base_chunk"),
+        prefilter: Optional[str] = None,
+        rerank_factor: Optional[int] = None,
+        min_prefilter_rows: Optional[int] = None
+    ):
+        """
+        Args:
+            mongo_client: MongoDBClient bound to the active collection version
+            sources: Document sources to load
+            prefilter: none | binary | int8 | short (LOCAL_INDEX_PREFILTER)
+            rerank_factor: Shortlist size as a multiple of `limit` (LOCAL_INDEX_RERANK_FACTOR)
+            min_prefilter_rows: Below this many rows search stays exact (LOCAL_INDEX_MIN_PREFILTER_ROWS)
+        """
+        self.mongo_client = mongo_client
+        self.sources = list(sources)
+        self.prefilter = (prefilter or os.getenv("LOCAL_INDEX_PREFILTER", "none")).lower()
+        if self.prefilter not in PREFILTER_MODES:
+            raise ValueError(f"[LOCAL_INDEX_ERR] Unknown prefilter '{self.prefilter}', expected one of {PREFILTER_MODES}")
+        self.rerank_factor = rerank_factor or int(os.getenv("LOCAL_INDEX_RERANK_FACTOR", "30"))
+        self.min_prefilter_rows = min_prefilter_rows if min_prefilter_rows is not None else int(
+            os.getenv("LOCAL_INDEX_MIN_PREFILTER_ROWS", "5000")
+        )
+        # prefilter="short" on collections without native first-pass vectors truncates the matrix
+        self.short_dimensions = int(os.getenv("LOCAL_INDEX_SHORT_DIMENSIONS", "256"))
+        # Swapped atomically on (re)load: matrix, codes, documents, row slice per source, version
+        self._state: Optional[Dict[str, Any]] = None
+        self._load_lock = threading.Lock()
+        if mongo_client is not None:
+            mongo_client.add_version_listener(self._on_version_change)
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._state["version"] if self._state else None
+
+    def load(self) -> bool:
+        """
+        Load all vectors of the configured sources from the active collection.
+
+        Returns:
+            True if the index is ready afterwards
+        """
+        with self._load_lock:
+            try:
+                start = time.perf_counter()
+                collection = self.mongo_client.collection
+                version = self.mongo_client.collection_version
+                settings = self.mongo_client.collection_settings
+                # Native first-pass vectors are not a prefix of the full ones, so they are loaded too
+                native = self.prefilter == "short" and settings.get("short_mode") == "native" and settings.get("short_dimensions")
+                projection = {field: 1 for field in RESULT_FIELDS}
+                projection["embedding"] = 1
+                if native:
+                    projection[SHORT_EMBEDDING_FIELD] = 1
+
+                documents, vectors, short_vectors = [], [], []
+                for doc in collection.find({"source": {"$in": self.sources}}, projection, batch_size=1000):
+                    embedding = doc.pop("embedding", None)
+                    short = doc.pop(SHORT_EMBEDDING_FIELD, None)
+                    if embedding is None or (native and short is None):
+                        continue
+                    vectors.append(embedding)
+                    short_vectors.append(short)
+                    documents.append(doc)
+
+                self.build(documents, vectors, version, short_vectors if native else None)
+                self._state["collection"] = collection.name
+                logger.info(
+                    f"[LOCAL_INDEX] Loaded {len(documents)} vectors from {collection.name} "
+                    f"({self._state['matrix'].nbytes / 1e6:.1f} MB, prefilter={self.prefilter}) "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+                return True
+            except Exception as e:
+                logger.error(f"[LOCAL_INDEX_ERR] Load failed: {e}")
+                return self.ready
+
+    def build(
+        self,
+        documents: List[Dict[str, Any]],
+        vectors: Sequence[Any],
+        version: Optional[int] = None,
+        short_vectors: Optional[Sequence[Any]] = None
+    ):
+        """
+        Build the index from documents and their stored embeddings.
+        Rows are grouped by source so a source filter is a slice (a view, not a copy).
+        `short_vectors` are native first-pass vectors (prefilter="short"); without them the
+        first pass uses the truncated full vectors.
+        """
+        order = sorted(range(len(documents)), key=lambda i: documents[i].get("source", ""))
+        documents = [documents[i] for i in order]
+        matrix = decode_matrix(vectors[i] for i in order)
+
+        rows: Dict[str, slice] = {}
+        for i, doc in enumerate(documents):
+            source = doc.get("source", "")
+            current = rows.get(source)
+            rows[source] = slice(current.start if current else i, i + 1)
+
+        codes = scales = None
+        if self.prefilter == "binary":
+            codes = binary_codes(matrix)
+        elif self.prefilter == "int8":
+            codes, scales = int8_codes(matrix)
+        elif self.prefilter == "short":
+            if short_vectors is not None:
+                codes = decode_matrix(short_vectors[i] for i in order)
+            else:
+                codes = truncate_embedding(matrix, self.short_dimensions)
+
+        self._state = {
+            "matrix": matrix, "codes": codes, "scales": scales, "short_native": short_vectors is not None,
+            "documents": documents, "rows": rows, "version": version, "collection": None
+        }
+
+    def export_snapshot(self, path: str) -> bool:
+        """
+        Write the loaded index to directory `path` (replaced as a whole, so readers
+        never see vectors and metadata from different exports).
+
+        Returns:
+            True on success
+        """
+        state = self._state
+        if state is None:
+            logger.error("[SNAPSHOT_ERR] Nothing to export, index not loaded")
+            return False
+        path = os.path.abspath(path)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            np.save(os.path.join(tmp_path, SNAPSHOT_VECTORS), np.ascontiguousarray(state["matrix"], dtype=np.float32))
+            if state["short_native"]:
+                np.save(os.path.join(tmp_path, SNAPSHOT_SHORT), np.ascontiguousarray(state["codes"], dtype=np.float32))
+            offsets = [0]
+            with open(os.path.join(tmp_path, SNAPSHOT_DOCUMENTS), "wb") as f:
+                for doc in state["documents"]:
+                    offsets.append(offsets[-1] + f.write(bson.encode(doc)))
+            np.save(os.path.join(tmp_path, SNAPSHOT_OFFSETS), np.asarray(offsets, dtype=np.int64))
+            meta = {
+                "format": SNAPSHOT_FORMAT,
+                "collection": state["collection"],
+                "version": state["version"],
+                "count": len(state["documents"]),
+                "dimensions": int(state["matrix"].shape[1]) if state["matrix"].size else 0,
+                "rows": {source: [block.start, block.stop] for source, block in state["rows"].items()},
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+            with open(os.path.join(tmp_path, SNAPSHOT_META), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+
+            old_path = f"{path}.old-{os.getpid()}"
+            if os.path.exists(path):
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            logger.info(f"✅ [SNAPSHOT] Exported {meta['count']} vectors (v{meta['version']}) to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ [SNAPSHOT_ERR] Export to {path} failed: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+    def load_snapshot(self, path: str) -> bool:
+        """
+        Load an exported snapshot; vectors and documents stay memory-mapped (read-only, shared
+        between processes) and documents are decoded on access. Prefilter codes are rebuilt
+        from the mapped matrix when a prefilter is configured.
+
+        Returns:
+            True if the index is ready afterwards
+        """
+        with self._load_lock:
+            try:
+                start = time.perf_counter()
+                with open(os.path.join(path, SNAPSHOT_META), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if meta.get("format") != SNAPSHOT_FORMAT:
+                    raise ValueError(f"unsupported snapshot format {meta.get('format')}")
+
+                matrix = np.load(os.path.join(path, SNAPSHOT_VECTORS), mmap_mode="r")
+                documents = MappedDocuments(
+                    os.path.join(path, SNAPSHOT_DOCUMENTS), np.load(os.path.join(path, SNAPSHOT_OFFSETS))
+                )
+                if matrix.shape[0] != len(documents) or len(documents) != meta["count"]:
+                    raise ValueError(f"{matrix.shape[0]} vectors for {len(documents)} documents")
+
+                short_path = os.path.join(path, SNAPSHOT_SHORT)
+                short_native = os.path.exists(short_path)
+                codes = scales = None
+                if self.prefilter == "binary":
+                    codes = binary_codes(matrix)
+                elif self.prefilter == "int8":
+                    codes, scales = int8_codes(matrix)
+                elif self.prefilter == "short":
+                    codes = np.load(short_path, mmap_mode="r") if short_native else truncate_embedding(matrix, self.short_dimensions)
+
+                self._state = {
+                    "matrix": matrix, "codes": codes, "scales": scales,
+                    "short_native": self.prefilter == "short" and short_native,
+                    "documents": documents,
+                    "rows": {source: slice(*bounds) for source, bounds in meta["rows"].items()},
+                    "version": meta.get("version"), "collection": meta.get("collection")
+                }
+                logger.info(
+                    f"[LOCAL_INDEX] Mapped snapshot of {meta.get('collection')} v{meta.get('version')} "
+                    f"({len(documents)} vectors, exported {meta.get('created_at')}) in "
+                    f"{(time.perf_counter() - start) * 1e3:.1f}ms"
+                )
+                return True
+            except Exception as e:
+                logger.error(f"[LOCAL_INDEX_ERR] Snapshot {path} unusable: {e}")
+                return self.ready
+
+    def bootstrap(self, snapshot_path: Optional[str] = None) -> bool:
+        """
+        Serve from the snapshot immediately when one exists; reload from the active
+        collection in the background if the snapshot is of another version.
+        Without a usable snapshot this is a blocking load().
+
+        Returns:
+            True if the index is ready afterwards
+        """
+        if snapshot_path and os.path.exists(os.path.join(snapshot_path, SNAPSHOT_META)) and self.load_snapshot(snapshot_path):
+            active = getattr(self.mongo_client, "collection_version", None)
+            if self.mongo_client is not None and active != self.version:
+                self._on_version_change(self.version, active)
+            return True
+        return self.load() if self.mongo_client is not None else False
+
+    def _on_version_change(self, old_version, new_version):
+        """Rebuild off the request path; the old index keeps serving until the swap."""
+        logger.info(f"[LOCAL_INDEX] Collection v{old_version} -> v{new_version}, reloading")
+        threading.Thread(target=self.load, name="local-index-reload", daemon=True).start()
+
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        similarity_threshold: float = 0.55,
+        source: Optional[str] = None,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        short_query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Same contract as MongoDBClient.vector_search: top `limit` by cosine, then the
+        threshold (on the Atlas score scale), then equality metadata filters.
+        `short_query_embedding` is the native first-pass query for prefilter="short".
+        """
+        state = self._state
+        if state is None or query_embedding is None or len(query_embedding) == 0:
+            return []
+
+        block = state["rows"].get(source, slice(0, 0)) if source else slice(0, len(state["documents"]))
+        matrix = state["matrix"][block]
+        if matrix.shape[0] == 0:
+            return []
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm == 0 or query_vec.shape[0] != matrix.shape[1]:
+            return []
+        query_vec = query_vec / norm
+
+        top, scores = self.top_k(state, block, query_vec, limit, short_query_embedding)
+
+        results = []
+        documents = state["documents"]
+        for i, score in zip(top, scores):
+            score = float(cosine_to_score(score))
+            if score < similarity_threshold:
+                break
+            doc = documents[block.start + int(i)]
+            if metadata_filters and any(doc.get(key) != value for key, value in metadata_filters.items()):
+                continue
+            results.append({**doc, "score": score})
+        return results
+
+    def top_k(
+        self,
+        state: Dict[str, Any],
+        block: slice,
+        query_vec: np.ndarray,
+        limit: int,
+        short_query: Optional[Sequence[float]] = None
+    ):
+        """
+        Row offsets (within the block) and float32 scores of the best `limit` rows, best first.
+        Exact for small blocks or prefilter="none"; otherwise shortlist from codes, then rerank.
+        """
+        matrix = state["matrix"][block]
+        codes = state["codes"]
+        n = matrix.shape[0]
+        shortlist_size = limit * self.rerank_factor
+
+        short_vec = None
+        if self.prefilter == "short" and codes is not None:
+            if not state["short_native"]:
+                short_vec = truncate_embedding(query_vec, codes.shape[1])
+            elif short_query is not None and len(short_query) == codes.shape[1]:
+                short_vec = truncate_embedding(short_query, codes.shape[1])
+            else:
+                codes = None  # native first pass needs a native query vector
+
+        if codes is None or n < self.min_prefilter_rows or shortlist_size >= n:
+            scores = matrix @ query_vec
+            k = min(limit, n)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return top, scores[top]
+
+        # Stage 1: shortlist over the whole block from the compact codes
+        block_codes = codes[block]
+        if self.prefilter == "binary":
+            approx = hamming_distances(block_codes, binary_codes(query_vec))
+            shortlist = np.argpartition(approx, shortlist_size - 1)[:shortlist_size]
+        elif self.prefilter == "short":
+            approx = block_codes @ short_vec
+            shortlist = np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]
+        else:
+            approx = int8_scores(block_codes, state["scales"][block], query_vec)
+            shortlist = np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]
+
+        # Stage 2: exact float32 rescoring of the shortlist only
+        scores = matrix[shortlist] @ query_vec
+        k = min(limit, shortlist.shape[0])
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return shortlist[best], scores[best]
+
+
+def export_collection_snapshot(mongo_client, path: str, version: Optional[int] = None) -> bool:
+    """
+    Load the KB vectors of mongo_client's collection and export them as a snapshot.
+    Native first-pass vectors are included when the collection has them.
+
+    Args:
+        mongo_client: MongoDBClient bound to the collection to export
+        path: Snapshot directory
+        version: Version to record (for pinned collections, whose version is not resolved)
+    """
+    settings = mongo_client.collection_settings
+    native = settings.get("short_dimensions") and settings.get("short_mode") == "native"
+    index = LocalVectorIndex(mongo_client, prefilter="short" if native else "none")
+    if not index.load():
+        return False
+    if version is not None:
+        index._state["version"] = version
+    return index.export_snapshot(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI: export the active collection as a snapshot, or inspect one."""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Local vector index snapshots")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Export the active collection's KB vectors")
+    export_parser.add_argument("path", nargs="?", default=os.getenv("LOCAL_INDEX_SNAPSHOT", "vector_snapshot"))
+    info_parser = commands.add_parser("info", help="Time a snapshot load and print its metadata")
+    info_parser.add_argument("path", nargs="?", default=os.getenv("LOCAL_INDEX_SNAPSHOT", "vector_snapshot"))
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "info":
+        index = LocalVectorIndex(None)
+        if not index.load_snapshot(args.path):
+            return 1
+        with open(os.path.join(args.path, SNAPSHOT_META), "r", encoding="utf-8") as f:
+            print(f.read())
+        return 0
+
+    from Backend.mongodb_client import MongoDBClient
+
+    mongo_client = MongoDBClient()
+    try:
+        return 0 if export_collection_snapshot(mongo_client, args.path) else 1
+    finally:
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
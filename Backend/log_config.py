@@ -0,0 +1,194 @@
+"""
+Logging Configuration
+Structured, non-blocking logging for the API: every record carries the request ID of the
+request that emitted it, records go through a queue and are formatted and written to stderr
+by a listener thread, and DEBUG lines are sampled per logger.
+
+Request threads only enqueue: message interpolation (loggers are called with lazy %-style
+arguments on the request path), JSON encoding and the write happen on the listener thread.
+Sampling is decided per request ID, so a sampled request keeps all of its DEBUG lines and
+its trace stays readable. INFO and above are never sampled.
+
+Environment:
+    LOG_FORMAT        json (default) or text
+    LOG_LEVEL         root level, INFO by default (DEBUG lines are not even created then)
+    LOG_SAMPLE_RATES  DEBUG sampling per logger prefix, e.g. "Backend=0.1,Backend.rag_engine=1"
+"""
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import time
+import zlib
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from uuid import uuid4
+
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_listener: Optional[QueueListener] = None
+
+
+def bind_request_id(candidate: Optional[str] = None) -> str:
+    """
+    Set the request ID of the current context (the client's X-Request-ID if it is safe to
+    log and use as a file name, else a new one).
+
+    Returns:
+        The bound request ID
+    """
+    request_id = candidate if candidate and REQUEST_ID_PATTERN.fullmatch(candidate) else uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """'Backend=0.1,Backend.rag_engine=1' -> {'Backend': 0.1, 'Backend.rag_engine': 1.0}"""
+    rates = {}
+    for item in value.split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            try:
+                rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+            except ValueError:
+                continue
+    return rates
+
+
+class RequestSampler(logging.Filter):
+    """Keeps a fraction of DEBUG records per logger prefix (longest prefix wins), by request ID."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._by_logger: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            prefixes = [p for p in self.rates if name == p or name.startswith(p + ".")]
+            rate = self.rates[max(prefixes, key=len)] if prefixes else 1.0
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", None) or _request_id.get()
+        if request_id is None:
+            return random.random() < rate
+        return zlib.crc32(request_id.encode()) % 10000 < rate * 10000
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them. Only what depends on the request thread is
+    captured here: the request ID and, for the rare exception records, the traceback text.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = _request_id.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts (UTC), level, logger, request_id, message (and exc)."""
+
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._second_text = ""
+
+    def _timestamp(self, created: float) -> str:
+        # strftime once per second; records within the same second only add milliseconds
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._second_text}.{int((created - second) * 1000):03d}Z"
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self._timestamp(record.created),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The previous plain-text format, with the request ID after the logger name."""
+
+    def __init__(self):
+        super().__init__("[%(asctime)s] [%(levelname)s] %(name)s [%(request_id)s]: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+def configure_logging(stream=None) -> QueueListener:
+    """
+    Route the root logger through a queue to a stderr (or `stream`) writer thread.
+    Replaces handlers installed by earlier basicConfig calls; calling it again is a no-op.
+
+    Returns:
+        The running QueueListener (see stop_logging)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    sink = logging.StreamHandler(stream or sys.stderr)
+    sink.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else JsonFormatter())
+
+    handler = RequestQueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestSampler(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "Backend=0.1"))))
+
+    # No format here uses caller, thread or process fields: skip collecting them per record
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    _listener = QueueListener(handler.queue, sink, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread (also run at interpreter exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
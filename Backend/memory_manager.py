@@ -40,7 +40,7 @@ class MemoryManager:
 
         # Get last N messages
         recent_messages = chat_history[-self.short_term_window:]
-        logger.info(f"[MEMORY] Short-term: {len(recent_messages)} messages")
+        logger.debug("[MEMORY] Short-term: %d messages", len(recent_messages))
         return recent_messages
 
     def format_for_llm(
@@ -61,7 +61,7 @@ class MemoryManager:
         """
         # ✅ FIX: Only pass history for continuation queries
         if not is_continuation:
-            logger.info("[MEMORY] Not a continuation - returning None to save tokens")
+            logger.debug("[MEMORY] Not a continuation - returning None to save tokens")
             return None
 
         if not chat_history:
@@ -108,7 +108,7 @@ class MemoryManager:
                 "parts": [{"text": content}]
             })
 
-        logger.info(f"[MEMORY] Formatted {len(formatted_messages)} messages for continuation context")
+        logger.debug("[MEMORY] Formatted %d messages for continuation context", len(formatted_messages))
         return formatted_messages
 
     def should_summarize(self, chat_history: List[Any]) -> bool:
@@ -0,0 +1,167 @@
+"""
+Request Metrics
+Prometheus histograms for every stage of both RAG engines, exposed by main.py at /metrics.
+
+Engines open a RequestTimer per query; stages add their durations to it and the timer
+observes them once the request's labels (engine, intent) are known. The same object is the
+request's trace: it renders the Server-Timing header and the opt-in debug payload
+(stage timings plus retrieval provenance) returned to the client. Code below the engine
+(retriever, embedding) reaches the active timer through a ContextVar, so nothing has to be
+threaded through call signatures. Overhead is two perf_counter calls per stage plus one
+histogram observation per stage at the end of the request.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Request stages are dominated by network calls (Bedrock, Atlas, Gemini): 5 ms .. 30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in one stage of a RAG request",
+    ["engine", "stage", "intent", "cache_hit"],
+    buckets=LATENCY_BUCKETS
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "rag_vector_search_seconds",
+    "Time of one vector search call, by threshold tier and backend",
+    ["engine", "tier", "backend"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds",
+    "End-to-end process_query time",
+    ["engine", "intent", "type"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    "rag_requests_total",
+    "Processed queries",
+    ["engine", "intent", "type"]
+)
+
+# Server-Timing metric names for stages (others keep their stage name)
+SERVER_TIMING_NAMES = {"embedding": "embed", "vector_search": "search"}
+
+_current: ContextVar[Optional["RequestTimer"]] = ContextVar("rag_request_timer", default=None)
+
+
+class RequestTimer:
+    """Per-request stage durations, observed into the histograms by finish()."""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.intent = "unknown"
+        self.start = time.perf_counter()
+        # stage -> [seconds, cache_hit]; repeated stages (e.g. two embedding calls) add up
+        self.stages: Dict[str, List] = {}
+        self.total_seconds: Optional[float] = None
+        # Retrieved documents (doc_id, topic, score, ...) for the debug payload
+        self.provenance: List[Dict[str, Any]] = []
+        self._token = None
+
+    def add(self, stage: str, seconds: float, cache_hit: bool = False):
+        entry = self.stages.setdefault(stage, [0.0, cache_hit])
+        entry[0] += seconds
+        entry[1] = entry[1] and cache_hit
+
+    @contextmanager
+    def stage(self, name: str, cache_hit: bool = False):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, cache_hit)
+
+    def seconds(self, stage: str) -> float:
+        return self.stages.get(stage, (0.0,))[0]
+
+    def __enter__(self) -> "RequestTimer":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+    def finish(self, response_type: str):
+        """Observe every stage and the request total with the final labels."""
+        self.total_seconds = time.perf_counter() - self.start
+        try:
+            for stage, (seconds, cache_hit) in self.stages.items():
+                STAGE_SECONDS.labels(self.engine, stage, self.intent, "true" if cache_hit else "false").observe(seconds)
+            labels = (self.engine, self.intent, response_type)
+            REQUEST_SECONDS.labels(*labels).observe(self.total_seconds)
+            REQUESTS.labels(*labels).inc()
+        except Exception as e:
+            logger.warning(f"[METRICS] Could not record request metrics: {e}")
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. 'embed;dur=212.4, search;dur=95.1, llm;dur=2310.0, total;dur=2650.3'."""
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.start
+        entries = [
+            f"{SERVER_TIMING_NAMES.get(stage, stage)};dur={seconds * 1e3:.1f}"
+            for stage, (seconds, _) in self.stages.items()
+        ]
+        entries.append(f"total;dur={total * 1e3:.1f}")
+        return ", ".join(entries)
+
+    def to_debug(self) -> Dict[str, Any]:
+        """Debug payload: stage timings (ms), cache hits and retrieval provenance."""
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.start
+        return {
+            "engine": self.engine,
+            "intent": self.intent,
+            "total_ms": round(total * 1e3, 1),
+            "stages_ms": {stage: round(seconds * 1e3, 1) for stage, (seconds, _) in self.stages.items()},
+            "cache_hits": [stage for stage, (_, cache_hit) in self.stages.items() if cache_hit],
+            "provenance": self.provenance
+        }
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, cache_hit: bool = False):
+    """Time a stage into the active request's timer (no-op outside a request)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name, cache_hit):
+        yield
+
+
+@contextmanager
+def vector_search(tier: str, backend: str):
+    """
+    Time one vector search call: observed per threshold tier and backend immediately,
+    and added to the request's "vector_search" stage. Query embedding done inside the call
+    (LangChain's vector store embeds the query itself) is recorded as "embedding" instead.
+    """
+    timer = _current.get()
+    embedded_before = timer.seconds("embedding") if timer is not None else 0.0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if timer is not None:
+            seconds -= timer.seconds("embedding") - embedded_before
+        VECTOR_SEARCH_SECONDS.labels(timer.engine if timer else "none", tier, backend).observe(seconds)
+        if timer is not None:
+            timer.add("vector_search", seconds)
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text exposition format, and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
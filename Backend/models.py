@@ -55,12 +55,18 @@ class ChatRequest(BaseModel):
     
     Attributes:
         chat_history: List of previous messages in conversation
+        debug: Return stage timings and retrieval provenance in the response (admin only)
     """
     chat_history: List[Message] = Field(
         ...,
         description="Conversation history with user and AI messages",
         min_items=1
     )
+    debug: bool = Field(
+        default=False,
+        description="Include the request trace (stage timings, provenance) in the response; "
+                    "requires the X-Admin-Token header unless DEBUG_TRACE_ENABLED is set"
+    )
     
     @validator('chat_history')
     def validate_history(cls, v):
@@ -100,6 +106,7 @@ class ChatResponse(BaseModel):
     Attributes:
         answer: Generated response text (may contain markdown and structured format)
         type: Response type for frontend rendering logic
+        debug: Request trace, only when the request asked for it
     """
     answer: str = Field(
         ...,
@@ -109,6 +116,10 @@ class ChatResponse(BaseModel):
         default="text",
         description="Response type for rendering strategy"
     )
+    debug: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Stage timings (ms), cache hits and retrieval provenance"
+    )
     
     @validator('answer')
     def validate_answer(cls, v):
@@ -175,9 +186,12 @@ class IntentResult(BaseModel):
         intent_type: Detected intent category
         is_continuation: Whether user wants more detail
         is_greeting: Whether message is a greeting
+        is_farewell: Whether message is a farewell
+        is_out_of_scope: Whether message looks non-AI/ML
         confidence: Intent confidence score
+        source: Detection pass ("regex" or "semantic")
     """
-    intent_type: Literal["greeting", "continuation", "query"] = Field(
+    intent_type: Literal["greeting", "farewell", "continuation", "query", "out_of_scope"] = Field(
         ...,
         description="Detected intent type"
     )
@@ -189,12 +203,24 @@ class IntentResult(BaseModel):
         default=False,
         description="Greeting detected"
     )
+    is_farewell: bool = Field(
+        default=False,
+        description="Farewell detected"
+    )
+    is_out_of_scope: bool = Field(
+        default=False,
+        description="Semantic classifier flagged the message as non-AI/ML"
+    )
     confidence: float = Field(
         default=1.0,
         ge=0.0,
         le=1.0,
         description="Intent confidence (0-1)"
     )
+    source: Literal["regex", "semantic"] = Field(
+        default="regex",
+        description="Which detection pass produced the intent"
+    )
 
 
 
@@ -5,39 +5,94 @@ Render-compatible with retry logic, connection pooling, and graceful error handl
 import os
 import logging
 import time
-from typing import List, Dict, Any, Optional
-from pymongo import MongoClient
+from typing import List, Dict, Any, Callable, Optional
+from pymongo import MongoClient, ReplaceOne
 from pymongo.errors import ConnectionFailure, OperationFailure, ServerSelectionTimeoutError
 from dotenv import load_dotenv
 import certifi
+import numpy as np
+from Backend.collection_versions import SHORT_EMBEDDING_FIELD, VECTOR_ALIAS, get_collection_settings, resolve_active
+from Backend.vector_codec import cosine_to_score, decode_matrix, encode_query, truncate_embedding
 
 load_dotenv(override=True)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fields returned by vector searches (passages with their embeddings are fetched separately,
+# only for the documents that get compressed; see fetch_passages)
+SEARCH_FIELDS = [
+    "topic", "category", "level", "summary", "content", "keywords", "module_name",
+    "source", "presentation_data", "parent_key", "section", "chunk_index"
+]
+
+
+def create_mongo_client(uri: str) -> MongoClient:
+    """
+    Atlas connection with the TLS, retry and pool settings used by every engine.
+    Connecting is lazy: the first command (e.g. a ping) opens the connection.
+    """
+    return MongoClient(
+        uri,
+        tls=True,
+        tlsCAFile=certifi.where(),
+        tlsAllowInvalidCertificates=True,
+        tlsAllowInvalidHostnames=True,
+        retryWrites=True,
+        retryReads=True,
+        serverSelectionTimeoutMS=20000,
+        connectTimeoutMS=20000,
+        socketTimeoutMS=30000,
+        maxPoolSize=10,
+        minPoolSize=2,
+    )
+
 
 class MongoDBClient:
     """MongoDB Atlas Vector Search client with Render cloud compatibility."""
     
-    def __init__(self, max_retries: int = 3, retry_delay: int = 2):
+    def __init__(
+        self,
+        max_retries: int = 3,
+        retry_delay: int = 2,
+        collection_name: Optional[str] = None,
+        client: Optional[Any] = None
+    ):
         """
         Initialize MongoDB client with retry logic.
         
         Args:
             max_retries: Number of connection retry attempts
             retry_delay: Seconds to wait between retries
+            collection_name: Pin a specific collection (e.g. a version being built);
+                by default the active version is resolved through the collection alias
+            client: MongoClient-compatible object to use instead of connecting to
+                MONGO_DB_URI (e.g. the offline stand-in in benchmarks/fakes.py)
         """
         load_dotenv(override=True)
         
         self.uri = os.getenv("MONGO_DB_URI")
         self.db_name = os.getenv("DB_NAME")
-        self.collection_name = "module_vectors"
+        self.collection_alias = VECTOR_ALIAS
+        self.pinned_collection = collection_name
+        self.collection_name = collection_name or VECTOR_ALIAS
+        self.collection_version: Optional[int] = None
+        # Embedding layout of the bound collection (see collection_versions.get_collection_settings)
+        self.collection_settings: Dict[str, Any] = {"short_dimensions": 0, "short_mode": "truncate", "chunks": False}
+        # Two-pass search: first-pass candidates per requested result
+        self.short_rerank_factor = int(os.getenv("SHORT_RERANK_FACTOR", "10"))
+        # $vectorSearch numCandidates per requested result (HNSW exploration breadth;
+        # benchmarks/retrieval_eval.py measures recall/latency per value)
+        self.num_candidates_factor = int(os.getenv("NUM_CANDIDATES_FACTOR", "20"))
+        self.alias_refresh_seconds = float(os.getenv("ALIAS_REFRESH_SECONDS", "30"))
+        self._alias_checked_at = 0.0
+        self._version_listeners: List[Callable[[Optional[int], Optional[int]], None]] = []
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self._injected_client = client
         
         # Validate required env vars
-        if not self.uri:
+        if not self.uri and client is None:
             raise ValueError("[MONGO_ERR] MONGO_DB_URI not set in environment")
         
         if not self.db_name:
@@ -57,25 +112,16 @@ class MongoDBClient:
             try:
                 logger.info(f"[MONGO] Connection attempt {attempt}/{self.max_retries}")
                 
-                self.client = MongoClient(
-                    self.uri,
-                    tls=True,
-                    tlsCAFile=certifi.where(),
-                    tlsAllowInvalidCertificates=True,
-                    tlsAllowInvalidHostnames=True,
-                    retryWrites=True,
-                    retryReads=True,
-                    serverSelectionTimeoutMS=20000,
-                    connectTimeoutMS=20000,
-                    socketTimeoutMS=30000,
-                    maxPoolSize=10,
-                    minPoolSize=2,
-                )
+                self.client = self._injected_client or create_mongo_client(self.uri)
                 # Test connection
                 self.client.admin.command('ping')
                 
                 self.db = self.client[self.db_name]
-                self.collection = self.db[self.collection_name]
+                if self.collection is None:
+                    self._bind_collection()
+                else:
+                    # Reconnect: keep the current version; refresh_collection handles alias changes
+                    self.collection = self.db[self.collection_name]
                 
                 logger.info(f"[MONGO_OK] Connected to {self.db_name}.{self.collection_name}")
                 return
@@ -98,38 +144,112 @@ class MongoDBClient:
             logger.warning(f"[MONGO] Connection lost, reconnecting: {e}")
             self._connect_with_retry()
     
+    def _bind_collection(self):
+        """Point self.collection at the pinned collection or the alias's active version."""
+        if self.pinned_collection:
+            name, version = self.pinned_collection, None
+        else:
+            name, version = resolve_active(self.db, self.collection_alias)
+        self.collection_name = name
+        self.collection_version = version
+        self.collection = self.db[name]
+        try:
+            self.collection_settings = get_collection_settings(self.db, name)
+        except Exception as e:
+            logger.warning(f"[MONGO] Could not read settings for {name}, using single-pass topic search: {e}")
+            self.collection_settings = {"short_dimensions": 0, "short_mode": "truncate", "chunks": False}
+        self._alias_checked_at = time.monotonic()
+    
+    def add_version_listener(self, callback: Callable[[Optional[int], Optional[int]], None]):
+        """Register callback(old_version, new_version) fired when the active version changes."""
+        self._version_listeners.append(callback)
+    
+    def refresh_collection(self, force: bool = False) -> bool:
+        """
+        Re-resolve the alias at most every ALIAS_REFRESH_SECONDS and switch collections
+        after a promote/rollback, notifying version listeners so caches can be invalidated.
+        
+        Returns:
+            True if the active collection changed
+        """
+        if self.pinned_collection or self.db is None:
+            return False
+        if not force and time.monotonic() - self._alias_checked_at < self.alias_refresh_seconds:
+            return False
+        
+        old_name, old_version = self.collection_name, self.collection_version
+        try:
+            self._bind_collection()
+        except Exception as e:
+            logger.warning(f"[ALIAS] Could not resolve {self.collection_alias}, keeping {old_name}: {e}")
+            self._alias_checked_at = time.monotonic()
+            return False
+        
+        if self.collection_name == old_name:
+            return False
+        
+        logger.info(f"[ALIAS] {self.collection_alias}: {old_name} (v{old_version}) -> {self.collection_name} (v{self.collection_version})")
+        for callback in self._version_listeners:
+            try:
+                callback(old_version, self.collection_version)
+            except Exception as e:
+                logger.error(f"[ALIAS_ERR] Version listener failed: {e}")
+        return True
+    
     def vector_search(
         self,
         query_embedding: List[float],
         limit: int = 5,
         similarity_threshold: float = 0.55,
-        metadata_filters: Optional[Dict[str, Any]] = None
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        pre_filters: Optional[Dict[str, Any]] = None,
+        short_query_embedding: Optional[List[float]] = None,
+        num_candidates: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform vector similarity search with optional metadata filtering.
+        Collections with first-pass vectors are searched in two passes (_two_pass_search).
         
         Args:
             query_embedding: 1024-dim embedding vector
             limit: Max results to return
             similarity_threshold: Minimum cosine similarity score
-            metadata_filters: Optional dict of metadata filters
+            metadata_filters: Optional dict of metadata filters (applied after the search)
+            pre_filters: Optional filter on indexed filter fields (e.g. "source"),
+                applied inside $vectorSearch so `limit` counts only matching documents
+            short_query_embedding: Native low-dimension query vector (collections built
+                with short_mode="native"); truncated from query_embedding otherwise
+            num_candidates: $vectorSearch numCandidates (default limit * NUM_CANDIDATES_FACTOR)
         
         Returns:
             List of documents with score >= threshold, sorted by relevance
         """
         try:
             self.ensure_connection()
+            self.refresh_collection()
+            
+            short_query = self.short_query_vector(query_embedding, short_query_embedding)
+            if short_query is not None:
+                results = self._two_pass_search(
+                    query_embedding, short_query, limit, similarity_threshold, metadata_filters, pre_filters
+                )
+                if results is not None:
+                    return results
+            
+            vector_stage = {
+                "index": "vector_index",
+                "path": "embedding",
+                "queryVector": encode_query(query_embedding),
+                "numCandidates": min(max(num_candidates or limit * self.num_candidates_factor, limit), 10000),
+                "limit": limit
+            }
+            if pre_filters:
+                vector_stage["filter"] = pre_filters
             
             # Build aggregation pipeline
             pipeline = [
                 {
-                    "$vectorSearch": {
-                        "index": "vector_index",
-                        "path": "embedding",
-                        "queryVector": query_embedding,
-                        "numCandidates": limit * 20,
-                        "limit": limit
-                    }
+                    "$vectorSearch": vector_stage
                 },
                 {
                     "$addFields": {
@@ -149,27 +269,15 @@ class MongoDBClient:
             
             # Project fields
             pipeline.append({
-                "$project": {
-                    "_id": 1,
-                    "topic": 1,
-                    "category": 1,
-                    "level": 1,
-                    "summary": 1,
-                    "content": 1,
-                    "keywords": 1,
-                    "module_name": 1,
-                    "source": 1,
-                    "presentation_data": 1,
-                    "score": 1
-                }
+                "$project": {"_id": 1, **{field: 1 for field in SEARCH_FIELDS}, "score": 1}
             })
             
             results = list(self.collection.aggregate(pipeline, maxTimeMS=30000))
             
-            logger.info(f"[VECTOR_SEARCH] Retrieved {len(results)} chunks above threshold {similarity_threshold}")
+            logger.debug("[VECTOR_SEARCH] Retrieved %d chunks above threshold %s", len(results), similarity_threshold)
             if results:
-                logger.info(f"[VECTOR_SEARCH_DEBUG] Top: {results[0].get('topic', 'N/A')} ({results[0].get('score', 0):.3f})")
-                logger.info(f"[VECTOR_SEARCH_DEBUG] Source: {results[0].get('source', 'N/A')}")
+                logger.debug("[VECTOR_SEARCH_DEBUG] Top: %s (%.3f)", results[0].get('topic', 'N/A'), results[0].get('score', 0))
+                logger.debug("[VECTOR_SEARCH_DEBUG] Source: %s", results[0].get('source', 'N/A'))
             
             return results
             
@@ -180,6 +288,136 @@ class MongoDBClient:
             logger.error(f"[VECTOR_SEARCH_ERR] Unexpected error: {e}", exc_info=True)
             return []
     
+    def short_query_vector(
+        self,
+        query_embedding: List[float],
+        short_query_embedding: Optional[List[float]] = None
+    ) -> Optional[List[float]]:
+        """
+        First-pass query vector for the bound collection, or None for single-pass search
+        (no first-pass vectors, or a native collection queried without a native vector).
+        """
+        short_dimensions = self.collection_settings.get("short_dimensions", 0)
+        if not short_dimensions:
+            return None
+        if short_query_embedding is not None and len(short_query_embedding) == short_dimensions:
+            return list(short_query_embedding)
+        if self.collection_settings.get("short_mode") == "truncate":
+            return truncate_embedding(query_embedding, short_dimensions).tolist()
+        return None
+    
+    def _two_pass_search(
+        self,
+        query_embedding: List[float],
+        short_query: List[float],
+        limit: int,
+        similarity_threshold: float,
+        metadata_filters: Optional[Dict[str, Any]],
+        pre_filters: Optional[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        First pass: $vectorSearch on the low-dimension field for limit * SHORT_RERANK_FACTOR
+        candidates, returning only ids and full vectors. Second pass: exact 1024-dim cosine
+        rerank in NumPy; full documents are fetched for the winners only.
+        
+        Returns:
+            Results as vector_search returns them, or None if the first pass failed
+            (e.g. the index is still being rebuilt) so the caller searches in one pass
+        """
+        shortlist_size = limit * self.short_rerank_factor
+        vector_stage = {
+            "index": "vector_index",
+            "path": SHORT_EMBEDDING_FIELD,
+            "queryVector": encode_query(short_query),
+            "numCandidates": min(shortlist_size * 10, 10000),
+            "limit": shortlist_size
+        }
+        if pre_filters:
+            vector_stage["filter"] = pre_filters
+        pipeline = [{"$vectorSearch": vector_stage}]
+        if metadata_filters:
+            pipeline.append({"$match": metadata_filters})
+        pipeline.append({"$project": {"_id": 1, "embedding": 1}})
+        
+        try:
+            candidates = [
+                c for c in self.collection.aggregate(pipeline, maxTimeMS=30000)
+                if c.get("embedding") is not None
+            ]
+        except OperationFailure as e:
+            logger.warning(f"[VECTOR_SEARCH] Two-pass first pass failed, using single-pass search: {e}")
+            return None
+        if not candidates:
+            return []
+        
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        query_vec = query_vec / (np.linalg.norm(query_vec) or 1.0)
+        scores = cosine_to_score(decode_matrix(c["embedding"] for c in candidates) @ query_vec)
+        top = [int(i) for i in np.argsort(-scores)[:limit] if scores[i] >= similarity_threshold]
+        
+        documents = {}
+        if top:
+            projection = {field: 1 for field in SEARCH_FIELDS}
+            cursor = self.collection.find({"_id": {"$in": [candidates[i]["_id"] for i in top]}}, projection)
+            documents = {doc["_id"]: doc for doc in cursor}
+        results = [
+            {**documents[candidates[i]["_id"]], "score": float(scores[i])}
+            for i in top if candidates[i]["_id"] in documents
+        ]
+        
+        logger.debug(
+            "[VECTOR_SEARCH] Two-pass: %d %s-dim candidates, %d above threshold %s after 1024-dim rerank",
+            len(candidates), self.collection_settings['short_dimensions'], len(results), similarity_threshold
+        )
+        if results:
+            logger.debug("[VECTOR_SEARCH_DEBUG] Top: %s (%.3f)", results[0].get('topic', 'N/A'), results[0].get('score', 0))
+        return results
+    
+    def fetch_parents(self, parent_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch topic-level KB documents for passage chunks (one round-trip).
+        
+        Args:
+            parent_keys: parent_key values referenced by chunk documents
+        
+        Returns:
+            Dict mapping parent_key to its topic document (without embedding)
+        """
+        if not parent_keys:
+            return {}
+        try:
+            self.ensure_connection()
+            self.refresh_collection()
+            cursor = self.collection.find(
+                {"source": "knowledge_base", "parent_key": {"$in": list(parent_keys)}},
+                {"embedding": 0, SHORT_EMBEDDING_FIELD: 0, "passages": 0}
+            )
+            return {doc["parent_key"]: doc for doc in cursor}
+        except Exception as e:
+            logger.error(f"[FETCH_PARENTS_ERR] {e}")
+            return {}
+    
+    def fetch_passages(self, doc_ids: List[Any]) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        Fetch stored passages (text and embedding) for context compression (one round-trip).
+        
+        Args:
+            doc_ids: _id values of the documents to compress
+        
+        Returns:
+            Dict mapping _id to its passages (documents without passages are left out)
+        """
+        if not doc_ids:
+            return {}
+        try:
+            self.ensure_connection()
+            self.refresh_collection()
+            cursor = self.collection.find({"_id": {"$in": list(doc_ids)}}, {"passages": 1})
+            return {doc["_id"]: doc["passages"] for doc in cursor if doc.get("passages")}
+        except Exception as e:
+            logger.error(f"[FETCH_PASSAGES_ERR] {e}")
+            return {}
+    
     def insert_documents(self, documents: List[Dict[str, Any]]) -> bool:
         """Bulk insert documents with embeddings."""
         try:
@@ -197,6 +435,79 @@ class MongoDBClient:
             logger.error(f"[INSERT_ERR] {e}")
             return False
     
+    def ensure_ingestion_indexes(self):
+        """Unique doc_key index used by incremental upserts (legacy docs without a key are ignored)."""
+        try:
+            self.ensure_connection()
+            self.collection.create_index(
+                "doc_key",
+                name="doc_key_unique",
+                unique=True,
+                partialFilterExpression={"doc_key": {"$exists": True}}
+            )
+        except Exception as e:
+            logger.warning(f"[INDEX] Could not ensure doc_key index: {e}")
+    
+    def get_content_hashes(self, query: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Map doc_key -> content_hash for stored documents.
+        
+        Args:
+            query: Optional filter limiting which documents are considered
+        """
+        try:
+            self.ensure_connection()
+            cursor = self.collection.find(
+                {**(query or {}), "doc_key": {"$exists": True}},
+                {"_id": 0, "doc_key": 1, "content_hash": 1}
+            )
+            return {doc["doc_key"]: doc.get("content_hash", "") for doc in cursor}
+        except Exception as e:
+            logger.error(f"[HASHES_ERR] {e}")
+            return {}
+    
+    def upsert_documents(self, documents: List[Dict[str, Any]], batch_size: int = 200) -> bool:
+        """Replace-or-insert documents by doc_key using batched bulk_write."""
+        try:
+            if not documents:
+                logger.warning("[UPSERT] No documents to upsert")
+                return False
+            
+            self.ensure_connection()
+            
+            upserted = modified = 0
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                result = self.collection.bulk_write(
+                    [ReplaceOne({"doc_key": doc["doc_key"]}, doc, upsert=True) for doc in batch],
+                    ordered=False
+                )
+                upserted += result.upserted_count
+                modified += result.modified_count
+            
+            logger.info(f"[UPSERT_OK] {upserted} inserted, {modified} updated")
+            return True
+            
+        except Exception as e:
+            logger.error(f"[UPSERT_ERR] {e}")
+            return False
+    
+    def delete_stale_documents(self, scope: Dict[str, Any], keep_keys: set) -> int:
+        """
+        Delete documents in `scope` whose doc_key was not produced by the current ingestion run
+        (including legacy documents inserted before doc_keys existed).
+        
+        Returns:
+            Number of deleted documents
+        """
+        try:
+            self.ensure_connection()
+            result = self.collection.delete_many({**scope, "doc_key": {"$nin": list(keep_keys)}})
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"[DELETE_ERR] {e}")
+            return 0
+    
     def close(self):
         """Close MongoDB connection."""
         if self.client:
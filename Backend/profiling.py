@@ -0,0 +1,115 @@
+"""
+Request Profiling
+On-demand cProfile of single requests: main.py runs process_query under the profiler when a
+request carries "X-Profile: 1" and the admin token (PROFILE_ADMIN_TOKEN). Each profile is
+stored in PROFILE_DIR keyed by request ID, as a .prof file (pstats / snakeviz) and a text
+summary of the top functions by cumulative time that /profiles/{request_id} returns.
+
+Profiling is off unless PROFILE_ADMIN_TOKEN is set. Only one request is profiled at a time
+(the interpreter allows one active profiler); a concurrent X-Profile request runs unprofiled.
+"""
+import os
+import io
+import hmac
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from dotenv import load_dotenv
+from Backend.log_config import REQUEST_ID_PATTERN
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # Oldest profiles beyond this are deleted
+
+_lock = threading.Lock()
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """True if profiling is enabled and `token` is the admin token."""
+    if not PROFILE_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+
+@contextmanager
+def profile_request(req_id: str, label: str) -> Iterator[Optional[str]]:
+    """
+    Run the block under cProfile and store the profile as PROFILE_DIR/<req_id>.
+
+    Args:
+        req_id: Key of the stored profile (the request ID, see log_config.bind_request_id)
+        label: What was profiled, e.g. the endpoint
+
+    Yields:
+        req_id, or None if another request is being profiled
+    """
+    if not _lock.acquire(blocking=False):
+        logger.warning(f"[PROFILE] ❌ Another request is being profiled, {req_id} runs unprofiled")
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # a profiler or debugger is already active in this thread
+        _lock.release()
+        logger.warning(f"[PROFILE] ❌ Could not start profiler, {req_id} runs unprofiled: {e}")
+        yield None
+        return
+
+    start = time.perf_counter()
+    try:
+        yield req_id
+    finally:
+        profiler.disable()
+        _lock.release()
+        _save(profiler, req_id, label, time.perf_counter() - start)
+
+
+def _save(profiler: cProfile.Profile, req_id: str, label: str, seconds: float):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, req_id)
+        profiler.dump_stats(base + ".prof")
+
+        summary = io.StringIO()
+        summary.write(f"{label} request {req_id}: {seconds * 1e3:.1f} ms wall time\n")
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        logger.info(f"[PROFILE] ✅ Stored profile {req_id} ({label}, {seconds * 1e3:.0f} ms)")
+        _prune()
+    except Exception as e:
+        logger.warning(f"[PROFILE] ❌ Could not store profile {req_id}: {e}")
+
+
+def _prune():
+    profiles = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".prof")),
+        key=os.path.getmtime
+    )
+    for path in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        for stale in (path, path[: -len(".prof")] + ".txt"):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+def load_summary(req_id: str) -> Optional[str]:
+    """Text summary of a stored profile, or None if there is none."""
+    if not REQUEST_ID_PATTERN.fullmatch(req_id):
+        return None
+    path = os.path.join(PROFILE_DIR, req_id + ".txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
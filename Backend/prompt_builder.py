@@ -7,7 +7,9 @@ Backward-compatible signatures.
 
 import logging
 import re
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from Backend.text_splitter import estimate_tokens, split_sentences_with_breaks, normalize_sentence
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -114,26 +116,88 @@ KB-first with minimal append:
     GREETING_PATTERNS = [r'^\s*(hi|hello|hey|greetings|good\s+(morning|afternoon|evening)|sup|yo)\s*[!.,]?\s*$']
     FAREWELL_PATTERNS = [r'^\s*(bye|goodbye|see\s+you|farewell|ttyl|later|ciao|adios)\s*[!.,]?\s*$']
 
-    # Larger packing to preserve full lists
-    MAX_CONTEXT_CHUNKS = 3
-    CHUNK_TRUNCATE_CHARS = 3000
-
-    def __init__(self):
+    # Named alternatives in priority order. Start-anchored patterns are grouped under one
+    # leading ^ and word-boundary patterns share one \b, so the single scan stays cheap.
+    INTENT_MATCH_ORDER = (
+        ("greeting", GREETING_PATTERNS),
+        ("farewell", FAREWELL_PATTERNS),
+        ("continuation", CONTINUATION_PATTERNS),
+    )
+    INTENT_CACHE_SIZE = 512
+
+    # Context packing: the token budget per request mode is the real limit; chunk count is a backstop.
+    # The top-ranked chunk is always kept whole (at sentence granularity) so KB lists stay complete.
+    MAX_CONTEXT_CHUNKS = 6
+    CONTEXT_TOKEN_BUDGETS = {
+        "brief": 1500,
+        "continuation": 2500,
+        "careers": 3000,
+    }
+    # Hard ceiling for the top chunk when it alone exceeds the mode budget
+    TOP_CHUNK_MAX_TOKENS = 4000
+
+    def __init__(self, semantic_classifier=None):
         self.continuation_regex = re.compile('|'.join(self.CONTINUATION_PATTERNS), re.IGNORECASE)
         self.greeting_regex = re.compile('|'.join(self.GREETING_PATTERNS), re.IGNORECASE)
         self.farewell_regex = re.compile('|'.join(self.FAREWELL_PATTERNS), re.IGNORECASE)
+        # One compiled matcher classifies greeting/farewell/continuation in a single scan
+        self.intent_regex = self._compile_intent_matcher()
+        self._match_intent_cached = lru_cache(maxsize=self.INTENT_CACHE_SIZE)(self._match_intent_uncached)
+        # Optional SemanticIntentClassifier; regex stays the first pass
+        self.semantic_classifier = semantic_classifier
+
+    @staticmethod
+    def _make_intent(intent_type: str, confidence: float = 1.0, source: str = "regex") -> Dict[str, Any]:
+        return {
+            "intent_type": intent_type,
+            "is_continuation": intent_type == "continuation",
+            "is_greeting": intent_type == "greeting",
+            "is_farewell": intent_type == "farewell",
+            "is_out_of_scope": intent_type == "out_of_scope",
+            "confidence": confidence,
+            "source": source,
+        }
+
+    def _compile_intent_matcher(self) -> re.Pattern:
+        anchored, floating = [], []
+        for name, patterns in self.INTENT_MATCH_ORDER:
+            starts = [p[1:] for p in patterns if p.startswith('^')]
+            bounded = [p[2:] for p in patterns if p.startswith(r'\b')]
+            others = [p for p in patterns if not p.startswith(('^', r'\b'))]
+            if starts:
+                anchored.append(f"(?P<{name}_start>{'|'.join(starts)})")
+            if bounded or others:
+                parts = ([rf"\b(?:{'|'.join(bounded)})"] if bounded else []) + others
+                floating.append(f"(?P<{name}>{'|'.join(parts)})")
+        return re.compile(f"^(?:{'|'.join(anchored)})|{'|'.join(floating)}", re.IGNORECASE)
+
+    def _match_intent_uncached(self, text: str) -> str:
+        match = self.intent_regex.search(text)
+        return match.lastgroup.removesuffix("_start") if match else "query"
+
+    def match_intent(self, message: str) -> str:
+        """Regex intent type for a message, memoized on the stripped text."""
+        if not message or not message.strip():
+            return "query"
+        return self._match_intent_cached(message.strip())
 
     def detect_intent(self, message: str, chat_history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         if not message or not message.strip():
-            return {"intent_type": "query", "is_continuation": False, "is_greeting": False, "is_farewell": False, "confidence": 0.0}
-        text = message.strip()
-        if self.greeting_regex.match(text):
-            return {"intent_type": "greeting", "is_continuation": False, "is_greeting": True, "is_farewell": False, "confidence": 1.0}
-        if self.farewell_regex.match(text):
-            return {"intent_type": "farewell", "is_continuation": False, "is_greeting": False, "is_farewell": True, "confidence": 1.0}
-        if self.continuation_regex.search(text):
-            return {"intent_type": "continuation", "is_continuation": True, "is_greeting": False, "is_farewell": False, "confidence": 1.0}
-        return {"intent_type": "query", "is_continuation": False, "is_greeting": False, "is_farewell": False, "confidence": 1.0}
+            return self._make_intent("query", confidence=0.0)
+        return self._make_intent(self.match_intent(message))
+
+    def refine_intent(self, intent: Dict[str, Any], query_embedding: Optional[List[float]]) -> Dict[str, Any]:
+        """
+        Second pass for messages the regex classified as a plain query.
+        Reuses the retrieval query embedding, so it costs no extra network call.
+        """
+        if intent.get("intent_type") != "query" or not self.semantic_classifier or not query_embedding:
+            return intent
+        semantic = self.semantic_classifier.classify(query_embedding)
+        if not semantic or semantic["intent_type"] == "query":
+            return intent
+        logger.info("[INTENT] Semantic override: %s (%.3f)", semantic['intent_type'], semantic['confidence'])
+        return self._make_intent(semantic["intent_type"], confidence=semantic["confidence"], source="semantic")
 
     def build_system_prompt(
         self,
@@ -157,25 +221,99 @@ KB-first with minimal append:
                 "\n\n[INTERNAL NOTE - Not visible to user]\n"
                 "No KB content available. Be brief: acknowledge limited details and offer related AI/ML topics.\n"
             )
+        if not has_context and intent.get("is_out_of_scope", False):
+            system_prompt += (
+                "\n\n[INTERNAL NOTE - Not visible to user]\n"
+                "The message looks unrelated to AI/ML. If it is out of scope, reply with the exact out-of-scope line.\n"
+            )
 
         return system_prompt
 
-    def _pack_context(self, context_chunks: List[str]) -> str:
+    @staticmethod
+    def _split_chunk(chunk: str) -> Tuple[Optional[str], str]:
+        """
+        Split a retriever chunk ("Topic/Category/Level" header + "Content:" body)
+        into a one-line header and its body.
+        """
+        if not chunk.startswith("Topic:"):
+            return None, chunk
+        header_part, sep, body = chunk.partition("\nContent:\n")
+        if not sep:
+            return None, chunk
+        fields = {}
+        for line in header_part.splitlines():
+            key, _, value = line.partition(":")
+            if value.strip():
+                fields[key.strip().lower()] = value.strip()
+        topic = fields.get("topic", "N/A")
+        details = ", ".join(v for v in (fields.get("category"), fields.get("level")) if v and v != "N/A")
+        return (f"## {topic} ({details})" if details else f"## {topic}"), body
+
+    def _context_mode(self, query: str, intent: Dict[str, Any]) -> str:
+        if intent.get("is_continuation", False):
+            return "continuation"
+        ql = (query or "").lower()
+        if "future careers powered by ai" in ql or "careers in ai" in ql or "ai careers" in ql:
+            return "careers"
+        return "brief"
+
+    def _pack_context(self, context_chunks: List[str], mode: str = "brief") -> str:
+        """
+        Pack retrieved chunks into the prompt within a token budget.
+        Chunks arrive in relevance order; sentences already seen in a higher-ranked chunk are dropped,
+        each topic header is emitted once, and lower-ranked chunks only fill the remaining budget.
+        """
         if not context_chunks:
             return ""
+        budget = self.CONTEXT_TOKEN_BUDGETS.get(mode, self.CONTEXT_TOKEN_BUDGETS["brief"])
         section = "[Educational content (treat as your expertise for THIS TURN ONLY)]:\n\n"
-        added = 0
-        for chunk in context_chunks:
-            if not chunk:
+        used = estimate_tokens(section)
+
+        # header -> kept (sentence, starts a new line) pairs (insertion order = relevance)
+        topics: Dict[str, List[Tuple[str, bool]]] = {}
+        seen = set()
+        duplicates = 0
+        for rank, chunk in enumerate(c for c in context_chunks[: self.MAX_CONTEXT_CHUNKS] if c):
+            header, body = self._split_chunk(chunk)
+            header = header or ""
+            limit = max(budget, self.TOP_CHUNK_MAX_TOKENS) if rank == 0 else budget
+            if header not in topics:
+                header_cost = estimate_tokens(header)
+                if rank > 0 and used + header_cost >= budget:
+                    break
+                topics[header] = []
+                used += header_cost
+            kept = topics[header]
+            line_break = False  # a dropped sentence's line break moves to the next kept one
+            for sentence, new_line in split_sentences_with_breaks(body):
+                line_break = line_break or new_line
+                key = normalize_sentence(sentence)
+                if not key:
+                    continue  # punctuation-only fragment
+                if key in seen:
+                    duplicates += 1
+                    continue
+                cost = estimate_tokens(sentence)
+                if used + cost > limit:
+                    break  # stop at a sentence boundary; never cut an item mid-way
+                seen.add(key)
+                kept.append((sentence, line_break))
+                line_break = False
+                used += cost
+
+        for header, sentences in topics.items():
+            if not sentences:
                 continue
-            truncated = chunk[: self.CHUNK_TRUNCATE_CHARS]
-            if len(chunk) > self.CHUNK_TRUNCATE_CHARS:
-                truncated += "..."
-            section += truncated + "\n\n"
-            added += 1
-            if added >= self.MAX_CONTEXT_CHUNKS:
-                break
+            if header:
+                section += header + "\n"
+            section += sentences[0][0]
+            section += "".join(("\n" if new_line else " ") + sentence for sentence, new_line in sentences[1:])
+            section += "\n\n"
         section += "---\n\n"
+        logger.debug(
+            "[PROMPT] Packed %d topics, ~%d tokens (mode=%s, budget=%d), dropped %d duplicate sentences",
+            len(topics), used, mode, budget, duplicates
+        )
         return section
 
     def build_user_prompt(
@@ -196,15 +334,11 @@ KB-first with minimal append:
                 "Respond briefly and suggest related AI/ML topics you can help with."
             )
 
-        user_prompt = self._pack_context(context_chunks)
+        mode = self._context_mode(query, intent)
+        user_prompt = self._pack_context(context_chunks, mode=mode)
         user_prompt += f"Student Question: {query}\n\n"
 
-        ql = (query or "").lower()
-        hardlock_careers = (
-            "future careers powered by ai" in ql
-            or "careers in ai" in ql
-            or "ai careers" in ql
-        )
+        hardlock_careers = mode == "careers"
 
         # Optional footer citation
         footer_note = ""
@@ -4,13 +4,15 @@ Integrates intent detection, retrieval, prompt construction, and LLM generation.
 Cleaned pipeline without presentation tracking.
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 from Backend.models import Message
 from Backend.rag_retriever import RAGRetriever
 from Backend.prompt_builder import PromptBuilder
 from Backend.llm_client import GeminiClient
 from Backend.memory_manager import MemoryManager
+from Backend.semantic_intent import SemanticIntentClassifier
+from Backend.metrics import RequestTimer
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,27 +24,61 @@ logger = logging.getLogger(__name__)
 class RAGEngine:
     """RAG orchestrator with clean intent-based routing."""
     
-    def __init__(self):
-        """Initialize all RAG components."""
+    def __init__(
+        self,
+        retriever: Optional[RAGRetriever] = None,
+        llm_client: Optional[GeminiClient] = None
+    ):
+        """
+        Initialize all RAG components.
+        
+        Args:
+            retriever: Retriever to use instead of a new RAGRetriever
+            llm_client: LLM client to use instead of a new GeminiClient
+        """
         try:
-            self.retriever = RAGRetriever()
-            self.prompt_builder = PromptBuilder()
-            self.llm_client = GeminiClient()
+            self.retriever = retriever or RAGRetriever()
+            self.intent_classifier = self._init_intent_classifier()
+            self.prompt_builder = PromptBuilder(semantic_classifier=self.intent_classifier)
+            self.llm_client = llm_client or GeminiClient()
             self.memory_manager = MemoryManager(short_term_window=3)
             
             # Track last retrieval for continuations
             self.last_context_chunks = []
+            self.last_parent_keys = []
             self.last_query = ""
             
+            # KB re-ingestion promoted a new collection version: drop state built on the old one
+            self.retriever.mongo_client.add_version_listener(self._on_kb_version_change)
+            
             logger.info("[RAG_ENGINE] ✅ All components initialized")
         except Exception as e:
             logger.error(f"[RAG_ENGINE_ERR] Initialization failed: {e}")
             raise
     
+    def _on_kb_version_change(self, old_version, new_version):
+        """Invalidate continuation context retrieved from the previous KB version."""
+        logger.info(f"[RAG_ENGINE] KB version v{old_version} -> v{new_version}, clearing continuation context")
+        self.last_context_chunks = []
+        self.last_parent_keys = []
+    
+    def _init_intent_classifier(self):
+        """Build the embedding-based intent classifier (optional, regex-only on failure)."""
+        if os.getenv("SEMANTIC_INTENT_ENABLED", "true").lower() != "true":
+            logger.info("[RAG_ENGINE] Semantic intent disabled by config")
+            return None
+        try:
+            classifier = SemanticIntentClassifier(self.retriever.embedding_client)
+            return classifier if classifier.ready else None
+        except Exception as e:
+            logger.warning(f"[RAG_ENGINE] Semantic intent unavailable, using regex only: {e}")
+            return None
+    
     def process_query(
         self,
         query: str,
-        chat_history: List[Message]
+        chat_history: List[Message],
+        timer: Optional[RequestTimer] = None
     ) -> Dict[str, Any]:
         """
         Main processing pipeline.
@@ -50,20 +86,47 @@ class RAGEngine:
         Args:
             query: Current user query
             chat_history: Full conversation history
+            timer: Request trace to record into (main.py passes one to build Server-Timing
+                   and the debug payload); a fresh one is used when omitted
         
         Returns:
             Dict with 'answer' (str) and 'type' (str)
         """
+        with (timer or RequestTimer("rag")) as timer:
+            result = self._process_query(query, chat_history, timer)
+            timer.finish(result["type"])
+            return result
+    
+    def _process_query(
+        self,
+        query: str,
+        chat_history: List[Message],
+        timer: RequestTimer
+    ) -> Dict[str, Any]:
+        """process_query pipeline; each step is timed into `timer` (see Backend.metrics)."""
         try:
             # Step 1: Intent Detection
-            logger.info(f"[RAG_ENGINE] Step 1: Intent Detection")
-            intent = self.prompt_builder.detect_intent(query, chat_history)
-            logger.info(f"[RAG_ENGINE] Intent: {intent['intent_type']}, Continuation: {intent['is_continuation']}")
+            logger.debug("[RAG_ENGINE] Step 1: Intent Detection")
+            with timer.stage("intent"):
+                intent = self.prompt_builder.detect_intent(query, chat_history)
+            timer.intent = intent['intent_type']
+            logger.info("[RAG_ENGINE] Intent: %s, Continuation: %s", intent['intent_type'], intent['is_continuation'])
+            
+            # Step 1.5: Semantic refinement for plain queries, reusing the query vector
+            query_embedding = None
+            if intent['intent_type'] == "query":
+                query_embedding = self.retriever.embed_query(query)
+                with timer.stage("intent"):
+                    intent = self.prompt_builder.refine_intent(intent, query_embedding)
+                timer.intent = intent['intent_type']
+                if intent['source'] == "semantic":
+                    logger.info("[RAG_ENGINE] Semantic intent: %s", intent['intent_type'])
             
             # Step 2: Handle Greeting
             if intent['is_greeting']:
                 logger.info("[RAG_ENGINE] Greeting detected")
                 self.last_context_chunks = []
+                self.last_parent_keys = []
                 self.last_query = ""
                 return {
                     "answer": self.prompt_builder.build_greeting_response(),
@@ -74,6 +137,7 @@ class RAGEngine:
             if intent.get('is_farewell', False):
                 logger.info("[RAG_ENGINE] Farewell detected")
                 self.last_context_chunks = []
+                self.last_parent_keys = []
                 self.last_query = ""
                 return {
                     "answer": self.prompt_builder.build_farewell_response(),
@@ -81,59 +145,71 @@ class RAGEngine:
                 }
             
             # Step 3: Memory Management
-            logger.info(f"[RAG_ENGINE] Step 2: Memory Management")
-            short_term_history = self.memory_manager.get_short_term_context(chat_history)
-            formatted_history = self.memory_manager.format_for_llm(
-                short_term_history,
-                is_continuation=intent['is_continuation']
-            )
+            logger.debug("[RAG_ENGINE] Step 2: Memory Management")
+            with timer.stage("memory"):
+                short_term_history = self.memory_manager.get_short_term_context(chat_history)
+                formatted_history = self.memory_manager.format_for_llm(
+                    short_term_history,
+                    is_continuation=intent['is_continuation']
+                )
             
             if formatted_history:
-                logger.info(f"[RAG_ENGINE] Passing {len(formatted_history)} messages to LLM")
+                logger.debug("[RAG_ENGINE] Passing %d messages to LLM", len(formatted_history))
             else:
-                logger.info(f"[RAG_ENGINE] No history passed (saving tokens)")
+                logger.debug("[RAG_ENGINE] No history passed (saving tokens)")
             
             # Step 4: RAG Retrieval
-            logger.info(f"[RAG_ENGINE] Step 3: RAG Retrieval")
+            logger.debug("[RAG_ENGINE] Step 3: RAG Retrieval")
             
             # For continuations, reuse previous context instead of new search
             if intent['is_continuation'] and self.last_context_chunks:
                 logger.info("[RAG_ENGINE] Continuation detected - reusing previous context chunks")
+                # Reused context is a retrieval cache hit (the parent fetch below is one Mongo round-trip)
+                with timer.stage("retrieval", cache_hit=True):
+                    # Passage-level hits expand to their full parent topics only here, when more depth is asked for
+                    if self.last_parent_keys:
+                        self.last_context_chunks = self.retriever.get_parent_chunks(self.last_parent_keys) or self.last_context_chunks
+                        self.last_parent_keys = []
                 retrieval_result = {
                     "chunks": self.last_context_chunks,
                     "score_threshold_met": True,
                     "provenance": []
                 }
             else:
-                # Normal retrieval for new queries
-                retrieval_result = self.retriever.retrieve(query)
-                # Store for future continuations
-                self.last_context_chunks = retrieval_result["chunks"]
+                # Normal retrieval for new queries (embedding and vector search are also timed on their own)
+                with timer.stage("retrieval"):
+                    retrieval_result = self.retriever.retrieve(query, query_embedding=query_embedding)
+                timer.provenance = retrieval_result.get("provenance", [])
+                # Store for future continuations (uncompressed, since "tell me more" needs the rest of the topic)
+                self.last_context_chunks = retrieval_result.get("full_chunks") or retrieval_result["chunks"]
+                self.last_parent_keys = retrieval_result.get("parent_keys", [])
                 self.last_query = query
             
             has_context = retrieval_result["score_threshold_met"] and len(retrieval_result["chunks"]) > 0
             
-            logger.info(f"[RAG_ENGINE] Retrieved {len(retrieval_result['chunks'])} chunks, threshold met: {has_context}")
+            logger.info("[RAG_ENGINE] Retrieved %d chunks, threshold met: %s", len(retrieval_result['chunks']), has_context)
             
             # Step 5: Prompt Construction
-            logger.info(f"[RAG_ENGINE] Step 4: Prompt Construction")
-            system_prompt = self.prompt_builder.build_system_prompt(
-                intent,
-                has_context
-            )
-            user_prompt = self.prompt_builder.build_user_prompt(
-                query=query,
-                context_chunks=retrieval_result["chunks"],
-                intent=intent
-            )
+            logger.debug("[RAG_ENGINE] Step 4: Prompt Construction")
+            with timer.stage("prompt"):
+                system_prompt = self.prompt_builder.build_system_prompt(
+                    intent,
+                    has_context
+                )
+                user_prompt = self.prompt_builder.build_user_prompt(
+                    query=query,
+                    context_chunks=retrieval_result["chunks"],
+                    intent=intent
+                )
             
             # Step 6: LLM Generation
-            logger.info(f"[RAG_ENGINE] Step 5: LLM Generation")
-            llm_response = self.llm_client.generate_response(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                chat_history=formatted_history
-            )
+            logger.debug("[RAG_ENGINE] Step 5: LLM Generation")
+            with timer.stage("llm"):
+                llm_response = self.llm_client.generate_response(
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    chat_history=formatted_history
+                )
             
             if not llm_response["success"]:
                 logger.error(f"[RAG_ENGINE_ERR] LLM generation failed: {llm_response['error']}")
@@ -145,9 +221,10 @@ class RAGEngine:
             raw_answer = llm_response["response"]
             
             # Step 7: Response Classification
-            logger.info(f"[RAG_ENGINE] Step 6: Response Classification")
-            response_type = self._classify_response(raw_answer, has_context)
-            logger.info(f"[RAG_ENGINE] Response type: {response_type}")
+            logger.debug("[RAG_ENGINE] Step 6: Response Classification")
+            with timer.stage("postprocess"):
+                response_type = self._classify_response(raw_answer, has_context)
+            logger.info("[RAG_ENGINE] Response type: %s", response_type)
             
             return {
                 "answer": raw_answer,
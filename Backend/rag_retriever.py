@@ -4,10 +4,16 @@ RAG Retriever
 Performs semantic search on knowledge base collection only.
 Presentation logic completely removed - all content now in KB.
 """
+import os
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from Backend.embedding_client import BedrockEmbeddingClient
 from Backend.mongodb_client import MongoDBClient
+from Backend.context_compressor import ExtractiveCompressor
+from Backend.local_vector_index import LocalVectorIndex
+from Backend import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,18 +22,98 @@ logger = logging.getLogger(__name__)
 class RAGRetriever:
     """Semantic retrieval from knowledge base only."""
     
-    def __init__(self):
-        """Initialize retriever with embedding client and MongoDB connection."""
-        self.embedding_client = BedrockEmbeddingClient()
-        self.mongo_client = MongoDBClient()
+    def __init__(
+        self,
+        embedding_client: Optional[BedrockEmbeddingClient] = None,
+        mongo_client: Optional[MongoDBClient] = None
+    ):
+        """
+        Initialize retriever with embedding client and MongoDB connection.
+        
+        Args:
+            embedding_client: Client to use instead of a new BedrockEmbeddingClient
+            mongo_client: Client to use instead of a new MongoDBClient
+        """
+        self.embedding_client = embedding_client or BedrockEmbeddingClient()
+        self.mongo_client = mongo_client or MongoDBClient()
         self.similarity_threshold = 0.55  # Balanced threshold for semantic matching
+        self.lower_threshold = 0.45  # Fallback tier when nothing meets the main threshold
         self.max_results = 3  # Reduced for cleaner synthesis
-        logger.info(f"[RAG_RETRIEVER] Initialized with threshold={self.similarity_threshold}")
+        self.compressor = ExtractiveCompressor()
+        
+        # LRU of query vectors by (whitespace-normalized query, dimensions); primed at startup
+        # by Backend.warmup with frequent questions and KB topic titles
+        self.query_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+        self._query_cache: "OrderedDict[Tuple[str, int], List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        
+        # "chunk": search passage chunks and expand to the parent topic when needed; only on
+        # collections whose settings record chunk documents, others are searched by topic
+        # "topic": search whole-topic documents (pre-chunking behaviour)
+        self.granularity = os.getenv("RETRIEVAL_GRANULARITY", "chunk")
+        self.max_chunk_results = 6
+        self.expand_min_hits = 2  # Chunks from one topic needed to send the whole topic instead
+        
+        # Optional in-process copy of the KB vectors (exact search, no Atlas round-trip),
+        # mapped from LOCAL_INDEX_SNAPSHOT when one has been exported
+        self.local_index = None
+        if os.getenv("LOCAL_VECTOR_INDEX", "false").lower() == "true":
+            self.local_index = LocalVectorIndex(self.mongo_client)
+            if not self.local_index.bootstrap(os.getenv("LOCAL_INDEX_SNAPSHOT")):
+                logger.warning("[RAG_RETRIEVER] Local vector index unavailable, using Atlas search")
+        logger.info(f"[RAG_RETRIEVER] Initialized with threshold={self.similarity_threshold}, granularity={self.granularity}")
+    
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """
+        Generate the query embedding once so callers can reuse it
+        (semantic intent detection) before passing it back to retrieve().
+        """
+        return self._cached_embedding(query, 1024)
+    
+    def embed_short_query(self, query: str) -> Optional[List[float]]:
+        """
+        Native low-dimension query vector when the active collection's first-pass vectors
+        are native Titan output (one extra Bedrock call); truncated collections derive it
+        from the full query vector instead, so this returns None.
+        """
+        settings = self.mongo_client.collection_settings
+        if settings.get("short_dimensions") and settings.get("short_mode") == "native":
+            return self._cached_embedding(query, settings["short_dimensions"])
+        return None
+    
+    def _cached_embedding(self, query: str, dimensions: int) -> Optional[List[float]]:
+        """Query vector from the LRU cache, else from Bedrock (failures are not cached)."""
+        key = (" ".join(query.split()), dimensions)
+        with self._query_cache_lock:
+            embedding = self._query_cache.get(key)
+            if embedding is not None:
+                self._query_cache.move_to_end(key)
+        if embedding is not None:
+            timer = metrics.current_timer()
+            if timer is not None:
+                timer.add("embedding", 0.0, cache_hit=True)
+            return embedding
+        
+        with metrics.stage("embedding"):
+            embedding = self.embedding_client.generate_embedding(query, dimensions)
+        if embedding and self.query_cache_size > 0:
+            with self._query_cache_lock:
+                self._query_cache[key] = embedding
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return embedding
+    
+    def prime_query_cache(self, query: str) -> bool:
+        """Embed `query` into the cache (for the short first-pass vector too, if native)."""
+        embedding = self.embed_query(query)
+        self.embed_short_query(query)
+        return embedding is not None
     
     def retrieve(
         self,
         query: str,
-        metadata_filters: Optional[Dict[str, Any]] = None
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict[str, Any]:
         """
         Retrieve relevant context from knowledge base.
@@ -35,79 +121,205 @@ class RAGRetriever:
         Args:
             query: User query string
             metadata_filters: Optional filters (e.g., {"module_name": "module1_kb"})
+            query_embedding: Precomputed query vector (skips the Bedrock call)
         
         Returns:
             Dict with:
                 - chunks: List[str] - Retrieved text chunks
                 - provenance: List[Dict] - Source metadata with scores
                 - score_threshold_met: bool - Whether threshold was met
+                - parent_keys: List[str] - Parent topics of passage-level results
+                - full_chunks: List[str] - Uncompressed chunks (only when compression applied)
+                - compression: Dict - Original/compressed chars and ratio
         """
         try:
-            logger.info(f"[RETRIEVE] Query: {query}")
+            logger.debug("[RETRIEVE] Query: %s", query)
             
-            # Generate query embedding using AWS Bedrock
-            query_embedding = self.embedding_client.generate_embedding(query)
+            # Generate query embedding using AWS Bedrock (unless already computed)
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
             
             if not query_embedding:
                 logger.error("[RETRIEVE_ERR] Failed to generate query embedding")
                 return self._empty_result()
+            short_query_embedding = self.embed_short_query(query)
             
-            # Search knowledge base collection only
-            logger.info("[RETRIEVE] Searching knowledge base collection")
-            kb_filters = metadata_filters or {}
-            kb_filters["source"] = "knowledge_base"
+            if self.granularity == "chunk" and self.mongo_client.collection_settings.get("chunks"):
+                logger.debug("[RETRIEVE] Searching KB passage chunks")
+                chunk_results = self._search_with_fallback(
+                    query_embedding, "knowledge_base_chunk", self.max_chunk_results, metadata_filters,
+                    short_query_embedding
+                )
+                if chunk_results:
+                    result = self._format_results(self._expand_to_parents(chunk_results), query_embedding)
+                    # Topics a continuation can expand to in full
+                    result["parent_keys"] = [
+                        k for k in dict.fromkeys(p['parent_key'] for p in result["provenance"]) if k
+                    ]
+                    return result
+                logger.info("[RETRIEVE] No chunk matches, falling back to topic documents")
             
-            kb_results = self.mongo_client.vector_search(
-                query_embedding=query_embedding,
-                limit=self.max_results,
-                similarity_threshold=self.similarity_threshold,
-                metadata_filters=kb_filters
+            # Search knowledge base collection only
+            logger.debug("[RETRIEVE] Searching knowledge base collection")
+            kb_results = self._search_with_fallback(
+                query_embedding, "knowledge_base", self.max_results, metadata_filters, short_query_embedding
             )
-            
             if kb_results:
-                logger.info(f"[RETRIEVE] ✅ Found {len(kb_results)} KB chunks")
-                logger.info(f"[RETRIEVE_DEBUG] Top: {kb_results[0].get('topic', 'N/A')} (score: {kb_results[0].get('score', 0):.3f})")
-                return self._format_results(kb_results)
-            else:
-                # HALLUCINATION GUARDRAIL: When no chunks meet threshold, check if any chunks exist below threshold
-                # This allows LLM to synthesize from lower-scoring but relevant chunks rather than inventing content
-                logger.info(f"[RETRIEVE] No results above threshold {self.similarity_threshold}, checking for lower-scoring matches")
-                
-                # Try with lower threshold (0.45) to find ANY relevant content
-                lower_threshold_results = self.mongo_client.vector_search(
-                    query_embedding=query_embedding,
-                    limit=self.max_results,
-                    similarity_threshold=0.45,
-                    metadata_filters=kb_filters
-                )
-                
-                if lower_threshold_results:
-                    logger.info(f"[RETRIEVE] ✅ Found {len(lower_threshold_results)} chunks with lower threshold")
-                    logger.info(f"[RETRIEVE_DEBUG] Top: {lower_threshold_results[0].get('topic', 'N/A')} (score: {lower_threshold_results[0].get('score', 0):.3f})")
-                    return self._format_results(lower_threshold_results)
-                else:
-                    logger.warning(f"[RETRIEVE] ❌ No results found even with lower threshold")
-                    return self._empty_result()
+                return self._format_results(kb_results, query_embedding)
+            
+            logger.warning(f"[RETRIEVE] ❌ No results found even with lower threshold")
+            return self._empty_result()
             
         except Exception as e:
             logger.error(f"[RETRIEVE_ERR] Unexpected error: {e}", exc_info=True)
             return self._empty_result()
     
+    def _search_with_fallback(
+        self,
+        query_embedding: List[float],
+        source: str,
+        limit: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        short_query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Vector search at the main threshold, then at the lower threshold.
+        `short_query_embedding` is the native first-pass query for two-pass search.
+        
+        Returns:
+            Matching documents, or [] if neither tier matched
+        """
+        if self.local_index is not None and self.local_index.ready:
+            # One exact search at the lower tier answers both tiers
+            with metrics.vector_search(str(self.lower_threshold), "local"):
+                results = self.local_index.search(
+                    query_embedding, limit, self.lower_threshold, source=source, metadata_filters=metadata_filters,
+                    short_query_embedding=short_query_embedding
+                )
+            primary = [r for r in results if r["score"] >= self.similarity_threshold]
+            results = primary or results
+            if results:
+                tier = self.similarity_threshold if primary else self.lower_threshold
+                logger.info("[RETRIEVE] ✅ Found %d %s results at threshold %s (local index)", len(results), source, tier)
+            return results
+        
+        for threshold in (self.similarity_threshold, self.lower_threshold):
+            with metrics.vector_search(str(threshold), "atlas"):
+                results = self.mongo_client.vector_search(
+                    query_embedding=query_embedding,
+                    limit=limit,
+                    similarity_threshold=threshold,
+                    metadata_filters=metadata_filters,
+                    pre_filters={"source": source},
+                    short_query_embedding=short_query_embedding
+                )
+            if results:
+                logger.info("[RETRIEVE] ✅ Found %d %s results at threshold %s", len(results), source, threshold)
+                logger.debug("[RETRIEVE_DEBUG] Top: %s (score: %.3f)", results[0].get('topic', 'N/A'), results[0].get('score', 0))
+                return results
+            
+            # HALLUCINATION GUARDRAIL: When no chunks meet threshold, check if any chunks exist below threshold
+            # This allows LLM to synthesize from lower-scoring but relevant chunks rather than inventing content
+            if threshold == self.similarity_threshold:
+                logger.info("[RETRIEVE] No results above threshold %s, checking for lower-scoring matches", threshold)
+        return []
+    
+    def _expand_to_parents(self, chunk_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace chunk hits with their parent topic when several chunks of the same
+        topic matched (the question is about the topic as a whole). Keeps rank order.
+        """
+        hits: Dict[str, int] = {}
+        for doc in chunk_results:
+            key = doc.get('parent_key')
+            if key:
+                hits[key] = hits.get(key, 0) + 1
+        
+        expand_keys = [key for key, count in hits.items() if count >= self.expand_min_hits]
+        parents = self.mongo_client.fetch_parents(expand_keys) if expand_keys else {}
+        if parents:
+            logger.debug("[RETRIEVE] Expanding %d topics to parent documents", len(parents))
+        
+        expanded = []
+        emitted = set()
+        for doc in chunk_results:
+            key = doc.get('parent_key')
+            if key in parents:
+                if key in emitted:
+                    continue
+                emitted.add(key)
+                # The whole topic was asked for: sent in full, never compressed
+                expanded.append({**parents[key], "score": doc.get('score', 0.0), "expanded": True})
+            else:
+                expanded.append(doc)
+        return expanded
+    
+    def get_parent_chunks(self, parent_keys: List[str]) -> List[str]:
+        """
+        Full, uncompressed topic content for the given parents
+        (used when a continuation needs more than the matched passages).
+        """
+        parents = self.mongo_client.fetch_parents(parent_keys)
+        chunks = []
+        for key in parent_keys:
+            doc = parents.get(key)
+            content = doc and (doc.get('content') or doc.get('summary'))
+            if content:
+                chunks.append(self._format_chunk(doc, content))
+        return chunks
+    
+    def _passages_to_compress(self, results: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Stored passages of the results that may be compressed, by result index.
+        Searches do not project passages; they are read here in one round-trip, only for
+        documents the compressor would act on.
+        """
+        passages: Dict[int, List[Dict[str, Any]]] = {}
+        to_fetch: Dict[Any, int] = {}
+        for idx, doc in enumerate(results):
+            content = doc.get('content', '') or doc.get('summary', '')
+            if doc.get('expanded') or not content or not self.compressor.compressible(content):
+                continue
+            if doc.get('passages'):
+                passages[idx] = doc['passages']
+            elif doc.get('_id') is not None:
+                to_fetch[doc['_id']] = idx
+        if to_fetch:
+            for doc_id, doc_passages in self.mongo_client.fetch_passages(list(to_fetch)).items():
+                passages[to_fetch[doc_id]] = doc_passages
+        return passages
+    
+    def _format_chunk(self, doc: Dict[str, Any], content: str) -> str:
+        """Format one KB document's content with its topic metadata header."""
+        chunk_text = f"Topic: {doc.get('topic', 'N/A')}\n"
+        chunk_text += f"Category: {doc.get('category', 'N/A')}\n"
+        chunk_text += f"Level: {doc.get('level', 'N/A')}\n\n"
+        chunk_text += f"Content:\n{content}"
+        return chunk_text
+    
     def _format_results(
         self,
-        results: List[Dict[str, Any]]
+        results: List[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None
     ) -> Dict[str, Any]:
         """
         Format retrieval results into standard structure.
+        Long KB content is compressed to the passages most relevant to the query, except
+        lists and parent topics expanded from chunk hits, which are sent whole.
         
         Args:
             results: List of MongoDB documents
+            query_embedding: Query vector used to score stored passages
         
         Returns:
             Formatted result dict with chunks and provenance
         """
         chunks = []
+        full_chunks = []
         provenance = []
+        original_chars = 0
+        compressed_chars = 0
+        passages = self._passages_to_compress(results) if query_embedding is not None else {}
         
         for idx, doc in enumerate(results):
             # Handle KB documents - use full content if available, else summary
@@ -117,29 +329,42 @@ class RAGRetriever:
                 logger.warning(f"[RETRIEVE] Document {idx+1} has no content or summary")
                 continue
             
-            # Format KB chunk with metadata
-            chunk_text = f"Topic: {doc.get('topic', 'N/A')}\n"
-            chunk_text += f"Category: {doc.get('category', 'N/A')}\n"
-            chunk_text += f"Level: {doc.get('level', 'N/A')}\n\n"
-            chunk_text += f"Content:\n{content}"
+            compressed, _ = self.compressor.compress(content, passages.get(idx), query_embedding)
+            original_chars += len(content)
+            compressed_chars += len(compressed)
             
-            chunks.append(chunk_text)
+            # Format KB chunk with metadata
+            chunks.append(self._format_chunk(doc, compressed))
+            full_chunks.append(self._format_chunk(doc, content))
             provenance.append({
                 "doc_id": str(doc.get('_id', '')),
                 "topic": doc.get('topic', 'N/A'),
                 "score": round(doc.get('score', 0.0), 3),
-                "source": doc.get('source', 'N/A')
+                "source": doc.get('source', 'N/A'),
+                "parent_key": doc.get('parent_key')
             })
         
-        logger.info(f"[RETRIEVE_OK] Retrieved {len(chunks)} chunks")
-        logger.info(f"[RETRIEVE_DEBUG] Scores: {[p['score'] for p in provenance]}")
-        logger.info(f"[RETRIEVE_DEBUG] Topics: {[p['topic'] for p in provenance]}")
+        logger.info("[RETRIEVE_OK] Retrieved %d chunks", len(chunks))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[RETRIEVE_DEBUG] Scores: %s", [p['score'] for p in provenance])
+            logger.debug("[RETRIEVE_DEBUG] Topics: %s", [p['topic'] for p in provenance])
         
-        return {
+        ratio = round(original_chars / compressed_chars, 2) if compressed_chars else 1.0
+        logger.debug("[RETRIEVE] Context compression: %d -> %d chars (%sx)", original_chars, compressed_chars, ratio)
+        
+        result = {
             "chunks": chunks,
             "provenance": provenance,
-            "score_threshold_met": True
+            "score_threshold_met": True,
+            "compression": {
+                "original_chars": original_chars,
+                "compressed_chars": compressed_chars,
+                "ratio": ratio
+            }
         }
+        if compressed_chars < original_chars:
+            result["full_chunks"] = full_chunks
+        return result
     
     def _empty_result(self) -> Dict[str, Any]:
         """
@@ -0,0 +1,184 @@
+"""
+Semantic Intent Classifier
+Classifies user intent by comparing the already-computed query embedding against
+precomputed intent prototype vectors. Replaces the Gemini-based semantic fallback
+of the old IntentDetector: no extra network call per request.
+"""
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SemanticIntentClassifier:
+    """Nearest-prototype intent classifier over Titan query embeddings."""
+
+    # Exemplar phrasings per intent; each intent prototype is the normalized mean
+    # of its exemplar embeddings. Keep "query" broad so that genuine questions
+    # do not drift into the conversational intents.
+    INTENT_EXEMPLARS = {
+        "greeting": [
+            "hi there",
+            "hello, how are you doing today",
+            "hey AI Shine, nice to meet you",
+            "good morning, hope you are well",
+            "hey, what's up",
+        ],
+        "farewell": [
+            "bye, see you later",
+            "thanks, that's all for today",
+            "goodbye and thank you for the help",
+            "I have to go now, talk to you later",
+            "ok thanks bye",
+        ],
+        "continuation": [
+            "tell me more about that",
+            "can you explain that in more detail",
+            "go on, what else",
+            "please be more descriptive",
+            "keep going with the rest of the list",
+        ],
+        "query": [
+            "what is machine learning",
+            "explain how neural networks learn",
+            "what is the CRAFT prompting framework",
+            "how is AI used in education",
+            "what careers are powered by AI",
+            "difference between supervised and unsupervised learning",
+        ],
+        "out_of_scope": [
+            "what is the best pasta recipe",
+            "who won the football match yesterday",
+            "recommend a good movie to watch tonight",
+            "what is the capital of France",
+            "how do I fix my car engine",
+        ],
+    }
+
+    # Decision thresholds on cosine similarity (Titan v2 vectors are unit-normalized)
+    MIN_SIMILARITY = 0.5
+    MIN_MARGIN = 0.05
+
+    def __init__(self, embedding_client, prototypes_path: Optional[str] = None):
+        """
+        Initialize classifier, loading cached prototypes or building them once.
+
+        Args:
+            embedding_client: BedrockEmbeddingClient used only to embed exemplars
+            prototypes_path: Optional .npz cache for the prototype matrix
+        """
+        self.embedding_client = embedding_client
+        self.prototypes_path = prototypes_path or os.getenv("INTENT_PROTOTYPES_PATH", "intent_prototypes.npz")
+        self.labels: List[str] = list(self.INTENT_EXEMPLARS.keys())
+        self.prototypes: Optional[np.ndarray] = None  # (n_intents, dim) float32, L2-normalized
+        self.fingerprint = self._exemplar_fingerprint()
+
+        if not self._load_prototypes():
+            self.build_prototypes()
+
+    @property
+    def ready(self) -> bool:
+        return self.prototypes is not None
+
+    def _exemplar_fingerprint(self) -> str:
+        """Hash of exemplars + model so a stale cache is never reused."""
+        model_id = getattr(self.embedding_client, "model_id", "")
+        payload = json.dumps({"model": model_id, "exemplars": self.INTENT_EXEMPLARS}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _load_prototypes(self) -> bool:
+        """Load prototype matrix from the .npz cache if it matches the exemplars."""
+        if not self.prototypes_path or not os.path.exists(self.prototypes_path):
+            return False
+        try:
+            cached = np.load(self.prototypes_path, allow_pickle=False)
+            if str(cached["fingerprint"]) != self.fingerprint or list(cached["labels"]) != self.labels:
+                logger.info("[SEMANTIC_INTENT] Prototype cache is stale, rebuilding")
+                return False
+            self.prototypes = cached["prototypes"].astype(np.float32)
+            logger.info(f"[SEMANTIC_INTENT] Loaded {len(self.labels)} prototypes from {self.prototypes_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"[SEMANTIC_INTENT] Failed to load prototype cache: {e}")
+            return False
+
+    def build_prototypes(self) -> bool:
+        """
+        Embed all exemplars and average them into one unit vector per intent.
+
+        Returns:
+            True if prototypes are available afterwards
+        """
+        try:
+            prototypes = []
+            for label in self.labels:
+                vectors = [
+                    v for v in self.embedding_client.generate_batch_embeddings(self.INTENT_EXEMPLARS[label])
+                    if v
+                ]
+                if not vectors:
+                    logger.warning(f"[SEMANTIC_INTENT] No exemplar embeddings for '{label}', classifier disabled")
+                    return False
+                centroid = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+                prototypes.append(centroid / np.linalg.norm(centroid))
+
+            self.prototypes = np.vstack(prototypes).astype(np.float32)
+            logger.info(f"[SEMANTIC_INTENT] Built {len(self.labels)} intent prototypes")
+
+            if self.prototypes_path:
+                try:
+                    np.savez(
+                        self.prototypes_path,
+                        prototypes=self.prototypes,
+                        labels=np.array(self.labels),
+                        fingerprint=np.array(self.fingerprint)
+                    )
+                except OSError as e:
+                    logger.warning(f"[SEMANTIC_INTENT] Could not write prototype cache: {e}")
+            return True
+
+        except Exception as e:
+            logger.error(f"[SEMANTIC_INTENT_ERR] Failed to build prototypes: {e}")
+            self.prototypes = None
+            return False
+
+    def classify(self, query_embedding: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+        """
+        Classify a query from its embedding with one vectorized dot product.
+
+        Args:
+            query_embedding: Query vector already computed for retrieval
+
+        Returns:
+            Dict with 'intent_type', 'confidence', 'scores', or None if not confident
+        """
+        if self.prototypes is None or not query_embedding:
+            return None
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm == 0 or query_vec.shape[0] != self.prototypes.shape[1]:
+            return None
+
+        scores = self.prototypes @ (query_vec / norm)
+        ranked = np.argsort(scores)[::-1]
+        best, runner_up = int(ranked[0]), int(ranked[1])
+        best_score = float(scores[best])
+        margin = best_score - float(scores[runner_up])
+
+        if best_score < self.MIN_SIMILARITY or margin < self.MIN_MARGIN:
+            return None
+
+        return {
+            "intent_type": self.labels[best],
+            "confidence": round(best_score, 3),
+            "scores": {label: round(float(s), 3) for label, s in zip(self.labels, scores)}
+        }
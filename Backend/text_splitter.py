@@ -0,0 +1,189 @@
+"""
+Text Splitting Utilities
+Sentence splitting, token estimation and normalization shared by prompt packing
+and KB ingestion.
+"""
+import re
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+# Gemini/Titan tokenizers average ~4 characters per token on English prose
+CHARS_PER_TOKEN = 4
+
+# Never split right after a bare list marker such as "1." or "12."
+_SENTENCE_BOUNDARY = re.compile(
+    r'(?<=[.!?])(?<!^\d\.)(?<!\s\d\.)(?<!\s\d\d\.)\s+(?=[\"\'‘“(\[]?[A-Z0-9])|\n+'
+)
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_LIST_ITEM = re.compile(r'^(?:\d{1,2}[.)]|[•▪◦*-])\s+')
+# Inline heading: a short title-like phrase followed by a colon ("Why Question Quality Matters: ...")
+_INLINE_HEADING = re.compile(r"^([A-Z][\w'’&/-]*(?:\s+[\w'’&/-]+){2,7}):\s+\S")
+_LIST_LINE = re.compile(r'^(?:\d{1,2}[.)]|[•▪◦*-])\s+', re.MULTILINE)
+# KB lists are usually inline: "... 1. Generate Strong Openers: ... 2. Overcome Writer's Block: ..."
+_NUMBERED_ITEM = re.compile(r'(?<!\S)(?:(?:Rule|Step|Tip|Part)\s+)?(\d{1,2})[.):]\s+[A-Z]')
+_LETTER_ITEM = re.compile(r'(?<!\S)[A-Z]\s+[=–-]\s+[A-Z]')  # "C = Context: ...", "R - Role: ..."
+_INLINE_BULLET = re.compile(r'(?<!\S)[•▪◦→]\s')
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round-trip)."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences without breaking inline lists.
+    Only splits after terminal punctuation followed by a capitalized start, or on newlines,
+    so "AI powers: Voice Assistants: ..., Smart Cameras: ..." stays one unit.
+    """
+    if not text:
+        return []
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+
+def split_sentences_with_breaks(text: str) -> List[Tuple[str, bool]]:
+    """
+    split_sentences keeping the layout: each sentence with whether it starts a new line
+    (list item, heading, line break) rather than continuing the previous one.
+    """
+    if not text:
+        return []
+    sentences = []
+    new_line = False
+    start = 0
+    for boundary in chain(_SENTENCE_BOUNDARY.finditer(text), [None]):
+        sentence = text[start:boundary.start() if boundary else len(text)].strip()
+        if sentence:
+            sentences.append((sentence, new_line))
+            new_line = False
+        if boundary:
+            new_line = new_line or "\n" in boundary.group()
+            start = boundary.end()
+    return sentences
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Normalization key used for cross-chunk sentence deduplication."""
+    return _WHITESPACE.sub(' ', _NON_WORD.sub('', sentence.lower())).strip()
+
+
+def is_enumeration(text: str) -> bool:
+    """
+    True if the text is (or contains) a list: item lines, an inline numbered sequence
+    starting at 1 ("1. ...", "Rule 1: ..."), lettered items, several inline bullets / arrows,
+    or several inline headings ("AI in Education: ...").
+    """
+    if not text:
+        return False
+    if len(_LIST_LINE.findall(text)) >= 2:
+        return True
+    numbers = {int(m.group(1)) for m in _NUMBERED_ITEM.finditer(text)}
+    if {1, 2} <= numbers:
+        return True
+    if len(_LETTER_ITEM.findall(text)) >= 3 or len(_INLINE_BULLET.findall(text)) >= 3:
+        return True
+    return sum(1 for sentence in split_sentences(text) if _inline_heading(sentence)) >= 3
+
+
+def split_passages(text: str, max_tokens: int = 80) -> List[str]:
+    """Group consecutive sentences into passages of at most ~max_tokens each."""
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in split_sentences(text):
+        cost = estimate_tokens(sentence)
+        if current and current_tokens + cost > max_tokens:
+            passages.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += cost
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _inline_heading(sentence: str) -> Optional[str]:
+    match = _INLINE_HEADING.match(sentence)
+    if not match:
+        return None
+    words = match.group(1).split()
+    capitalized = sum(1 for w in words if w[0].isupper() or len(w) <= 3)
+    return match.group(1) if capitalized == len(words) else None
+
+
+def _structural_units(text: str) -> List[Dict[str, Any]]:
+    """
+    Break content into units that must not be split across chunks when avoidable:
+    a heading with its first sentences, one list item with its description, or a paragraph.
+    """
+    units: List[Dict[str, Any]] = []
+    section = None
+    in_list = False
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        line = paragraph.strip()
+        # Standalone short line without terminal punctuation: a DOCX-style heading
+        if line and "\n" not in line and len(line.split()) <= 12 and line[-1] not in ".!?:;,":
+            section = line
+            in_list = False
+            units.append({"kind": "heading", "section": section, "sentences": [line]})
+            continue
+        started = False
+        for sentence in split_sentences(paragraph):
+            heading = None if in_list else _inline_heading(sentence)
+            if _LIST_ITEM.match(sentence):
+                in_list = True
+                units.append({"kind": "item", "section": section, "sentences": [sentence]})
+            elif heading:
+                section = heading
+                units.append({"kind": "heading", "section": section, "sentences": [sentence]})
+            elif not started or not units:
+                in_list = False  # a new non-item paragraph closes any open list
+                units.append({"kind": "text", "section": section, "sentences": [sentence]})
+            else:
+                units[-1]["sentences"].append(sentence)
+            started = True
+    return units
+
+
+def chunk_structured(text: str, max_tokens: int = 200, overlap_sentences: int = 1) -> List[Dict[str, Any]]:
+    """
+    Structure-aware chunking for ingestion.
+    Splits on headings and list items, packs whole units up to ~max_tokens, and carries the
+    last `overlap_sentences` sentences into the next chunk (except across a new heading).
+
+    Returns:
+        List of {"text", "section", "chunk_index"} dicts
+    """
+    chunks: List[Dict[str, Any]] = []
+    current: List[str] = []
+    current_tokens = 0
+    current_section = None
+
+    def flush(carry: bool):
+        nonlocal current, current_tokens
+        if not current:
+            return
+        chunks.append({"text": " ".join(current), "section": current_section, "chunk_index": len(chunks)})
+        current = current[-overlap_sentences:] if carry and overlap_sentences > 0 else []
+        current_tokens = sum(estimate_tokens(s) for s in current)
+
+    for unit in _structural_units(text):
+        unit_tokens = sum(estimate_tokens(s) for s in unit["sentences"])
+        new_section = unit["kind"] == "heading"
+        if current and (current_tokens + unit_tokens > max_tokens or (new_section and current_tokens >= max_tokens // 2)):
+            flush(carry=not new_section)
+        if not current or new_section:
+            current_section = unit["section"]
+        for sentence in unit["sentences"]:
+            cost = estimate_tokens(sentence)
+            # Oversized units are split at sentence boundaries
+            if current and current_tokens + cost > max_tokens and current_tokens > 0 and unit_tokens > max_tokens:
+                flush(carry=True)
+            current.append(sentence)
+            current_tokens += cost
+    flush(carry=False)
+    return chunks
@@ -0,0 +1,103 @@
+"""
+Vector Codec
+Packs embeddings as BSON BinData vectors (subtype 9) instead of arrays of doubles and
+decodes them straight into NumPy. A 1024-dim vector is ~4 KB as float32 and ~1 KB as int8,
+versus ~9 KB as a BSON array of doubles, and float32 payloads decode as a zero-copy view.
+"""
+import os
+import logging
+from typing import Any, Iterable, List, Union
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# float32 | int8 | array (legacy list of doubles)
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32").lower()
+
+VECTOR_SUBTYPE = 9
+_HEADER_BYTES = 2  # dtype byte + bit-padding byte
+_NUMPY_DTYPES = {
+    BinaryVectorDtype.FLOAT32.value[0]: np.dtype("<f4"),
+    BinaryVectorDtype.INT8.value[0]: np.dtype(np.int8),
+}
+
+
+def quantize_int8(vector: Union[List[float], np.ndarray]) -> np.ndarray:
+    """
+    Per-vector symmetric int8 quantization (scale by max |x| to 127).
+    The scale is dropped: cosine similarity is scale-invariant.
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    peak = float(np.max(np.abs(values))) if values.size else 0.0
+    if peak == 0.0:
+        return np.zeros(values.shape, dtype=np.int8)
+    return np.clip(np.rint(values * (127.0 / peak)), -127, 127).astype(np.int8)
+
+
+def encode_vector(vector: Union[List[float], np.ndarray], storage: str = None) -> Any:
+    """
+    Encode an embedding for storage.
+
+    Args:
+        vector: Embedding as list or array
+        storage: float32 | int8 | array (defaults to VECTOR_STORAGE)
+
+    Returns:
+        bson Binary vector, or a plain list for "array" storage
+    """
+    storage = storage or VECTOR_STORAGE
+    if storage == "array":
+        return [float(x) for x in vector]
+    if storage == "int8":
+        return Binary.from_vector(quantize_int8(vector).tolist(), BinaryVectorDtype.INT8)
+    return Binary.from_vector(np.asarray(vector, dtype=np.float32).tolist(), BinaryVectorDtype.FLOAT32)
+
+
+def encode_query(vector: List[float], storage: str = None) -> Any:
+    """Query vector in the representation matching stored vectors ($vectorSearch.queryVector)."""
+    storage = storage or VECTOR_STORAGE
+    return encode_vector(vector, storage) if storage == "int8" else vector
+
+
+def truncate_embedding(vector: Union[List[float], np.ndarray], dimensions: int) -> np.ndarray:
+    """First `dimensions` components, re-normalized to unit length (Matryoshka-style truncation)."""
+    prefix = np.asarray(vector, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    return prefix / np.where(norms == 0, 1.0, norms)
+
+
+def cosine_to_score(cosine):
+    """Atlas vectorSearchScore for cosine similarity, (1 + cos) / 2, so thresholds are comparable."""
+    return (1.0 + cosine) / 2.0
+
+
+def decode_vector(value: Any) -> np.ndarray:
+    """
+    Decode a stored embedding (BinData vector or list) into a 1-D array.
+    float32 BinData is returned as a read-only view over the BSON bytes (no copy).
+    """
+    if isinstance(value, Binary) and value.subtype == VECTOR_SUBTYPE:
+        dtype = _NUMPY_DTYPES.get(value[0])
+        if dtype is None:
+            raise ValueError(f"Unsupported vector dtype byte {value[0]:#x}")
+        return np.frombuffer(value, dtype=dtype, offset=_HEADER_BYTES)
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_matrix(values: Iterable[Any]) -> np.ndarray:
+    """
+    Stack stored embeddings into one (n, dim) float32 matrix with L2-normalized rows,
+    so row @ query is cosine similarity for float32, int8 and legacy arrays alike.
+    """
+    rows = [decode_vector(v) for v in values]
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    matrix = np.vstack(rows).astype(np.float32, copy=False)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,129 @@
+"""
+Startup Warm-Up
+Runs after an engine is built (in its background thread, while /health already answers) so
+the first student request does not pay for cold connections and caches:
+  - pings MongoDB so the pool has live connections
+  - a canary retrieval: Bedrock TLS + query embedding, vector search (Atlas or local index)
+  - a Gemini token count, which opens the TLS connection without generating anything
+  - primes the query embedding cache with the most frequent captured questions
+    (WARMUP_QUERIES_PATH, captured requests or one question per line) and KB topic titles
+
+Every step is timed and failures are recorded, never raised: a failed warm-up only means
+the first requests are slower.
+"""
+import os
+import json
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_QUERIES_PATH = os.getenv("WARMUP_QUERIES_PATH", "")
+WARMUP_MAX_QUERIES = int(os.getenv("WARMUP_MAX_QUERIES", "100"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+CANARY_QUERY = "What is artificial intelligence?"
+
+
+def frequent_queries(path: str, limit: int) -> List[str]:
+    """
+    Most frequent student questions in `path`.
+
+    Args:
+        path: Requests captured with CAPTURE_REQUESTS_PATH (the last human message of each
+            line counts), or plain text with one question per line
+        limit: Maximum number of questions
+
+    Returns:
+        Questions, most frequent first (empty if the file is missing)
+    """
+    if not path or not os.path.exists(path):
+        return []
+    counts: Counter = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                humans = [m.get("content") for m in record.get("chat_history", []) if m.get("role") == "human"]
+                query = humans[-1] if humans else None
+            except (json.JSONDecodeError, AttributeError):
+                query = line
+            if isinstance(query, str) and query.strip():
+                counts[query.strip()] += 1
+    return [query for query, _ in counts.most_common(limit)]
+
+
+def kb_topic_titles(mongo_client, limit: int) -> List[str]:
+    """Topic titles of the active KB collection."""
+    cursor = mongo_client.collection.find({"source": "knowledge_base"}, {"topic": 1, "_id": 0})
+    return list(dict.fromkeys(doc["topic"] for doc in cursor if doc.get("topic")))[:limit]
+
+
+def _step(steps: Dict[str, Any], name: str, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    try:
+        result = fn()
+        steps[name] = round((time.perf_counter() - start) * 1e3, 1)
+        return result
+    except Exception as e:
+        steps[name] = f"error: {e}"
+        logger.warning(f"[WARMUP] ❌ {name} failed: {e}")
+        return None
+
+
+def warm_up_rag_engine(engine) -> Dict[str, Any]:
+    """
+    Warm the original engine's connections and query embedding cache.
+
+    Returns:
+        Report with 'steps' (ms, or the error), 'primed' queries and total 'seconds'
+    """
+    start = time.perf_counter()
+    retriever = engine.retriever
+    steps: Dict[str, Any] = {}
+
+    _step(steps, "mongodb_ping", lambda: retriever.mongo_client.client.admin.command("ping"))
+    _step(steps, "canary_retrieval", lambda: retriever.retrieve(CANARY_QUERY))
+    _step(steps, "gemini_connect", lambda: engine.llm_client.model.count_tokens(CANARY_QUERY))
+
+    queries = frequent_queries(WARMUP_QUERIES_PATH, WARMUP_MAX_QUERIES)
+    topics = _step(steps, "kb_topics", lambda: kb_topic_titles(retriever.mongo_client, WARMUP_MAX_QUERIES)) or []
+    to_prime = list(dict.fromkeys(queries + topics))[:WARMUP_MAX_QUERIES]
+
+    def prime_all() -> int:
+        with ThreadPoolExecutor(max_workers=max(WARMUP_CONCURRENCY, 1), thread_name_prefix="warmup") as pool:
+            return sum(pool.map(retriever.prime_query_cache, to_prime))
+
+    primed = _step(steps, "prime_embeddings", prime_all) or 0
+    report = {"steps": steps, "primed": primed, "seconds": round(time.perf_counter() - start, 3)}
+    logger.info(
+        f"[WARMUP] ✅ Original RAG Engine warmed in {report['seconds']:.2f}s "
+        f"({primed}/{len(to_prime)} queries primed: {len(queries)} frequent, {len(topics)} topics)"
+    )
+    return report
+
+
+def warm_up_langchain_engine(engine) -> Dict[str, Any]:
+    """
+    Warm the LangChain engine's Bedrock and Atlas connections with a canary search.
+    The chat model is not called (LangChain has no side-effect-free request for it).
+    """
+    start = time.perf_counter()
+    steps: Dict[str, Any] = {}
+    _step(steps, "mongodb_ping", lambda: engine.retriever.db.client.admin.command("ping"))
+    _step(
+        steps, "canary_search",
+        lambda: engine.retriever.vector_search.similarity_search_with_score(
+            query=CANARY_QUERY, k=1, pre_filter={"source": "knowledge_base"}
+        )
+    )
+    report = {"steps": steps, "seconds": round(time.perf_counter() - start, 3)}
+    logger.info(f"[WARMUP] ✅ LangChain RAG Engine warmed in {report['seconds']:.2f}s")
+    return report
@@ -0,0 +1,403 @@
+"""
+Offline Stand-ins
+Deterministic replacements for Bedrock, Atlas and Gemini at the SDK boundary, so the real
+clients (BedrockEmbeddingClient, MongoDBClient, GeminiClient, the LangChain retriever) run
+unchanged on any machine with no network or credentials.
+
+Each stand-in sleeps for a LatencyModel sample per call; the time injected on the current
+thread is tracked so benchmarks can separate our own pipeline overhead from simulated
+network time.
+
+    embedding_client = BedrockEmbeddingClient(client=FakeBedrockRuntime(LatencyModel(60, 250)))
+    mongo_client = MongoDBClient(client=FakeMongoClient(documents, search=LatencyModel(40, 150)))
+    llm_client = GeminiClient(model=FakeGenerativeModel(LatencyModel(1800, 6000)))
+"""
+import io
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from pymongo.errors import OperationFailure
+
+from Backend.collection_versions import SETTINGS_COLLECTION, VECTOR_ALIAS
+from Backend.vector_codec import cosine_to_score, decode_matrix, decode_vector
+
+EMBEDDING_DIMENSIONS = 1024
+
+_injected = threading.local()
+
+
+def reset_injected():
+    """Start counting simulated latency for a new request on this thread."""
+    _injected.seconds = 0.0
+
+
+def injected_seconds() -> float:
+    """Simulated latency slept on this thread since reset_injected()."""
+    return getattr(_injected, "seconds", 0.0)
+
+
+class LatencyModel:
+    """
+    Log-normal service time with the given median and p99 (ms), multiplied by `scale`.
+    A zero median disables the delay.
+    """
+
+    # z-score of the 99th percentile of a standard normal
+    P99_Z = 2.326
+
+    def __init__(self, median_ms: float = 0.0, p99_ms: Optional[float] = None, scale: float = 1.0, seed: int = 0):
+        self.median_ms = median_ms
+        self.p99_ms = p99_ms or median_ms
+        self.scale = scale
+        self.mu = math.log(median_ms) if median_ms > 0 else 0.0
+        self.sigma = math.log(self.p99_ms / median_ms) / self.P99_Z if median_ms > 0 else 0.0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """One service time in seconds."""
+        if self.median_ms <= 0 or self.scale <= 0:
+            return 0.0
+        with self._lock:
+            ms = self._random.lognormvariate(self.mu, self.sigma)
+        return ms * self.scale / 1e3
+
+    def sleep(self):
+        seconds = self.sample()
+        if seconds > 0:
+            time.sleep(seconds)
+            _injected.seconds = injected_seconds() + seconds
+
+    def __repr__(self) -> str:
+        return f"LatencyModel(median={self.median_ms}ms, p99={self.p99_ms}ms, scale={self.scale})"
+
+
+# -------------------------------------------------------------------------
+# Embeddings
+# -------------------------------------------------------------------------
+
+_TOKEN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _feature(token: str):
+    """Stable (index, sign) of a token in the hashed feature space."""
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % EMBEDDING_DIMENSIONS, 1.0 if digest >> 63 else -1.0
+
+
+def hashing_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """
+    Deterministic unit vector from hashed unigrams and bigrams: texts sharing words score
+    higher, so retrieval returns plausible topics. Smaller sizes are the renormalized prefix,
+    like Titan's Matryoshka-trained outputs.
+    """
+    words = _TOKEN.findall(text.lower())
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    vector[0] = 0.1  # keeps empty texts non-zero
+    for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        index, sign = _feature(token)
+        vector[index] += sign
+    prefix = vector[:dimensions]
+    return (prefix / np.linalg.norm(prefix)).tolist()
+
+
+class FakeBedrockRuntime:
+    """bedrock-runtime client whose invoke_model answers Titan v2 embedding requests."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+
+    def invoke_model(self, modelId: str, body: str, contentType: str = "application/json", accept: str = "application/json"):
+        request = json.loads(body)
+        self.latency.sleep()
+        text = request["inputText"]
+        payload = {
+            "embedding": hashing_embedding(text, request.get("dimensions", EMBEDDING_DIMENSIONS)),
+            "inputTextTokenCount": len(_TOKEN.findall(text))
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+class HashingEmbeddings:
+    """LangChain Embeddings interface over hashing_embedding (for LangChainMongoRetriever)."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.sleep()
+        return hashing_embedding(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+# -------------------------------------------------------------------------
+# MongoDB Atlas
+# -------------------------------------------------------------------------
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+_OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+}
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Subset of MongoDB query semantics: equality, $and/$or and the comparison operators above."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            for op, arg in condition.items():
+                if op not in _OPERATORS:
+                    raise OperationFailure(f"Unsupported query operator {op}")
+                if not _OPERATORS[op](value, arg):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]], score: Optional[float] = None) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection ({"$meta": "vectorSearchScore"} resolves to `score`)."""
+    if not projection:
+        return dict(doc)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if all(v in (0, False) for v in fields.values()):
+        result = {k: v for k, v in doc.items() if k not in fields}
+    else:
+        result = {"_id": doc["_id"]} if "_id" in doc else {}
+        for key, value in fields.items():
+            if isinstance(value, dict) and value.get("$meta") == "vectorSearchScore":
+                result[key] = score
+            elif value and key in doc:
+                result[key] = doc[key]
+    if projection.get("_id") in (0, False):
+        result.pop("_id", None)
+    return result
+
+
+class FakeCollection:
+    """In-memory collection with exact (brute-force) $vectorSearch on the Atlas score scale."""
+
+    def __init__(self, name: str, search: LatencyModel, roundtrip: LatencyModel):
+        self.name = name
+        self.search_latency = search
+        self.roundtrip = roundtrip
+        self.documents: List[Dict[str, Any]] = []
+        self._matrices: Dict[str, Any] = {}
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]]):
+        for doc in documents:
+            doc = dict(doc)
+            doc.setdefault("_id", f"{self.name}:{len(self.documents)}")
+            self.documents.append(doc)
+        self._matrices = {}
+
+    def _matrix(self, path: str):
+        """(rows with a vector at `path`, normalized matrix), cached until the next insert."""
+        if path not in self._matrices:
+            rows = [i for i, doc in enumerate(self.documents) if _get(doc, path) is not None]
+            self._matrices[path] = (np.asarray(rows, dtype=np.int64), decode_matrix(_get(self.documents[i], path) for i in rows))
+        return self._matrices[path]
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        self.roundtrip.sleep()
+        return next((project(doc, projection) for doc in self.documents if matches(doc, query)), None)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs):
+        self.roundtrip.sleep()
+        return [project(doc, projection) for doc in self.documents if matches(doc, query)]
+
+    def count_documents(self, query: Optional[Dict[str, Any]] = None, **kwargs) -> int:
+        self.roundtrip.sleep()
+        return sum(1 for doc in self.documents if matches(doc, query))
+
+    def _vector_search(self, stage: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows, matrix = self._matrix(stage["path"])
+        if not len(rows):
+            return []
+        query = decode_vector(stage["queryVector"]).astype(np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            raise OperationFailure(f"queryVector has {query.shape[0]} dimensions, {stage['path']} has {matrix.shape[1]}")
+        scores = cosine_to_score(matrix @ (query / (np.linalg.norm(query) or 1.0)))
+        hits = []
+        for i in np.argsort(-scores):
+            doc = self.documents[rows[i]]
+            if matches(doc, stage.get("filter")):
+                hits.append({**doc, "__score": float(scores[i])})
+                if len(hits) >= stage["limit"]:
+                    break
+        return hits
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+        self.search_latency.sleep()
+        docs = [dict(doc) for doc in self.documents]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$vectorSearch":
+                docs = self._vector_search(spec)
+            elif name in ("$addFields", "$set"):
+                for doc in docs:
+                    for key, value in spec.items():
+                        doc[key] = doc.get("__score") if value == {"$meta": "vectorSearchScore"} else value
+            elif name == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$project":
+                docs = [{**project(doc, spec, doc.get("__score")), "__score": doc.get("__score")} for doc in docs]
+            elif name == "$limit":
+                docs = docs[:spec]
+            else:
+                raise OperationFailure(f"Unsupported aggregation stage {name}")
+        for doc in docs:
+            doc.pop("__score", None)
+        return docs
+
+
+class _Admin:
+    def __init__(self, roundtrip: LatencyModel):
+        self.roundtrip = roundtrip
+
+    def command(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        self.roundtrip.sleep()
+        return {"ok": 1.0}
+
+
+class FakeDatabase:
+    def __init__(self, client: "FakeMongoClient"):
+        self.client = client
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, self.client.search, self.client.roundtrip)
+        return self.collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self.collections)
+
+
+class FakeMongoClient:
+    """
+    MongoClient stand-in. Every database name maps to the same in-memory database, whose
+    unversioned KB collection (the alias name, active when no alias document exists) holds
+    `documents`. As after a full sync, collection_settings records whether they include
+    passage chunks.
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[Dict[str, Any]] = (),
+        search: Optional[LatencyModel] = None,
+        roundtrip: Optional[LatencyModel] = None
+    ):
+        self.search = search or LatencyModel()
+        self.roundtrip = roundtrip or LatencyModel()
+        self.admin = _Admin(self.roundtrip)
+        self.database = FakeDatabase(self)
+        documents = list(documents)
+        self.database[VECTOR_ALIAS].insert_many(documents)
+        if any(doc.get("source") == "knowledge_base_chunk" for doc in documents):
+            self.database[SETTINGS_COLLECTION].insert_many([{"_id": VECTOR_ALIAS, "chunks": True}])
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        return self.database
+
+    def close(self):
+        pass
+
+
+# -------------------------------------------------------------------------
+# Gemini
+# -------------------------------------------------------------------------
+
+_TOPIC_LINE = re.compile(r"^Topic: (.+)$", re.MULTILINE)
+
+
+def fake_answer(prompt: str, answer_words: int = 120) -> str:
+    """Structured answer built from the words (and topic headers) of the prompt's context."""
+    if "[No educational content available" in prompt:
+        return "I specialize in AI and Machine Learning topics. Could you ask about one of those?"
+    words = _TOKEN.findall(prompt) or ["answer"]
+    body = " ".join(words[(i * 7) % len(words)] for i in range(answer_words))
+    topics = list(dict.fromkeys(_TOPIC_LINE.findall(prompt))) or ["Overview"]
+    points = "\n".join(f"• <strong>{topic}</strong>: {body[:80]}" for topic in topics)
+    return f"Answer: {body}\n\nKey Points:\n{points}"
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeChatSession:
+    def __init__(self, model: "FakeGenerativeModel"):
+        self.model = model
+
+    def send_message(self, content: str) -> FakeResponse:
+        return self.model.generate_content(content)
+
+
+class FakeGenerativeModel:
+    """google.generativeai.GenerativeModel stand-in (generate_content / start_chat / count_tokens)."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None, answer_words: int = 120):
+        self.latency = latency or LatencyModel()
+        self.answer_words = answer_words
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        self.latency.sleep()
+        return FakeResponse(fake_answer(prompt, self.answer_words))
+
+    def start_chat(self, history: Optional[List[Dict[str, Any]]] = None) -> FakeChatSession:
+        return FakeChatSession(self)
+
+    def count_tokens(self, contents: str) -> Dict[str, int]:
+        return {"total_tokens": len(str(contents).split())}
+
+
+def fake_langchain_chat_model(latency: Optional[LatencyModel] = None, answer_words: int = 120):
+    """LangChain chat model backed by FakeGenerativeModel (requires langchain-core)."""
+    from langchain_core.language_models.chat_models import SimpleChatModel
+
+    class FakeChatModel(SimpleChatModel):
+        model: Any = None
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-gemini"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+            return self.model.generate_content("\n".join(str(m.content) for m in messages)).text
+
+    return FakeChatModel(model=FakeGenerativeModel(latency, answer_words))
@@ -0,0 +1,253 @@
+"""
+Traffic Replay Load Test
+Async open-loop load generator for /chat and /chat-v2: multi-turn sessions arrive as a
+Poisson process at each --rates value (sessions per second), whether or not earlier
+requests have completed, and every session waits a think time between its turns while
+carrying the server's answers forward in chat_history, as the frontend does.
+
+Sessions come from requests captured by the server (CAPTURE_REQUESTS_PATH, see main.py):
+captured payloads are grouped back into conversations by their human-message prefix, and
+think times are fitted to the captured gaps between turns. Without a capture, --synthetic
+builds sessions from the gold query set with follow-ups.
+
+Per rate it reports throughput, error rate, client latency percentiles and the server's
+own time (Server-Timing total), whose gap to client latency is queueing in the worker.
+The highest rate meeting --slo-p99-ms and --max-error-rate divided by --workers is the
+capacity of one worker.
+
+Usage:
+    CAPTURE_REQUESTS_PATH=captured.jsonl uvicorn main:app          # record a class session
+    python -m benchmarks.load_replay captured.jsonl --url http://localhost:8000 --rates 0.2 0.5 1
+    python -m benchmarks.load_replay --synthetic --endpoints /chat /chat-v2 --duration 60
+"""
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from Backend.models import ChatRequest
+from benchmarks.fakes import LatencyModel
+from benchmarks.retrieval_eval import DEFAULT_GOLD, load_gold
+
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request
+
+FOLLOW_UPS = ["tell me more", "Can you elaborate on that?", "give me an example", "explain it more simply"]
+
+_SERVER_TOTAL = re.compile(r"total;dur=([\d.]+)")
+
+
+def load_sessions(path: str) -> Dict[str, Any]:
+    """
+    Rebuild conversations from captured requests.
+
+    Returns:
+        Dict with 'sessions' ([{"endpoint", "turns"}]), 'gaps' (seconds between consecutive
+        turns of a session) and 'skipped' (lines that are not ChatRequest payloads)
+    """
+    open_sessions: Dict[tuple, Dict[str, Any]] = {}
+    sessions, gaps, skipped = [], [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        records = []
+        for line in f:
+            try:
+                record = json.loads(line)
+                request = ChatRequest(chat_history=record["chat_history"])
+            except Exception:
+                skipped += 1
+                continue
+            turns = tuple(m.content for m in request.chat_history if m.role == "human" and isinstance(m.content, str))
+            records.append((record.get("ts", 0.0), record.get("endpoint", "/chat"), turns))
+
+    for ts, endpoint, turns in sorted(records):
+        session = open_sessions.pop((endpoint, turns[:-1]), None)
+        if session is None:
+            session = {"endpoint": endpoint, "turns": list(turns)}
+            sessions.append(session)
+        else:
+            session["turns"].append(turns[-1])
+            gaps.append(ts - session["ts"])
+        session["ts"] = ts
+        open_sessions[(endpoint, turns)] = session
+    return {"sessions": sessions, "gaps": gaps, "skipped": skipped}
+
+
+def synthetic_sessions(gold_path: str, count: int, turns: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Sessions of `turns` messages: a gold question, then follow-ups and further questions."""
+    rng = random.Random(seed)
+    questions = [g["query"] for g in load_gold(gold_path) if g["topics"]]
+    sessions = []
+    for _ in range(count):
+        session = [rng.choice(questions)]
+        for _ in range(turns - 1):
+            session.append(rng.choice(FOLLOW_UPS) if rng.random() < 0.4 else rng.choice(questions))
+        sessions.append({"endpoint": None, "turns": session})
+    return sessions
+
+
+def fit_think_model(gaps: List[float], median_s: float, p99_s: float, scale: float) -> LatencyModel:
+    """Think-time model from captured gaps (at least 10), else from the given median/p99."""
+    if len(gaps) >= 10:
+        median_s = float(np.percentile(gaps, 50))
+        p99_s = max(float(np.percentile(gaps, 99)), median_s)
+        print(f"Think time fitted to {len(gaps)} captured gaps: median {median_s:.1f}s, p99 {p99_s:.1f}s")
+    return LatencyModel(median_s * 1e3, p99_s * 1e3, scale=scale, seed=11)
+
+
+async def run_session(
+    client: httpx.AsyncClient,
+    session: Dict[str, Any],
+    endpoint: str,
+    think: LatencyModel,
+    samples: List[Dict[str, Any]]
+):
+    """Send a session's turns in order, carrying the answers forward, with think time between turns."""
+    history: List[Dict[str, Any]] = []
+    for i, turn in enumerate(session["turns"]):
+        if i:
+            await asyncio.sleep(think.sample())
+        history.append({"role": "human", "content": turn})
+        start = time.perf_counter()
+        sample = {"endpoint": endpoint, "ok": False, "status": None, "server_ms": None}
+        try:
+            response = await client.post(endpoint, json={"chat_history": history})
+            sample["status"] = response.status_code
+            sample["ok"] = response.status_code == 200
+            match = _SERVER_TOTAL.search(response.headers.get("server-timing", ""))
+            sample["server_ms"] = float(match.group(1)) if match else None
+            if sample["ok"]:
+                history.append({"role": "ai", "content": response.json().get("answer") or "..."})
+        except httpx.HTTPError as e:
+            sample["status"] = type(e).__name__
+        sample["ms"] = (time.perf_counter() - start) * 1e3
+        samples.append(sample)
+
+
+async def run_rate(
+    url: str,
+    sessions: List[Dict[str, Any]],
+    endpoints: List[str],
+    rate: float,
+    duration: float,
+    think: LatencyModel,
+    timeout: float,
+    seed: int = 7,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict[str, Any]:
+    """Open-loop run: Poisson session arrivals at `rate`/s for `duration` s, then drain."""
+    rng = random.Random(seed)
+    samples: List[Dict[str, Any]] = []
+    tasks = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits, transport=transport) as client:
+        start = time.perf_counter()
+        next_arrival = 0.0
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival >= duration:
+                break
+            await asyncio.sleep(max(0.0, start + next_arrival - time.perf_counter()))
+            session = sessions[len(tasks) % len(sessions)]
+            endpoint = session["endpoint"] or endpoints[len(tasks) % len(endpoints)]
+            tasks.append(asyncio.create_task(run_session(client, session, endpoint, think, samples)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return {"rate": rate, "sessions": len(tasks), "elapsed": elapsed, "samples": samples}
+
+
+def summarize(run: Dict[str, Any], endpoint: Optional[str] = None) -> Optional[Dict[str, float]]:
+    samples = [s for s in run["samples"] if endpoint is None or s["endpoint"] == endpoint]
+    if not samples:
+        return None
+    ok = [s for s in samples if s["ok"]]
+    latencies = np.array([s["ms"] for s in ok]) if ok else np.array([math.nan])
+    server = [s["server_ms"] for s in ok if s["server_ms"] is not None]
+    return {
+        "requests": len(samples),
+        "rps": len(ok) / run["elapsed"],
+        "error_rate": 1 - len(ok) / len(samples),
+        "p50": float(np.percentile(latencies, 50)),
+        "p90": float(np.percentile(latencies, 90)),
+        "p99": float(np.percentile(latencies, 99)),
+        "max": float(np.max(latencies)),
+        "server_p50": float(np.percentile(server, 50)) if server else math.nan,
+        "errors": sorted({str(s["status"]) for s in samples if not s["ok"]}),
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Open-loop replay of captured chat sessions against the API")
+    arg_parser.add_argument("capture", nargs="?", help="JSON Lines written with CAPTURE_REQUESTS_PATH")
+    arg_parser.add_argument("--synthetic", action="store_true", help="Sessions from the gold query set instead")
+    arg_parser.add_argument("--url", default="http://localhost:8000")
+    arg_parser.add_argument("--endpoints", nargs="+", help="Alternate sessions over these (default: captured endpoint, or /chat)")
+    arg_parser.add_argument("--rates", type=float, nargs="+", default=[0.1, 0.25, 0.5], help="Session arrivals per second")
+    arg_parser.add_argument("--duration", type=float, default=120, help="Seconds of arrivals per rate (then in-flight sessions drain)")
+    arg_parser.add_argument("--turns", type=int, default=4, help="Turns per synthetic session")
+    arg_parser.add_argument("--think-median", type=float, default=15.0, help="Seconds (when not fitted from a capture)")
+    arg_parser.add_argument("--think-p99", type=float, default=60.0)
+    arg_parser.add_argument("--think-scale", type=float, default=1.0, help="0 sends turns back to back")
+    arg_parser.add_argument("--timeout", type=float, default=60.0)
+    arg_parser.add_argument("--workers", type=int, default=1, help="Server worker processes, for per-worker capacity")
+    arg_parser.add_argument("--slo-p99-ms", type=float, default=10000)
+    arg_parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = arg_parser.parse_args(argv)
+
+    gaps: List[float] = []
+    if args.capture and not args.synthetic:
+        loaded = load_sessions(args.capture)
+        sessions, gaps = loaded["sessions"], loaded["gaps"]
+        if args.endpoints:
+            for session in sessions:
+                session["endpoint"] = None
+        if loaded["skipped"]:
+            print(f"Skipped {loaded['skipped']} lines of {args.capture} that are not ChatRequest payloads")
+        if not sessions:
+            print("No sessions to replay - capture some with CAPTURE_REQUESTS_PATH or use --synthetic")
+            return 1
+    else:
+        sessions = synthetic_sessions(DEFAULT_GOLD, 200, args.turns)
+    think = fit_think_model(gaps, args.think_median, args.think_p99, args.think_scale)
+    turns = sum(len(s["turns"]) for s in sessions) / len(sessions)
+    print(f"{len(sessions)} sessions, {turns:.1f} turns on average, target {args.url}\n")
+
+    print(f"{'rate/s':>7} {'endpoint':<9} {'reqs':>6} {'req/s':>7} {'err %':>6} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'server p50':>10}")
+    print("-" * 88)
+    sustainable = None
+    for rate in args.rates:
+        run = asyncio.run(run_rate(args.url, sessions, args.endpoints or ["/chat"], rate, args.duration, think, args.timeout))
+        endpoints = sorted({s["endpoint"] for s in run["samples"]})
+        for endpoint in endpoints + ([None] if len(endpoints) > 1 else []):
+            row = summarize(run, endpoint)
+            print(
+                f"{rate:>7.2f} {endpoint or 'all':<9} {row['requests']:>6} {row['rps']:>7.2f} "
+                f"{row['error_rate'] * 100:>6.1f} {row['p50']:>8.0f} {row['p90']:>8.0f} {row['p99']:>8.0f} "
+                f"{row['max']:>8.0f} {row['server_p50']:>10.0f}"
+                + (f"  errors: {', '.join(row['errors'])}" if row["errors"] else "")
+            )
+        overall = summarize(run)
+        if overall and overall["error_rate"] <= args.max_error_rate and overall["p99"] <= args.slo_p99_ms:
+            sustainable = (rate, overall["rps"])
+
+    if sustainable:
+        rate, rps = sustainable
+        print(
+            f"\nHighest rate within SLO (p99 <= {args.slo_p99_ms:.0f} ms, errors <= {args.max_error_rate:.0%}): "
+            f"{rate} sessions/s = {rps:.2f} req/s, {rps / args.workers:.2f} req/s per worker"
+        )
+    else:
+        print(f"\nNo rate met the SLO (p99 <= {args.slo_p99_ms:.0f} ms, errors <= {args.max_error_rate:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,217 @@
+"""
+Matryoshka Two-Pass Evaluation
+Latency, memory and recall tradeoffs of 256/512-dim first-pass vectors with a 1024-dim
+rerank on our KB, for both ways of producing them: truncating the 1024-dim Titan vector
+(SHORT_EMBEDDING_MODE=truncate, no extra API call) and native Titan output at the smaller
+size (SHORT_EMBEDDING_MODE=native, one extra call per document and per query).
+
+The corpus is every KB job the ingestion manifest produces (the exact texts ingestion
+embeds); queries are the KB topic titles, or --queries (one per line). Ground truth is
+exact 1024-dim search. Titan vectors are cached in --cache, so reruns make no Bedrock calls.
+
+Usage:
+    python -m benchmarks.matryoshka_eval
+    python -m benchmarks.matryoshka_eval --queries queries.txt --k 3 --factors 2 5 10
+"""
+import os
+import time
+import hashlib
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from Backend.create_vector_store import iter_module_jobs, load_json_file, load_manifest
+from Backend.embedding_client import BedrockEmbeddingClient
+from Backend.local_vector_index import LocalVectorIndex
+from Backend.vector_codec import truncate_embedding
+
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("Backend").setLevel(logging.WARNING)  # per-topic ingestion logs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EmbeddingCache:
+    """Titan vectors keyed by (dimensions, text hash), persisted as one .npz file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors: Dict[Tuple[int, str], np.ndarray] = {}
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for name in data.files:
+                    if name.endswith("_keys"):
+                        dims = int(name[1:-5])
+                        for key, vector in zip(data[name], data[f"d{dims}_vectors"]):
+                            self.vectors[(dims, str(key))] = vector
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, dims: int, text: str):
+        return self.vectors.get((dims, self.key(text)))
+
+    def put(self, dims: int, text: str, vector: Sequence[float]):
+        self.vectors[(dims, self.key(text))] = np.asarray(vector, dtype=np.float32)
+
+    def save(self):
+        arrays = {}
+        for dims in sorted({d for d, _ in self.vectors}):
+            items = [(k, v) for (d, k), v in self.vectors.items() if d == dims]
+            arrays[f"d{dims}_keys"] = np.array([k for k, _ in items])
+            arrays[f"d{dims}_vectors"] = np.vstack([v for _, v in items])
+        np.savez_compressed(self.path, **arrays)
+
+
+def embed_texts(
+    embedding_client: BedrockEmbeddingClient,
+    texts: List[str],
+    dims: int,
+    cache: EmbeddingCache,
+    workers: int = 4
+) -> np.ndarray:
+    """(len(texts), dims) matrix of unit vectors; only uncached texts go to Bedrock."""
+    missing = list(dict.fromkeys(t for t in texts if cache.get(dims, t) is None))
+    if missing:
+        print(f"  embedding {len(missing)} texts at {dims} dims ...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for text, vector in zip(missing, pool.map(lambda t: embedding_client.generate_embedding(t, dims), missing)):
+                if not vector:
+                    raise RuntimeError(f"Bedrock returned no {dims}-dim embedding for: {text[:60]!r}")
+                cache.put(dims, text, vector)
+        cache.save()
+    matrix = np.vstack([cache.get(dims, t) for t in texts]).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def kb_corpus(manifest_path: str, embedding_client: BedrockEmbeddingClient) -> Tuple[List[str], List[str]]:
+    """Embedding texts of every KB document and chunk in the manifest, plus the topic titles."""
+    from docx_parser import iter_jsonl
+
+    texts, topics = [], []
+    for module in load_manifest(manifest_path).get("modules", []):
+        path = module["kb_json"]
+        if not os.path.exists(path):
+            print(f"  skipping {module['module_name']}: {path} not found")
+            continue
+        entries = list(iter_jsonl(path)) if path.endswith(".jsonl") else (load_json_file(path) or [])
+        topics += [e.get("topic", "") for e in entries if e.get("topic")]
+        jobs = iter_module_jobs(
+            entries, embedding_client, module["module_name"],
+            module.get("max_tokens", 200), module.get("overlap_sentences", 1)
+        )
+        texts += [job["embedding_text"] for job in jobs]
+    return texts, topics
+
+
+def bedrock_latency(embedding_client: BedrockEmbeddingClient, queries: List[str], dims: int) -> float:
+    """Mean uncached query-embedding latency in ms."""
+    start = time.perf_counter()
+    for query in queries:
+        embedding_client.generate_embedding(query, dims)
+    return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def top_ids(matrix: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = matrix @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall(exact: List[np.ndarray], approx: List[np.ndarray], k: int) -> float:
+    return float(np.mean([len(set(e[:k].tolist()) & set(a[:k].tolist())) / k for e, a in zip(exact, approx)]))
+
+
+def evaluate(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    short_corpus: np.ndarray,
+    short_queries: np.ndarray,
+    k: int,
+    factors: List[int]
+) -> Dict[str, object]:
+    """One-pass (first pass only) and two-pass recall@k against exact 1024-dim search, plus latency."""
+    exact = [top_ids(corpus, q, k) for q in queries]
+    one_pass = [top_ids(short_corpus, q, k) for q in short_queries]
+    row: Dict[str, object] = {"one_pass": recall(exact, one_pass, k), "two_pass": {}, "ms": {}}
+
+    documents = [{"source": "knowledge_base_chunk"} for _ in range(corpus.shape[0])]
+    for factor in factors:
+        index = LocalVectorIndex(None, prefilter="short", rerank_factor=factor, min_prefilter_rows=0)
+        index.build(documents, list(corpus), short_vectors=list(short_corpus))
+        state = index._state
+        block = slice(0, corpus.shape[0])
+        start = time.perf_counter()
+        approx = [index.top_k(state, block, q, k, sq)[0] for q, sq in zip(queries, short_queries)]
+        row["ms"][factor] = (time.perf_counter() - start) / len(queries) * 1e3
+        row["two_pass"][factor] = recall(exact, approx, k)
+    return row
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Recall/latency/memory of 256/512-dim first-pass search on the KB")
+    arg_parser.add_argument("--manifest", default=os.path.join(REPO_ROOT, "ingestion_manifest.json"))
+    arg_parser.add_argument("--queries", help="Text file with one query per line (default: KB topic titles)")
+    arg_parser.add_argument("--dims", type=int, nargs="+", default=[256, 512])
+    arg_parser.add_argument("--k", type=int, default=3)
+    arg_parser.add_argument("--factors", type=int, nargs="+", default=[2, 5, 10])
+    arg_parser.add_argument("--cache", default=os.path.join(REPO_ROOT, "benchmarks", ".titan_embeddings.npz"))
+    arg_parser.add_argument("--bedrock-samples", type=int, default=10, help="Uncached queries timed per size (0 = skip)")
+    args = arg_parser.parse_args(argv)
+
+    embedding_client = BedrockEmbeddingClient()
+    cache = EmbeddingCache(args.cache)
+    texts, topics = kb_corpus(args.manifest, embedding_client)
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            query_texts = [line.strip() for line in f if line.strip()]
+    else:
+        query_texts = topics
+    if not texts or not query_texts:
+        print("No corpus or queries - check the manifest paths")
+        return 1
+
+    corpus = embed_texts(embedding_client, texts, 1024, cache)
+    queries = embed_texts(embedding_client, query_texts, 1024, cache)
+    print(f"\nKB corpus {corpus.shape[0]} x 1024, {len(query_texts)} queries, recall@{args.k} vs exact 1024-dim")
+
+    samples = query_texts[:args.bedrock_samples]
+    full_ms = bedrock_latency(embedding_client, samples, 1024) if samples else 0.0
+    baseline = evaluate(corpus, queries, corpus, queries, args.k, args.factors[:1])
+
+    factor_cols = "".join(f"{f'2p x{f}':>9}" for f in args.factors)
+    print(f"{'first pass':<16} {'1-pass':>7}{factor_cols} {'ms/q':>7} {'MB':>7} {'B/doc':>6} {'query embed':>12}")
+    print("-" * (62 + 9 * len(args.factors)))
+    print(
+        f"{'1024 exact':<16} {1.0:>7.3f}{''.join(f'{1.0:>9.3f}' for _ in args.factors)} "
+        f"{list(baseline['ms'].values())[0]:>7.3f} {corpus.nbytes / 1e6:>7.2f} {1024 * 4 + 2:>6} {full_ms:>9.0f} ms"
+    )
+
+    for dims in args.dims:
+        truncated = (truncate_embedding(corpus, dims), truncate_embedding(queries, dims))
+        configs = [("truncate", truncated, 0.0)]
+        native_corpus = embed_texts(embedding_client, texts, dims, cache)
+        native_queries = embed_texts(embedding_client, query_texts, dims, cache)
+        native_ms = bedrock_latency(embedding_client, samples, dims) if samples else 0.0
+        configs.append(("native", (native_corpus, native_queries), native_ms))
+
+        for mode, (short_corpus, short_queries), extra_ms in configs:
+            row = evaluate(corpus, queries, short_corpus, short_queries, args.k, args.factors)
+            two_pass = "".join(f"{row['two_pass'][f]:>9.3f}" for f in args.factors)
+            # Truncated first passes reuse the 1024-dim query; native ones cost a second call
+            embed = f"+{extra_ms:.0f} ms" if mode == "native" else "+0 ms"
+            print(
+                f"{f'{dims} {mode}':<16} {row['one_pass']:>7.3f}{two_pass} "
+                f"{max(row['ms'].values()):>7.3f} {short_corpus.nbytes / 1e6:>7.2f} {dims * 4 + 2:>6} {embed:>12}"
+            )
+
+    print("\nms/q: in-process first pass + rerank (largest factor); MB: first-pass matrix; B/doc: BSON float32 BinData")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,318 @@
+"""
+Request-Path Micro-Benchmarks
+Measures per-call CPU cost of code that runs on every request before or after network I/O:
+intent detection, prompt building, retrieval result formatting (incl. context compression)
+and post-processing of the LLM answer. Inputs are KB-sized: the largest Module 1 topics as
+retrieved chunks (the largest prose topics for compression, as lists are sent whole) and a
+multi-KB HTML answer with **bold** spans and "* " bullets.
+
+--save appends the run to benchmarks/results/microbench_history.jsonl (with commit, Python
+version and host) and every run is compared with the last saved run from the same host and
+Python version; --max-regression makes the exit code non-zero when a benchmark got slower
+by more than that fraction, so a CPU regression fails before it reaches production.
+
+Usage:
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --save
+    python -m benchmarks.microbench --filter prompt --max-regression 0.15
+"""
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# The retriever is built around in-memory stand-ins; no Atlas database or local index
+os.environ.setdefault("DB_NAME", "ai_shine_bench")
+os.environ["LOCAL_VECTOR_INDEX"] = "false"
+
+# Before the Backend imports, whose basicConfig(INFO) would otherwise win
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("Backend").setLevel(logging.WARNING)  # per-call client logs
+
+from Backend.prompt_builder import PromptBuilder
+from Backend.text_splitter import is_enumeration
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, "benchmarks", "results", "microbench_history.jsonl")
+KB_PATH = os.path.join(REPO_ROOT, "Parsed_Module1_KB.json")
+
+# Mix of greetings, farewells, continuations and real questions as seen in class sessions
+INTENT_MESSAGES = [
+    "Hello",
+    "hey!",
+    "good morning",
+    "bye",
+    "see you",
+    "tell me more",
+    "Can you elaborate on that?",
+    "continue",
+    "What is machine learning?",
+    "What is the CRAFT prompting framework?",
+    "How is AI used in Netflix recommendations and what else does it power?",
+    "Explain the difference between supervised and unsupervised learning in detail",
+]
+
+QUERY = "Explain the difference between supervised and unsupervised learning in detail"
+
+
+def bench(name: str, fn: Callable[[], object], number: int = 20000, repeat: int = 5) -> Dict[str, float]:
+    """
+    Time a zero-arg callable; reports the best of `repeat` runs as ns per call.
+
+    Returns:
+        Dict with 'name', 'ns_per_call', 'calls'
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return {"name": name, "ns_per_call": round(best, 1), "calls": number}
+
+
+def intent_cases() -> List[Dict[str, float]]:
+    """Legacy three-regex path vs single combined matcher, uncached and memoized."""
+    builder = PromptBuilder()
+    messages = INTENT_MESSAGES
+    n = len(messages)
+
+    def legacy():
+        for msg in messages:
+            text = msg.strip()
+            if builder.greeting_regex.match(text):
+                continue
+            if builder.farewell_regex.match(text):
+                continue
+            builder.continuation_regex.search(text)
+
+    def combined_uncached():
+        for msg in messages:
+            builder._match_intent_uncached(msg.strip())
+
+    def combined_cached():
+        for msg in messages:
+            builder.match_intent(msg)
+
+    def detect_intent():
+        for msg in messages:
+            builder.detect_intent(msg)
+
+    results = [
+        bench("intent.legacy_three_regex", legacy, number=2000),
+        bench("intent.combined_uncached", combined_uncached, number=2000),
+        bench("intent.combined_lru", combined_cached, number=2000),
+        bench("intent.detect_intent", detect_intent, number=2000),
+    ]
+    # Report per message rather than per batch
+    for r in results:
+        r["ns_per_call"] = round(r["ns_per_call"] / n, 1)
+    return results
+
+
+def kb_entries(count: int = 3, prose: bool = False) -> List[Dict[str, Any]]:
+    """
+    The `count` longest Module 1 topics, as retrieval would return them (most relevant first).
+    prose=True skips lists, which the context compressor never compresses.
+    """
+    with open(KB_PATH, "r", encoding="utf-8") as f:
+        entries = [e for e in json.load(f) if e.get("content") and not (prose and is_enumeration(e["content"]))]
+    entries.sort(key=lambda e: len(e["content"]), reverse=True)
+    return [dict(e, _id=f"kb-{i}", score=0.72 - 0.03 * i, source="knowledge_base") for i, e in enumerate(entries[:count])]
+
+
+def sample_answer(entries: List[Dict[str, Any]], target_chars: int = 6000) -> str:
+    """
+    A Gemini-style HTML answer of about `target_chars`: paragraphs with **bold** key terms
+    and a list whose items start with "* ", as the model sometimes emits despite the prompt.
+    """
+    sentences = [s.strip() for e in entries for s in e["content"].split(". ") if len(s.split()) > 4]
+    parts: List[str] = []
+    size = 0
+    for i, sentence in enumerate(sentences):
+        words = sentence.split()
+        if i % 3 == 0:
+            words[0] = f"**{words[0]}"
+            words[2] = f"{words[2]}**"
+        text = " ".join(words)
+        part = f"<li>* {text}.</li>" if i % 5 == 4 else f"<p>{text}.</p>"
+        parts.append(part)
+        size += len(part)
+        if size >= target_chars:
+            break
+    return "\n".join(parts)
+
+
+def offline_retriever():
+    """RAGRetriever over in-memory stand-ins, and its embedding client."""
+    from Backend.embedding_client import BedrockEmbeddingClient
+    from Backend.mongodb_client import MongoDBClient
+    from Backend.rag_retriever import RAGRetriever
+    from benchmarks.fakes import FakeBedrockRuntime, FakeMongoClient
+
+    embedding_client = BedrockEmbeddingClient(client=FakeBedrockRuntime())
+    retriever = RAGRetriever(embedding_client=embedding_client, mongo_client=MongoDBClient(client=FakeMongoClient([])))
+    return retriever, embedding_client
+
+
+def prompt_cases(entries: List[Dict[str, Any]], retriever) -> List[Dict[str, float]]:
+    """System and user prompt assembly over three KB-sized chunks, brief and continuation mode."""
+    builder = PromptBuilder()
+    chunks = [retriever._format_chunk(e, e["content"]) for e in entries]
+    modules = [e.get("module_name") for e in entries]
+    query_intent = builder.detect_intent(QUERY)
+    continuation_intent = builder.detect_intent("tell me more")
+
+    return [
+        bench("prompt.build_system_prompt", lambda: builder.build_system_prompt(query_intent, True), number=20000),
+        bench(
+            "prompt.build_user_prompt",
+            lambda: builder.build_user_prompt(QUERY, chunks, query_intent, show_module_citation=True, module_names=modules),
+            number=500
+        ),
+        bench(
+            "prompt.build_user_prompt_continue",
+            lambda: builder.build_user_prompt(QUERY, chunks, continuation_intent),
+            number=500
+        ),
+        bench("prompt.build_user_prompt_empty", lambda: builder.build_user_prompt(QUERY, [], query_intent), number=20000),
+    ]
+
+
+def retrieval_cases(entries: List[Dict[str, Any]], retriever, embedding_client) -> List[Dict[str, float]]:
+    """_format_results over three prose KB documents with stored passages, with and without compression."""
+    from Backend.context_compressor import build_passages
+    from benchmarks.fakes import hashing_embedding
+
+    documents = [dict(e, passages=build_passages(e["content"], embedding_client)) for e in entries]
+    query_embedding = hashing_embedding(QUERY)
+
+    return [
+        bench("retrieve.format_chunk", lambda: retriever._format_chunk(documents[0], documents[0]["content"]), number=20000),
+        bench("retrieve.format_results", lambda: retriever._format_results(documents, query_embedding), number=500),
+        bench("retrieve.format_results_uncompressed", lambda: retriever._format_results(documents, None), number=2000),
+    ]
+
+
+def postprocess_cases(answer: str) -> List[Dict[str, float]]:
+    """Markdown-to-HTML clean-up of a multi-KB answer in both engines."""
+    from Backend.llm_client import GeminiClient
+    from benchmarks.fakes import FakeGenerativeModel, FakeMongoClient, HashingEmbeddings, fake_langchain_chat_model
+
+    llm_client = GeminiClient(model=FakeGenerativeModel())
+    results = [bench("llm.clean_markdown_bold", lambda: llm_client.clean_markdown_bold(answer), number=2000)]
+    try:
+        from Backend.langchain_rag_engine import LangChainRAGEngine
+        from Backend.langchain_retriever import LangChainMongoRetriever
+    except ImportError as e:
+        print(f"  skipping langchain.clean_response: {e}")
+        return results
+    retriever = LangChainMongoRetriever(mongo_client=FakeMongoClient([]), embeddings=HashingEmbeddings())
+    engine = LangChainRAGEngine(retriever=retriever, llm=fake_langchain_chat_model())
+    results.append(bench("langchain.clean_response", lambda: engine._clean_response(answer), number=2000))
+    return results
+
+
+def environment() -> Dict[str, str]:
+    """Where the numbers come from; runs are only compared within the same host and Python."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "host": socket.gethostname(),
+        "machine": platform.machine(),
+    }
+
+
+def last_run(history_path: str, env: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Most recent saved run from the same host and Python version, if any."""
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("host") == env["host"] and record.get("python") == env["python"]:
+                previous = record
+    return previous
+
+
+def save_run(history_path: str, env: Dict[str, str], results: List[Dict[str, float]]):
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    record = dict(env, ts=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    record["results"] = {r["name"]: r["ns_per_call"] for r in results}
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Per-call CPU cost of request-path string work")
+    arg_parser.add_argument("--filter", help="Only benchmarks whose name contains this text")
+    arg_parser.add_argument("--history", default=DEFAULT_HISTORY)
+    arg_parser.add_argument("--save", action="store_true", help="Append this run to the history file")
+    arg_parser.add_argument("--max-regression", type=float, help="Exit 1 if any benchmark is slower than the last run by more than this fraction")
+    args = arg_parser.parse_args(argv)
+
+    entries = kb_entries()
+    answer = sample_answer(entries)
+    prose_entries = kb_entries(prose=True)
+    retriever, embedding_client = offline_retriever()
+    results = (
+        intent_cases()
+        + prompt_cases(entries, retriever)
+        + retrieval_cases(prose_entries, retriever, embedding_client)
+        + postprocess_cases(answer)
+    )
+    if args.filter:
+        results = [r for r in results if args.filter in r["name"]]
+
+    env = environment()
+    previous = last_run(args.history, env)
+    baseline = previous["results"] if previous else {}
+    chunk_chars = sum(len(e["content"]) for e in entries)
+    prose_chars = sum(len(e["content"]) for e in prose_entries)
+    print(
+        f"Inputs: {len(entries)} KB chunks ({chunk_chars} chars), {len(prose_entries)} prose chunks "
+        f"({prose_chars} chars), {len(answer)}-char answer"
+    )
+    if previous:
+        print(f"Compared with {previous.get('commit') or 'unknown commit'} ({previous.get('ts')})")
+    print(f"\n{'benchmark':<38} {'ns/call':>12} {'previous':>12} {'change':>8}")
+    print("-" * 73)
+
+    regressions = []
+    for r in results:
+        before = baseline.get(r["name"])
+        change = (r["ns_per_call"] - before) / before if before else None
+        print(
+            f"{r['name']:<38} {r['ns_per_call']:>12.1f} "
+            f"{f'{before:.1f}' if before is not None else '-':>12} {f'{change:+.1%}' if change is not None else '-':>8}"
+        )
+        if change is not None and args.max_regression is not None and change > args.max_regression:
+            regressions.append(r["name"])
+
+    if args.save:
+        save_run(args.history, env, results)
+        print(f"\nSaved to {os.path.relpath(args.history, REPO_ROOT)}")
+    if regressions:
+        print(f"\nSlower than the last run by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+"""
+Offline Pipeline Benchmark
+End-to-end process_query latency and throughput of both engines with Bedrock, Atlas and
+Gemini replaced by the stand-ins in benchmarks/fakes.py, so it runs on any Linux box with
+no network or credentials.
+
+The KB is built by the real ingestion code (manifest jobs -> embed_job) with hashed
+embeddings; queries ask about the KB topics. Per run it reports:
+  - overhead: wall time minus simulated network time, i.e. our own code per request
+  - p50 / p99 request latency and throughput at each concurrency level
+
+Latencies are log-normal with the given median and p99 (ms); --scale shrinks all of them
+proportionally to keep runs short. The LangChain engine is skipped when LangChain is
+not installed.
+
+Usage:
+    python -m benchmarks.pipeline_bench
+    python -m benchmarks.pipeline_bench --concurrency 1 8 32 --requests 200 --scale 0.05
+    python -m benchmarks.pipeline_bench --scale 0 --with-logging   # pure overhead incl. log formatting
+    LOG_LEVEL=DEBUG python -m benchmarks.pipeline_bench --scale 0 --with-logging
+"""
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# The stand-ins need no credentials; keep searches on the (fake) Atlas path and keep
+# prototypes embedded with fake vectors out of the real intent cache
+os.environ.setdefault("DB_NAME", "ai_shine_bench")
+os.environ["LOCAL_VECTOR_INDEX"] = "false"
+os.environ["INTENT_PROTOTYPES_PATH"] = ""
+
+from Backend.create_vector_store import iter_module_jobs, load_json_file, load_manifest
+from Backend.embedding_client import BedrockEmbeddingClient
+from Backend.ingestion_pipeline import embed_job
+from Backend.llm_client import GeminiClient
+from Backend.log_config import configure_logging as configure_api_logging
+from Backend.models import Message
+from Backend.mongodb_client import MongoDBClient
+from Backend.rag_engine import RAGEngine
+from Backend.rag_retriever import RAGRetriever
+from benchmarks.fakes import (
+    FakeBedrockRuntime, FakeGenerativeModel, FakeMongoClient, HashingEmbeddings, LatencyModel,
+    fake_langchain_chat_model, injected_seconds, reset_injected
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Follow-ups exercise the continuation path of the regex engine
+FOLLOW_UPS = ["tell me more", "Can you elaborate on that?"]
+
+
+def kb_documents(manifest_path: str) -> Tuple[List[dict], List[str]]:
+    """KB documents and chunks as ingestion would store them (hashed embeddings), plus topic titles."""
+    from docx_parser import iter_jsonl
+
+    embedding_client = BedrockEmbeddingClient(client=FakeBedrockRuntime())
+    documents, topics = [], []
+    for module in load_manifest(manifest_path).get("modules", []):
+        path = os.path.join(REPO_ROOT, module["kb_json"])
+        if not os.path.exists(path):
+            print(f"  skipping {module['module_name']}: {path} not found")
+            continue
+        entries = list(iter_jsonl(path)) if path.endswith(".jsonl") else (load_json_file(path) or [])
+        topics += [e["topic"] for e in entries if e.get("topic")]
+        jobs = iter_module_jobs(
+            entries, embedding_client, module["module_name"],
+            module.get("max_tokens", 200), module.get("overlap_sentences", 1)
+        )
+        documents += [doc for doc in (embed_job(job, embedding_client) for job in jobs) if doc]
+    return documents, topics
+
+
+def query_mix(topics: List[str], count: int) -> List[str]:
+    """`count` user messages: topic questions with a follow-up after every fourth."""
+    queries = []
+    for i in range(count):
+        if i % 5 == 4:
+            queries.append(FOLLOW_UPS[i % len(FOLLOW_UPS)])
+        else:
+            queries.append(f"What is {topics[i % len(topics)]}?")
+    return queries
+
+
+def latency_models(args, scale: float) -> Dict[str, LatencyModel]:
+    return {
+        "embed": LatencyModel(*args.embed_ms, scale=scale, seed=1),
+        "search": LatencyModel(*args.search_ms, scale=scale, seed=2),
+        "roundtrip": LatencyModel(*args.roundtrip_ms, scale=scale, seed=3),
+        "llm": LatencyModel(*args.llm_ms, scale=scale, seed=4),
+    }
+
+
+def build_rag_engine(documents: List[dict], latency: Dict[str, LatencyModel]) -> RAGEngine:
+    embedding_client = BedrockEmbeddingClient(client=FakeBedrockRuntime(latency["embed"]))
+    mongo_client = MongoDBClient(client=FakeMongoClient(documents, latency["search"], latency["roundtrip"]))
+    retriever = RAGRetriever(embedding_client=embedding_client, mongo_client=mongo_client)
+    return RAGEngine(retriever=retriever, llm_client=GeminiClient(model=FakeGenerativeModel(latency["llm"])))
+
+
+def build_langchain_engine(documents: List[dict], latency: Dict[str, LatencyModel]):
+    from Backend.langchain_rag_engine import LangChainRAGEngine
+    from Backend.langchain_retriever import LangChainMongoRetriever
+
+    retriever = LangChainMongoRetriever(
+        mongo_client=FakeMongoClient(documents, latency["search"], latency["roundtrip"]),
+        embeddings=HashingEmbeddings(latency["embed"])
+    )
+    return LangChainRAGEngine(retriever=retriever, llm=fake_langchain_chat_model(latency["llm"]))
+
+
+def timed_query(engine, query: str) -> Tuple[float, float]:
+    """(wall seconds, simulated network seconds) of one process_query call."""
+    reset_injected()
+    start = time.perf_counter()
+    engine.process_query(query=query, chat_history=[Message(role="human", content=query)])
+    return time.perf_counter() - start, injected_seconds()
+
+
+def run(engine, queries: List[str], concurrency: int) -> Dict[str, float]:
+    """Replay `queries` against one shared engine (as main.py shares it) from `concurrency` threads."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda q: timed_query(engine, q), queries))
+    elapsed = time.perf_counter() - start
+    wall = np.array([s[0] for s in samples]) * 1e3
+    overhead = np.array([s[0] - s[1] for s in samples]) * 1e3
+    return {
+        "rps": len(queries) / elapsed,
+        "p50": float(np.percentile(wall, 50)),
+        "p99": float(np.percentile(wall, 99)),
+        "overhead_p50": float(np.percentile(overhead, 50)),
+        "overhead_p99": float(np.percentile(overhead, 99)),
+    }
+
+
+def configure_logging(with_logging: bool):
+    """
+    Silence INFO logs, or keep the API's logging setup (queue handler, JSON, LOG_LEVEL and
+    LOG_SAMPLE_RATES) but write to /dev/null so its cost is still measured.
+    """
+    if not with_logging:
+        logging.disable(logging.INFO)
+        return
+    configure_api_logging(stream=open(os.devnull, "w"))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark of both RAG engines")
+    arg_parser.add_argument("--manifest", default=os.path.join(REPO_ROOT, "ingestion_manifest.json"))
+    arg_parser.add_argument("--engines", nargs="+", default=["rag", "langchain"], choices=["rag", "langchain"])
+    arg_parser.add_argument("--requests", type=int, default=100)
+    arg_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    arg_parser.add_argument("--scale", type=float, default=0.1, help="Multiplier for all simulated latencies")
+    arg_parser.add_argument("--embed-ms", type=float, nargs=2, default=[60, 250], metavar=("P50", "P99"))
+    arg_parser.add_argument("--search-ms", type=float, nargs=2, default=[40, 150], metavar=("P50", "P99"))
+    arg_parser.add_argument("--roundtrip-ms", type=float, nargs=2, default=[5, 30], metavar=("P50", "P99"))
+    arg_parser.add_argument("--llm-ms", type=float, nargs=2, default=[1800, 6000], metavar=("P50", "P99"))
+    arg_parser.add_argument("--with-logging", action="store_true", help="Format INFO logs (to /dev/null)")
+    args = arg_parser.parse_args(argv)
+
+    configure_logging(args.with_logging)
+    documents, topics = kb_documents(args.manifest)
+    if not documents:
+        print("No KB documents - check the manifest paths")
+        return 1
+    queries = query_mix(topics, args.requests)
+    builders: Dict[str, Callable] = {"rag": build_rag_engine, "langchain": build_langchain_engine}
+
+    print(f"KB: {len(documents)} documents, {len(topics)} topics; {args.requests} requests per run")
+    print(f"Simulated latency x{args.scale}: embed {args.embed_ms}, search {args.search_ms}, "
+          f"roundtrip {args.roundtrip_ms}, llm {args.llm_ms} (p50, p99 ms)\n")
+    print(f"{'engine':<10} {'run':<14} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'ovh p50':>9} {'ovh p99':>9}")
+    print("-" * 72)
+
+    for name in args.engines:
+        runs = [("overhead", 0.0, 1)] + [(f"concurrency {c}", args.scale, c) for c in args.concurrency]
+        for label, scale, concurrency in runs:
+            try:
+                engine = builders[name](documents, latency_models(args, scale))
+            except ImportError as e:
+                print(f"{name:<10} skipped: {e}")
+                break
+            # One unmeasured request warms caches (regex compilation, prototypes, NumPy)
+            timed_query(engine, queries[0])
+            row = run(engine, queries, concurrency)
+            print(
+                f"{name:<10} {label:<14} {row['rps']:>8.1f} {row['p50']:>9.2f} {row['p99']:>9.2f} "
+                f"{row['overhead_p50']:>9.2f} {row['overhead_p99']:>9.2f}"
+            )
+
+    print("\novh: wall time minus simulated network time (our code, GIL and lock contention)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
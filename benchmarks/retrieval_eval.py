@@ -0,0 +1,250 @@
+"""
+Retrieval Evaluation
+Quality vs latency of the retrieval knobs over a labelled query set
+(benchmarks/gold/module1_queries.jsonl): the threshold tiers, k (results per search),
+$vectorSearch numCandidates and the search backend (Atlas, or the local index with
+exact / binary / int8 / short prefilter).
+
+Each (backend, numCandidates, k) setting is searched once per query at threshold 0, and
+the threshold tiers are applied afterwards the way RAGRetriever does (main tier, else the
+lower tier), so sweeping thresholds costs no extra searches. An Atlas fallback counts its
+latency twice because the retriever issues a second search; the local index answers both
+tiers with one.
+
+Metrics per setting:
+  recall@k   answerable queries with a gold topic among the returned results
+  MRR        mean reciprocal rank of the first gold topic (0 when missing)
+  fallback   queries answered only at the lower threshold
+  empty      answerable queries with no result at all
+  off-topic  unanswerable queries (no gold topic) that still returned results
+  p50 / p99  search latency per query, fallback included
+
+Query vectors are Titan embeddings cached in --cache (shared with matryoshka_eval);
+--offline uses the hashed stand-in embeddings and an in-memory KB instead, which checks
+the tool end to end but says nothing about real retrieval quality.
+
+Usage:
+    python -m benchmarks.retrieval_eval
+    python -m benchmarks.retrieval_eval --backends atlas local-none local-binary --snapshot vector_snapshot
+    python -m benchmarks.retrieval_eval --thresholds 0.5:0.4 0.55:0.45 0.6:0.5 --k 3 6 --num-candidates 5 10 20 40
+    python -m benchmarks.retrieval_eval --offline
+"""
+import os
+import json
+import time
+import tempfile
+import argparse
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Backend.local_vector_index import LocalVectorIndex, export_collection_snapshot
+
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("Backend").setLevel(logging.WARNING)  # per-search client logs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_GOLD = os.path.join(REPO_ROOT, "benchmarks", "gold", "module1_queries.jsonl")
+
+# (backend name, numCandidates factor or None, k -> search function of a query vector)
+Searcher = Tuple[str, Optional[int], Callable[[int], Callable[[List[float]], List[Dict[str, Any]]]]]
+
+
+def load_gold(path: str) -> List[Dict[str, Any]]:
+    """Labelled queries: {"query": str, "topics": [acceptable topic titles]} per line."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_thresholds(values: List[str]) -> List[Tuple[float, float]]:
+    """'0.55:0.45' -> (main tier, lower tier)."""
+    pairs = []
+    for value in values:
+        main, _, lower = value.partition(":")
+        pairs.append((float(main), float(lower or main)))
+    return pairs
+
+
+def atlas_searchers(mongo_client, source: str, factors: List[int]) -> List[Searcher]:
+    name = "atlas-2pass" if mongo_client.collection_settings.get("short_dimensions") else "atlas"
+
+    def make(factor: int):
+        def for_k(k: int):
+            return lambda vec: mongo_client.vector_search(
+                vec, limit=k, similarity_threshold=0.0, pre_filters={"source": source}, num_candidates=k * factor
+            )
+        return for_k
+
+    return [(name, factor, make(factor)) for factor in factors]
+
+
+def local_searchers(snapshot: str, source: str, modes: List[str]) -> List[Searcher]:
+    searchers = []
+    for mode in modes:
+        index = LocalVectorIndex(None, prefilter=mode, min_prefilter_rows=0)
+        if not index.load_snapshot(snapshot):
+            print(f"  skipping local-{mode}: snapshot {snapshot} could not be loaded")
+            continue
+
+        def for_k(k: int, index=index):
+            return lambda vec: index.search(vec, k, 0.0, source=source)
+
+        searchers.append((f"local-{mode}", None, for_k))
+    return searchers
+
+
+def run_searches(search: Callable, vectors: List[List[float]]) -> Tuple[List[List[Dict[str, Any]]], np.ndarray]:
+    """Results and latency (ms) per query, after one unmeasured warm-up search."""
+    search(vectors[0])
+    results, latencies = [], []
+    for vec in vectors:
+        start = time.perf_counter()
+        results.append(search(vec))
+        latencies.append((time.perf_counter() - start) * 1e3)
+    return results, np.asarray(latencies)
+
+
+def score_setting(
+    gold: List[Dict[str, Any]],
+    results: List[List[Dict[str, Any]]],
+    latencies: np.ndarray,
+    thresholds: Tuple[float, float],
+    second_search: bool
+) -> Dict[str, float]:
+    """Quality and latency of one threshold pair over pre-computed threshold-0 results."""
+    main, lower = thresholds
+    answerable = [i for i, g in enumerate(gold) if g["topics"]]
+    unanswerable = [i for i, g in enumerate(gold) if not g["topics"]]
+    hits = reciprocal_ranks = fallbacks = empty = off_topic = 0
+    per_query_ms = latencies.copy()
+
+    for i, (g, found) in enumerate(zip(gold, results)):
+        final = [r for r in found if r.get("score", 0.0) >= main]
+        if not final:
+            final = [r for r in found if r.get("score", 0.0) >= lower]
+            fallbacks += bool(final)
+            if second_search:
+                per_query_ms[i] *= 2
+        if not g["topics"]:
+            off_topic += bool(final)
+            continue
+        if not final:
+            empty += 1
+            continue
+        ranks = [rank for rank, r in enumerate(final, 1) if r.get("topic") in g["topics"]]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1.0 / ranks[0]
+
+    n = max(len(answerable), 1)
+    return {
+        "recall": hits / n,
+        "mrr": reciprocal_ranks / n,
+        "fallback": fallbacks / len(gold),
+        "empty": empty / n,
+        "off_topic": off_topic / max(len(unanswerable), 1),
+        "p50": float(np.percentile(per_query_ms, 50)),
+        "p99": float(np.percentile(per_query_ms, 99)),
+    }
+
+
+def query_vectors(gold: List[Dict[str, Any]], cache_path: str, offline: bool) -> List[List[float]]:
+    texts = [g["query"] for g in gold]
+    if offline:
+        from benchmarks.fakes import hashing_embedding
+
+        return [hashing_embedding(text) for text in texts]
+    from Backend.embedding_client import BedrockEmbeddingClient
+    from benchmarks.matryoshka_eval import EmbeddingCache, embed_texts
+
+    return [list(v) for v in embed_texts(BedrockEmbeddingClient(), texts, 1024, EmbeddingCache(cache_path))]
+
+
+def mongo_client_for(offline: bool, manifest: str):
+    from Backend.mongodb_client import MongoDBClient
+
+    if not offline:
+        return MongoDBClient()
+    os.environ.setdefault("DB_NAME", "ai_shine_bench")
+    from benchmarks.fakes import FakeMongoClient
+    from benchmarks.pipeline_bench import kb_documents
+
+    documents, _ = kb_documents(manifest)
+    return MongoDBClient(client=FakeMongoClient(documents))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Recall@k / MRR / fallback rate vs latency of retrieval settings")
+    arg_parser.add_argument("--gold", default=DEFAULT_GOLD)
+    arg_parser.add_argument("--backends", nargs="+", default=["atlas", "local-none", "local-binary", "local-int8", "local-short"])
+    arg_parser.add_argument("--source", default="knowledge_base_chunk", choices=["knowledge_base_chunk", "knowledge_base"])
+    arg_parser.add_argument("--thresholds", nargs="+", default=["0.5:0.4", "0.55:0.45", "0.6:0.5"], help="main:lower tier pairs")
+    arg_parser.add_argument("--k", type=int, nargs="+", default=[3, 6, 10])
+    arg_parser.add_argument("--num-candidates", type=int, nargs="+", default=[5, 10, 20, 40], help="numCandidates per result (Atlas)")
+    arg_parser.add_argument("--snapshot", help="Local index snapshot (default: exported from the active collection)")
+    arg_parser.add_argument("--min-recall", type=float, default=0.9, help="Quality bar for the recommendation")
+    arg_parser.add_argument("--cache", default=os.path.join(REPO_ROOT, "benchmarks", ".titan_embeddings.npz"))
+    arg_parser.add_argument("--manifest", default=os.path.join(REPO_ROOT, "ingestion_manifest.json"))
+    arg_parser.add_argument("--offline", action="store_true", help="Hashed embeddings and an in-memory KB (no network)")
+    args = arg_parser.parse_args(argv)
+
+    gold = load_gold(args.gold)
+    thresholds = parse_thresholds(args.thresholds)
+    vectors = query_vectors(gold, args.cache, args.offline)
+    mongo_client = mongo_client_for(args.offline, args.manifest)
+
+    searchers: List[Searcher] = []
+    if "atlas" in args.backends:
+        searchers += atlas_searchers(mongo_client, args.source, args.num_candidates)
+    local_modes = [b.split("-", 1)[1] for b in args.backends if b.startswith("local-")]
+    tmp_dir = None
+    if local_modes:
+        snapshot = args.snapshot
+        if not snapshot:
+            tmp_dir = tempfile.TemporaryDirectory(prefix="retrieval_eval_")
+            snapshot = os.path.join(tmp_dir.name, "snapshot")
+            export_collection_snapshot(mongo_client, snapshot)
+        searchers += local_searchers(snapshot, args.source, local_modes)
+
+    answerable = sum(1 for g in gold if g["topics"])
+    print(f"{len(gold)} queries ({answerable} answerable) from {os.path.relpath(args.gold, REPO_ROOT)}, source={args.source}\n")
+    print(f"{'backend':<14} {'nCand':>5} {'k':>3} {'tiers':>10} {'recall':>7} {'MRR':>6} {'fallbk':>7} "
+          f"{'empty':>6} {'offtop':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    print("-" * 92)
+
+    rows = []
+    for name, factor, for_k in searchers:
+        for k in args.k:
+            results, latencies = run_searches(for_k(k), vectors)
+            for tiers in thresholds:
+                row = score_setting(gold, results, latencies, tiers, second_search=name.startswith("atlas"))
+                row.update({"backend": name, "factor": factor, "k": k, "tiers": tiers})
+                rows.append(row)
+                print(
+                    f"{name:<14} {factor if factor else '-':>5} {k:>3} {f'{tiers[0]}/{tiers[1]}':>10} "
+                    f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['fallback']:>7.3f} {row['empty']:>6.3f} "
+                    f"{row['off_topic']:>7.3f} {row['p50']:>8.2f} {row['p99']:>8.2f}"
+                )
+
+    qualifying = [r for r in rows if r["recall"] >= args.min_recall]
+    if qualifying:
+        # Cheapest: lowest p50, then fewer results (smaller prompts), then fewer off-topic answers
+        best = min(qualifying, key=lambda r: (round(r["p50"], 1), r["k"], r["off_topic"]))
+        candidates = f" numCandidates={best['factor']}x" if best["factor"] else ""
+        print(
+            f"\nCheapest setting with recall@k >= {args.min_recall}: {best['backend']}{candidates}"
+            f" k={best['k']} thresholds={best['tiers'][0]}/{best['tiers'][1]} "
+            f"(recall {best['recall']:.3f}, MRR {best['mrr']:.3f}, p50 {best['p50']:.2f} ms)"
+        )
+    else:
+        print(f"\nNo setting reaches recall@k >= {args.min_recall}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+    mongo_client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""
+Local Vector Search Benchmark
+Recall@k and latency of two-stage quantized search (binary / int8 prefilter + float32
+rerank) against exact float32 search in LocalVectorIndex.
+
+The default corpus is synthetic: clustered unit vectors shaped like Titan embeddings, with
+queries drawn near corpus points. --from-mongo benchmarks the active collection's vectors
+instead, --snapshot an exported local index snapshot (no network).
+
+Usage:
+    python -m benchmarks.vector_search_bench
+    python -m benchmarks.vector_search_bench --sizes 20000 100000 --factors 4 10 30
+    python -m benchmarks.vector_search_bench --from-mongo
+    python -m benchmarks.vector_search_bench --snapshot vector_snapshot
+"""
+import time
+import argparse
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from Backend.local_vector_index import LocalVectorIndex
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def synthetic_corpus(n: int, dim: int, queries: int, seed: int = 7) -> Tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors and nearby queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 50), dim)).astype(np.float32)
+    corpus = centers[rng.integers(0, centers.shape[0], n)] + 0.9 * rng.normal(size=(n, dim)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    picks = corpus[rng.integers(0, n, queries)]
+    # Noise of norm ~0.8 puts a query at cosine ~0.75 to its source point, the score range
+    # of a good Titan query/passage match
+    query_set = picks + 0.8 * rng.normal(size=picks.shape).astype(np.float32) / np.sqrt(dim)
+    query_set /= np.linalg.norm(query_set, axis=1, keepdims=True)
+    return corpus, query_set.astype(np.float32)
+
+
+def mongo_corpus(queries: int, seed: int = 7, snapshot: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectors of the active collection (or a snapshot); queries are perturbed corpus vectors."""
+    if snapshot:
+        index = LocalVectorIndex(None, prefilter="none")
+        index.load_snapshot(snapshot)
+    else:
+        from Backend.mongodb_client import MongoDBClient
+
+        mongo_client = MongoDBClient()
+        index = LocalVectorIndex(mongo_client, prefilter="none")
+        index.load()
+        mongo_client.close()
+    corpus = np.asarray(index._state["matrix"])
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, corpus.shape[0], queries)]
+    query_set = picks + 0.02 * rng.normal(size=picks.shape).astype(np.float32)
+    query_set /= np.linalg.norm(query_set, axis=1, keepdims=True)
+    return corpus, query_set.astype(np.float32)
+
+
+def build_index(corpus: np.ndarray, prefilter: str, factor: int) -> LocalVectorIndex:
+    index = LocalVectorIndex(None, prefilter=prefilter, rerank_factor=factor, min_prefilter_rows=0)
+    documents = [{"source": "knowledge_base_chunk"} for _ in range(corpus.shape[0])]
+    index.build(documents, list(corpus))
+    return index
+
+
+def run_queries(index: LocalVectorIndex, queries: np.ndarray, k: int) -> Tuple[List[np.ndarray], float]:
+    """Top-k row ids per query and mean latency in ms (index.top_k, no result dict building)."""
+    state = index._state
+    block = slice(0, state["matrix"].shape[0])
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        top, _ = index.top_k(state, block, q, k)
+        results.append(top)
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def recall(exact: List[np.ndarray], approx: List[np.ndarray], k: int) -> float:
+    return float(np.mean([len(set(e[:k].tolist()) & set(a[:k].tolist())) / k for e, a in zip(exact, approx)]))
+
+
+def bench_corpus(corpus: np.ndarray, queries: np.ndarray, k: int, factors: List[int]) -> List[Dict[str, object]]:
+    exact_index = build_index(corpus, "none", 1)
+    exact, exact_ms = run_queries(exact_index, queries, k)
+    rows = [{"mode": "exact float32", "factor": "-", "recall": 1.0, "ms": exact_ms,
+             "bytes": exact_index._state["matrix"].nbytes}]
+    for prefilter in ("binary", "int8"):
+        for factor in factors:
+            index = build_index(corpus, prefilter, factor)
+            approx, ms = run_queries(index, queries, k)
+            rows.append({"mode": f"{prefilter} + rerank", "factor": factor, "recall": recall(exact, approx, k),
+                         "ms": ms, "bytes": index._state["codes"].nbytes})
+    return rows
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Recall@k vs latency of quantized local vector search")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 100000])
+    arg_parser.add_argument("--dim", type=int, default=1024)
+    arg_parser.add_argument("--queries", type=int, default=100)
+    arg_parser.add_argument("--k", type=int, default=3)
+    arg_parser.add_argument("--factors", type=int, nargs="+", default=[4, 10, 30])
+    arg_parser.add_argument("--from-mongo", action="store_true", help="Use the active collection's vectors")
+    arg_parser.add_argument("--snapshot", help="Use the vectors of an exported local index snapshot")
+    args = arg_parser.parse_args(argv)
+
+    corpora = (
+        [(args.snapshot or "mongo", *mongo_corpus(args.queries, snapshot=args.snapshot))]
+        if args.from_mongo or args.snapshot
+        else [(f"synthetic n={n}", *synthetic_corpus(n, args.dim, args.queries)) for n in args.sizes]
+    )
+
+    for name, corpus, queries in corpora:
+        print(f"\n{name} ({corpus.shape[0]} x {corpus.shape[1]}, {args.queries} queries, recall@{args.k})")
+        print(f"{'mode':<18} {'factor':>6} {'recall':>8} {'ms/query':>10} {'scan MB':>9}")
+        print("-" * 55)
+        for row in bench_corpus(corpus, queries, args.k, args.factors):
+            print(f"{row['mode']:<18} {row['factor']:>6} {row['recall']:>8.3f} {row['ms']:>10.3f} {row['bytes'] / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
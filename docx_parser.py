@@ -1,30 +1,199 @@
 """
 DOCX Parser for Knowledge Base
 Extracts structured content from MODULE-1_KB.docx and converts to JSON format.
+Streams word/document.xml paragraph by paragraph and yields topics as they close,
+so large modules never need to be fully resident; JSON-Lines output is written incrementally.
+
+Usage: python docx_parser.py --docx "MODULE-1 KB.docx" --enhanced-kb Enhanced_Module1_KB.json \
+           --output Parsed_Module1_KB.json --module-name module1_kb
 """
 import os
 import re
 import json
 import logging
-from typing import List, Dict, Any
-from docx import Document
+import zipfile
+import argparse
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_NON_WORD = re.compile(r'[^\w\s]')
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_FALSE_VALUES = {"0", "false", "off"}
+
+
+class DocxRun:
+    """Text run with direct bold formatting (mirrors python-docx Run.text / Run.bold)."""
+    __slots__ = ("text", "bold")
+
+    def __init__(self, text: str, bold: Optional[bool]):
+        self.text = text
+        self.bold = bold
+
+
+class DocxParagraph:
+    """Body paragraph (mirrors python-docx Paragraph.text / Paragraph.runs)."""
+    __slots__ = ("text", "runs")
+
+    def __init__(self, runs: List[DocxRun], text: str):
+        self.runs = runs
+        self.text = text
+
+
+def _read_run(run: ET.Element) -> DocxRun:
+    parts = []
+    for child in run:
+        if child.tag == f"{_W}t":
+            parts.append(child.text or "")
+        elif child.tag == f"{_W}tab":
+            parts.append("\t")
+        elif child.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    bold = None
+    b = run.find(f"{_W}rPr/{_W}b")
+    if b is not None:
+        bold = b.get(f"{_W}val", "true").lower() not in _FALSE_VALUES
+    return DocxRun("".join(parts), bold)
+
+
+def iter_docx_paragraphs(docx_path: str) -> Iterator[DocxParagraph]:
+    """
+    Stream top-level body paragraphs from word/document.xml with iterparse.
+    Each paragraph is released as soon as it has been yielded (tables are skipped,
+    matching python-docx Document.paragraphs).
+    """
+    with zipfile.ZipFile(docx_path) as archive, archive.open("word/document.xml") as xml:
+        depth = 0
+        body = None
+        for event, elem in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if elem.tag == f"{_W}body":
+                    body = elem
+                continue
+            depth -= 1
+            # document(1) > body(2) > p(3)
+            if depth != 2 or body is None:
+                continue
+            if elem.tag == f"{_W}p":
+                runs, text_parts = [], []
+                for child in elem:
+                    if child.tag == f"{_W}r":
+                        run = _read_run(child)
+                        runs.append(run)
+                        text_parts.append(run.text)
+                    elif child.tag == f"{_W}hyperlink":
+                        # Hyperlinked runs count towards the text but are not direct runs
+                        text_parts.extend(_read_run(r).text for r in child.findall(f"{_W}r"))
+                yield DocxParagraph(runs, "".join(text_parts))
+            body.clear()
+
+
+def _clean_topic(text: str) -> str:
+    """Lowercase and strip punctuation (the form used for fuzzy topic comparison)."""
+    return _NON_WORD.sub('', text.lower())
+
+
+def _trie_pattern(strings: List[str]) -> str:
+    """
+    Build a regex from a character trie of `strings`, so one left-to-right scan tests
+    all of them at once (shared prefixes are matched once instead of per topic).
+    """
+    trie: Dict[str, Any] = {}
+    for s in strings:
+        node = trie
+        for ch in s:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def to_regex(node: Dict[str, Any]) -> str:
+        alternatives = [re.escape(ch) + to_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return to_regex(trie)
+
+
+class TopicMatcher:
+    """
+    Precompiled lookups over enhanced-KB topics, built once per parser:
+    - a trie regex answering "does this text contain any known topic?" in one scan
+    - cleaned topic strings, word sets and a word -> entries index for fuzzy matching
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        topics = list(dict.fromkeys(entry['topic'].lower() for entry in entries))
+        self._matches_everything = '' in topics
+        pattern = _trie_pattern([t for t in topics if t])
+        self._topic_regex = re.compile(pattern) if pattern else None
+
+        self._cleaned = [_clean_topic(entry['topic']) for entry in entries]
+        self._word_sets = [set(clean.split()) for clean in self._cleaned]
+        self._by_clean: Dict[str, int] = {}
+        self._word_index: Dict[str, List[int]] = {}
+        for idx, (clean, words) in enumerate(zip(self._cleaned, self._word_sets)):
+            self._by_clean.setdefault(clean, idx)
+            for word in words:
+                self._word_index.setdefault(word, []).append(idx)
+        self._cache: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def contains_topic(self, text: str) -> bool:
+        """True if any known topic occurs (case-insensitively) inside text."""
+        if self._matches_everything:
+            return True
+        return bool(self._topic_regex and self._topic_regex.search(text.lower()))
+
+    def find_entry(self, docx_topic: str) -> Optional[Dict[str, Any]]:
+        """
+        Enhanced-KB entry for a DOCX topic header: the first entry in KB order whose cleaned
+        topic equals or contains the header (or vice versa), or shares more than half of its words.
+        """
+        if docx_topic in self._cache:
+            return self._cache[docx_topic]
+
+        clean = _clean_topic(docx_topic)
+        # An exact match satisfies the substring rule, so no entry after it needs checking
+        match = self._by_clean.get(clean)
+        words = set(clean.split())
+        # Shared-word counts for every entry in one pass over the header's words
+        overlaps = Counter(idx for word in words for idx in self._word_index.get(word, ()))
+        for idx in range(match if match is not None else len(self._cleaned)):
+            entry_clean = self._cleaned[idx]
+            if entry_clean in clean or clean in entry_clean:
+                match = idx
+                break
+            overlap = overlaps.get(idx)
+            if overlap and overlap / min(len(words), len(self._word_sets[idx])) > 0.5:
+                match = idx
+                break
+
+        entry = self.entries[match] if match is not None else None
+        self._cache[docx_topic] = entry
+        return entry
+
 
 class DOCXParser:
     """Parse DOCX knowledge base into structured JSON chunks."""
     
-    def __init__(self, enhanced_kb_path: str):
+    def __init__(self, enhanced_kb_path: str, module_name: str = "module1_kb"):
         """
         Initialize parser with enhanced KB for keyword mapping.
         
         Args:
             enhanced_kb_path: Path to Enhanced_Module1_KB.json
+            module_name: Module name stamped on every parsed entry
         """
+        self.module_name = module_name
         self.enhanced_kb = self._load_enhanced_kb(enhanced_kb_path)
         self.topic_to_keywords = {item['topic']: item['keywords'] for item in self.enhanced_kb}
+        self.topic_matcher = TopicMatcher(self.enhanced_kb)
         logger.info(f"[PARSER] Loaded {len(self.enhanced_kb)} topic mappings")
     
     def _load_enhanced_kb(self, path: str) -> List[Dict[str, Any]]:
@@ -38,6 +207,55 @@ class DOCXParser:
             logger.error(f"[PARSER_ERR] Failed to load enhanced KB: {e}")
             return []
     
+    def iter_chunks(self, docx_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream structured KB entries, yielding each topic as soon as the next header closes it.
+        Unlike parse_docx, errors propagate so callers never mistake a partial parse for a full one.
+        
+        Args:
+            docx_path: Path to MODULE-1_KB.docx
+        
+        Yields:
+            Structured KB entries
+        """
+        logger.info(f"[PARSER] Parsing DOCX: {docx_path}")
+        
+        count = 0
+        current_topic = None
+        current_content = []
+        
+        for para in iter_docx_paragraphs(docx_path):
+            text = para.text.strip()
+            
+            if not text:
+                continue
+            
+            # Detect topic headers (typically bold or larger font)
+            if self._is_topic_header(para):
+                # Emit previous topic
+                if current_topic and current_content:
+                    chunk = self._create_chunk(current_topic, current_content)
+                    if chunk:
+                        count += 1
+                        yield chunk
+                
+                # Start new topic
+                current_topic = text
+                current_content = []
+                logger.info(f"[PARSER] Found topic: {current_topic}")
+            else:
+                # Accumulate content
+                current_content.append(text)
+        
+        # Emit last topic
+        if current_topic and current_content:
+            chunk = self._create_chunk(current_topic, current_content)
+            if chunk:
+                count += 1
+                yield chunk
+        
+        logger.info(f"[PARSER_OK] Parsed {count} chunks from DOCX")
+    
     def parse_docx(self, docx_path: str) -> List[Dict[str, Any]]:
         """
         Parse DOCX file into structured JSON chunks.
@@ -49,44 +267,7 @@ class DOCXParser:
             List of structured KB entries
         """
         try:
-            doc = Document(docx_path)
-            logger.info(f"[PARSER] Parsing DOCX: {docx_path}")
-            
-            chunks = []
-            current_topic = None
-            current_content = []
-            
-            for para in doc.paragraphs:
-                text = para.text.strip()
-                
-                if not text:
-                    continue
-                
-                # Detect topic headers (typically bold or larger font)
-                if self._is_topic_header(para):
-                    # Save previous topic
-                    if current_topic and current_content:
-                        chunk = self._create_chunk(current_topic, current_content)
-                        if chunk:
-                            chunks.append(chunk)
-                    
-                    # Start new topic
-                    current_topic = text
-                    current_content = []
-                    logger.info(f"[PARSER] Found topic: {current_topic}")
-                else:
-                    # Accumulate content
-                    current_content.append(text)
-            
-            # Save last topic
-            if current_topic and current_content:
-                chunk = self._create_chunk(current_topic, current_content)
-                if chunk:
-                    chunks.append(chunk)
-            
-            logger.info(f"[PARSER_OK] Parsed {len(chunks)} chunks from DOCX")
-            return chunks
-        
+            return list(self.iter_chunks(docx_path))
         except Exception as e:
             logger.error(f"[PARSER_ERR] Failed to parse DOCX: {e}")
             return []
@@ -100,22 +281,20 @@ class DOCXParser:
         - Font size > 12pt
         - Short length (< 150 chars)
         """
-        if not paragraph.text.strip():
+        text = paragraph.text.strip()
+        if not text:
             return False
         
-        # Check if any run is bold
-        has_bold = any(run.bold for run in paragraph.runs if run.text.strip())
-        
-        # Check length
-        is_short = len(paragraph.text.strip()) < 150
+        # Check length first: long paragraphs are never headers
+        if len(text) >= 150:
+            return False
         
-        # Check if matches known topics
-        matches_known_topic = any(
-            topic.lower() in paragraph.text.lower()
-            for topic in self.topic_to_keywords.keys()
-        )
+        # Check if any run is bold
+        if any(run.bold for run in paragraph.runs if run.text.strip()):
+            return True
         
-        return (has_bold or matches_known_topic) and is_short
+        # Check if matches known topics (single precompiled scan)
+        return self.topic_matcher.contains_topic(paragraph.text)
     
     def _create_chunk(self, topic: str, content: List[str]) -> Dict[str, Any]:
         """
@@ -132,11 +311,7 @@ class DOCXParser:
         full_content = "\n\n".join(content)
         
         # Find matching enhanced KB entry
-        enhanced_entry = None
-        for entry in self.enhanced_kb:
-            if self._topics_match(entry['topic'], topic):
-                enhanced_entry = entry
-                break
+        enhanced_entry = self.topic_matcher.find_entry(topic)
         
         if not enhanced_entry:
             logger.warning(f"[PARSER] No enhanced KB match for: {topic}")
@@ -159,36 +334,11 @@ class DOCXParser:
             "summary": enhanced_entry.get('summary', ''),
             "content": full_content,  # Full DOCX content
             "keywords": enhanced_entry.get('keywords', []),
-            "module_name": "module1_kb"
+            "module_name": self.module_name
         }
         
         return chunk
     
-    def _topics_match(self, enhanced_topic: str, docx_topic: str) -> bool:
-        """Check if topics match (fuzzy matching)."""
-        enhanced_clean = re.sub(r'[^\w\s]', '', enhanced_topic.lower())
-        docx_clean = re.sub(r'[^\w\s]', '', docx_topic.lower())
-        
-        # Exact match
-        if enhanced_clean == docx_clean:
-            return True
-        
-        # Substring match (one contains other)
-        if enhanced_clean in docx_clean or docx_clean in enhanced_clean:
-            return True
-        
-        # Word overlap (>50% words match)
-        enhanced_words = set(enhanced_clean.split())
-        docx_words = set(docx_clean.split())
-        
-        if not enhanced_words or not docx_words:
-            return False
-        
-        overlap = len(enhanced_words & docx_words)
-        min_words = min(len(enhanced_words), len(docx_words))
-        
-        return overlap / min_words > 0.5
-    
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract basic keywords from text (fallback)."""
         # Simple extraction: capitalized words and common AI terms
@@ -203,18 +353,70 @@ class DOCXParser:
             logger.info(f"[PARSER] Saved {len(chunks)} chunks to {output_path}")
         except Exception as e:
             logger.error(f"[PARSER_ERR] Failed to save: {e}")
+    
+    def save_parsed_kb_jsonl(self, chunks: Iterable[Dict[str, Any]], output_path: str) -> int:
+        """
+        Stream chunks to a JSON-Lines file (one entry per line) as they are produced.
+        Written to a temporary file and moved into place only after the source is exhausted.
+        
+        Returns:
+            Number of entries written
+        """
+        count = 0
+        for _ in tee_jsonl(chunks, output_path):
+            count += 1
+        logger.info(f"[PARSER] Saved {count} chunks to {output_path}")
+        return count
 
 
-def main():
+def tee_jsonl(entries: Iterable[Dict[str, Any]], output_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Pass entries through while appending each one to a JSON-Lines file, so parsing can feed
+    ingestion and persist its output in the same pass. The file replaces output_path only
+    once the stream completes; a failed stream leaves the previous file untouched.
+    """
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            yield entry
+    os.replace(tmp_path, output_path)
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily read a JSON-Lines KB file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
     """Main execution: parse DOCX and save to JSON."""
-    # Paths
-    enhanced_kb_path = r"C:\Users\newbr\OneDrive\Desktop\AISHINEBE_CLAUDE\Enhanced_Module1_KB.json"
-    docx_path = r"C:\Users\newbr\OneDrive\Desktop\AISHINEBE_CLAUDE\MODULE-1 KB.docx"
-    output_path = "Parsed_Module1_KB.json"
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    arg_parser = argparse.ArgumentParser(description="Parse a KB DOCX into structured JSON")
+    arg_parser.add_argument("--docx", default=os.path.join(base_dir, "MODULE-1 KB.docx"))
+    arg_parser.add_argument("--enhanced-kb", default=os.path.join(base_dir, "Enhanced_Module1_KB.json"))
+    arg_parser.add_argument("--output", default="Parsed_Module1_KB.json")
+    arg_parser.add_argument("--module-name", default="module1_kb")
+    args = arg_parser.parse_args(argv)
+    output_path = args.output
     
     # Parse
-    parser = DOCXParser(enhanced_kb_path)
-    chunks = parser.parse_docx(docx_path)
+    parser = DOCXParser(args.enhanced_kb, module_name=args.module_name)
+    
+    if output_path.endswith(".jsonl"):
+        try:
+            count = parser.save_parsed_kb_jsonl(parser.iter_chunks(args.docx), output_path)
+        except Exception as e:
+            logger.error(f"\n❌ Parsing failed: {e}")
+            return
+        logger.info(f"\n✅ Successfully parsed {count} chunks")
+        logger.info(f"📄 Output saved to: {output_path}")
+        return
+    
+    chunks = parser.parse_docx(args.docx)
     
     if chunks:
         parser.save_parsed_kb(chunks, output_path)
@@ -2,64 +2,138 @@
 FastAPI Backend for AI Shine Tutor RAG Chatbot
 Now supports both original (regex-based) and LangChain-powered RAG engines.
 """
+import time
+
+_PROCESS_START = time.perf_counter()  # startup report: time from here until the API accepts requests
+
 import os
+import json
+import asyncio
 import logging
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+import threading
+from contextlib import asynccontextmanager, nullcontext
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from Backend.models import ChatRequest, ChatResponse
-from Backend.rag_engine import RAGEngine
-from Backend.langchain_rag_engine import LangChainRAGEngine
+from Backend.lazy_component import LazyComponent
+from Backend import log_config, metrics, profiling, warmup
 
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(name)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# JSON lines with request IDs, written off the request thread (LOG_FORMAT=text for local runs)
+log_config.configure_logging()
 logger = logging.getLogger(__name__)
 
-rag_engine = None
-langchain_rag_engine = None
+# Engines to build in background threads at startup (in parallel); any other engine is
+# built, with its SDK imports, on the first request to its endpoint
+PRELOAD_ENGINES = [e.strip() for e in os.getenv("PRELOAD_ENGINES", "rag,langchain").split(",") if e.strip()]
 
+startup_report = {}
+warmup_report = {}
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Application lifespan manager."""
-    global rag_engine, langchain_rag_engine
+# The request trace ("debug": true) exposes retrieval internals (topics, scores, cache state), so
+# it is returned only with the profiling admin token (X-Admin-Token). Set to true to return it to
+# any client (local development only).
+DEBUG_TRACE_ENABLED = os.getenv("DEBUG_TRACE_ENABLED", "false").lower() == "true"
+
+# Opt-in capture of incoming chat requests (JSON Lines) for benchmarks/load_replay.py.
+# Payloads contain student messages: enable only for a session you intend to replay.
+CAPTURE_REQUESTS_PATH = os.getenv("CAPTURE_REQUESTS_PATH", "")
+_capture_lock = threading.Lock()
+
+
+def connect_mongo():
+    """One Atlas connection pool shared by both engines (one ping instead of one per engine)."""
+    from Backend.mongodb_client import create_mongo_client
     
-    logger.info("[STARTUP] Initializing RAG Engines...")
+    uri = os.getenv("MONGO_DB_URI")
+    if not uri:
+        raise ValueError("[MONGO_ERR] MONGO_DB_URI not set in environment")
+    return create_mongo_client(uri)
+
+
+def build_rag_engine():
+    from Backend.mongodb_client import MongoDBClient
+    from Backend.rag_engine import RAGEngine
+    from Backend.rag_retriever import RAGRetriever
     
-    # Initialize original RAG engine (backup)
-    try:
-        rag_engine = RAGEngine()
-        logger.info("[STARTUP] ✅ Original RAG Engine ready")
-    except Exception as e:
-        logger.error(f"[STARTUP] ❌ Failed to initialize original RAG Engine: {e}")
-        # Don't raise - allow LangChain to work even if original fails
+    retriever = RAGRetriever(mongo_client=MongoDBClient(client=shared_mongo.get()))
+    return RAGEngine(retriever=retriever)
+
+
+def build_langchain_engine():
+    from Backend.langchain_rag_engine import LangChainRAGEngine
+    from Backend.langchain_retriever import LangChainMongoRetriever
     
-    # Initialize LangChain RAG engine
-    try:
-        langchain_rag_engine = LangChainRAGEngine()
-        logger.info("[STARTUP] ✅ LangChain RAG Engine ready")
-    except Exception as e:
-        logger.error(f"[STARTUP] ❌ Failed to initialize LangChain RAG Engine: {e}")
-        # If LangChain fails but original works, we can still serve requests
-        if not rag_engine:
-            raise  # Both engines failed, can't serve
+    return LangChainRAGEngine(retriever=LangChainMongoRetriever(mongo_client=shared_mongo.get()))
+
+
+shared_mongo = LazyComponent("MongoDB connection", connect_mongo)
+engines = {
+    "rag": LazyComponent("Original RAG Engine", build_rag_engine),
+    "langchain": LazyComponent("LangChain RAG Engine", build_langchain_engine),
+}
+WARMUPS = {"rag": warmup.warm_up_rag_engine, "langchain": warmup.warm_up_langchain_engine}
+
+
+def warm_up(name: str):
+    """on_ready hook of a preloaded engine: warm it in its build thread (see Backend.warmup)."""
+    def run(engine):
+        warmup_report[name] = {"status": "running"}
+        try:
+            warmup_report[name] = {"status": "done", **WARMUPS[name](engine)}
+        except Exception as e:
+            logger.error(f"[WARMUP] ❌ {name} warm-up failed: {e}")
+            warmup_report[name] = {"status": "failed", "error": str(e)}
+    return run
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan manager: engines build in the background, the API is up at once."""
+    for name in PRELOAD_ENGINES:
+        if name in engines:
+            engines[name].start_background(on_ready=warm_up(name) if warmup.WARMUP_ENABLED else None)
+    
+    startup_report["ready_seconds"] = round(time.perf_counter() - _PROCESS_START, 3)
+    startup_report["preloading"] = [name for name in PRELOAD_ENGINES if name in engines]
+    logger.info(
+        f"[STARTUP] ✅ API ready in {startup_report['ready_seconds']:.2f}s "
+        f"(building in background: {', '.join(startup_report['preloading']) or 'none'})"
+    )
     
     yield
     
     logger.info("[SHUTDOWN] Closing connections...")
-    if rag_engine:
-        rag_engine.cleanup()
-    if langchain_rag_engine:
-        langchain_rag_engine.cleanup()
+    for component in engines.values():
+        engine = component.peek()
+        if engine:
+            engine.cleanup()
+    if shared_mongo.peek():
+        shared_mongo.peek().close()
     logger.info("[SHUTDOWN] ✅ Shutdown complete")
 
 
+async def get_engine(name: str, label: str):
+    """
+    The named engine, built on first use; waits off the event loop for a build in progress.
+    
+    Args:
+        name: Key in `engines`
+        label: Engine name for the 503 detail
+    
+    Returns:
+        The engine (raises HTTPException 503 if it cannot be built)
+    """
+    try:
+        return await asyncio.to_thread(engines[name].get)
+    except Exception as e:
+        logger.error(f"[ENGINE_ERR] {label} not available: {e}")
+        raise HTTPException(status_code=503, detail=f"{label} unavailable")
+
+
 app = FastAPI(
     title="AI Shine Tutor API",
     description="RAG-powered AI/ML tutor with domain-specific knowledge",
@@ -73,9 +147,83 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-ID", "X-Request-ID"],
 )
 
 
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    """Tag the request's log records (and profile) with its ID, returned in X-Request-ID."""
+    request_id = log_config.bind_request_id(request.headers.get("x-request-id"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def traced_response(result: dict, timer: metrics.RequestTimer, debug: bool, http_response: Response) -> ChatResponse:
+    """
+    ChatResponse for an engine result, with the request trace attached.
+    
+    Args:
+        result: Engine output with 'answer' and 'type'
+        timer: Trace the engine recorded into
+        debug: Whether to attach the debug payload (see debug_requested)
+        http_response: Response whose headers get Server-Timing
+    
+    Returns:
+        ChatResponse (debug payload only when requested and allowed, see debug_requested)
+    """
+    http_response.headers["Server-Timing"] = timer.server_timing()
+    # Browsers only expose Server-Timing of cross-origin responses with Timing-Allow-Origin
+    http_response.headers["Timing-Allow-Origin"] = "*"
+    return ChatResponse(
+        answer=result["answer"],
+        type=result["type"],
+        debug=timer.to_debug() if debug else None
+    )
+
+
+def debug_requested(request: ChatRequest, raw_request: Request) -> bool:
+    """True if the client asked for the request trace and may see it (admin token unless DEBUG_TRACE_ENABLED)."""
+    if not request.debug:
+        return False
+    if DEBUG_TRACE_ENABLED or profiling.is_authorized(raw_request.headers.get("x-admin-token")):
+        return True
+    logger.warning("[DEBUG] Ignoring \"debug\": true without the admin token")
+    return False
+
+
+def capture_request(endpoint: str, request: ChatRequest):
+    """Append one request to CAPTURE_REQUESTS_PATH (no-op when capture is off)."""
+    if not CAPTURE_REQUESTS_PATH:
+        return
+    record = {"ts": time.time(), "endpoint": endpoint, **request.model_dump(exclude_defaults=True)}
+    try:
+        with _capture_lock, open(CAPTURE_REQUESTS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        logger.warning(f"[CAPTURE] Could not record request: {e}")
+
+
+def profile_scope(raw_request: Request, label: str):
+    """
+    Profiler for this request if it asks for one with "X-Profile: 1".
+    
+    Args:
+        raw_request: Incoming request (X-Profile and X-Admin-Token headers)
+        label: Endpoint being profiled
+    
+    Returns:
+        Context manager yielding the profile's request ID, or None when not profiling
+    """
+    if raw_request.headers.get("x-profile", "").lower() not in ("1", "true"):
+        return nullcontext(None)
+    if not profiling.is_authorized(raw_request.headers.get("x-admin-token")):
+        logger.warning(f"[PROFILE] ❌ Rejected unauthorized profiling request on {label}")
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+    return profiling.profile_request(log_config.current_request_id() or log_config.bind_request_id(), label)
+
+
 @app.get("/")
 async def root():
     return {
@@ -83,21 +231,32 @@ async def root():
         "service": "AI Shine Tutor API",
         "version": "2.0.0",
         "engines": {
-            "original": "available" if rag_engine else "unavailable",
-            "langchain": "available" if langchain_rag_engine else "unavailable"
+            "original": "available" if engines["rag"].status != "failed" else "unavailable",
+            "langchain": "available" if engines["langchain"].status != "failed" else "unavailable"
         }
     }
 
 
+# /health engine states by LazyComponent status (engines build after the API is up)
+ENGINE_HEALTH = {"ready": "healthy", "building": "starting", "idle": "not_loaded", "failed": "unavailable"}
+
+
 @app.get("/health")
 async def health_check():
+    rag_engine = engines["rag"].peek()
+    langchain_rag_engine = engines["langchain"].peek()
     health_status = {
         "api": "healthy",
         "engines": {
-            "original": "healthy" if rag_engine else "unavailable",
-            "langchain": "healthy" if langchain_rag_engine else "unavailable"
+            "original": ENGINE_HEALTH[engines["rag"].status],
+            "langchain": ENGINE_HEALTH[engines["langchain"].status]
         },
-        "components": {}
+        "components": {},
+        "startup": {
+            **startup_report,
+            "components": {c.name: c.report() for c in (shared_mongo, *engines.values())},
+            "warmup": warmup_report
+        }
     }
     
     # Check original engine
@@ -117,16 +276,33 @@ async def health_check():
     return health_status
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms of both engines."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/profiles/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str, raw_request: Request):
+    """Text summary of a profile recorded with X-Profile (admin token required)."""
+    if not profiling.is_authorized(raw_request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+    summary = profiling.load_summary(request_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+
+@app.post("/chat", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat(request: ChatRequest, http_response: Response, raw_request: Request):
     """
     Original chat endpoint (regex-based RAG engine).
     Kept as backup during LangChain testing.
     """
-    if not rag_engine:
-        logger.error("[CHAT_ERR] Original RAG engine not initialized")
-        raise HTTPException(status_code=503, detail="Original RAG engine unavailable")
+    rag_engine = await get_engine("rag", "Original RAG engine")
     
+    capture_request("/chat", request)
     try:
         if not request.chat_history:
             logger.warning("[CHAT] Empty chat history")
@@ -144,19 +320,21 @@ async def chat(request: ChatRequest):
         if not current_query:
             raise HTTPException(status_code=400, detail="No user message")
         
-        logger.info(f"[CHAT] Processing (original): {current_query[:100]}...")
+        logger.info("[CHAT] Processing (original): %s...", current_query[:100])
         
-        response = rag_engine.process_query(
-            query=current_query,
-            chat_history=request.chat_history
-        )
+        timer = metrics.RequestTimer("rag")
+        with profile_scope(raw_request, "/chat") as profile_id:
+            response = rag_engine.process_query(
+                query=current_query,
+                chat_history=request.chat_history,
+                timer=timer
+            )
+        if profile_id:
+            http_response.headers["X-Profile-ID"] = profile_id
         
-        logger.info(f"[CHAT_OK] Response type: {response['type']}")
+        logger.info("[CHAT_OK] Response type: %s", response['type'])
         
-        return ChatResponse(
-            answer=response["answer"],
-            type=response["type"]
-        )
+        return traced_response(response, timer, debug_requested(request, raw_request), http_response)
     
     except HTTPException:
         raise
@@ -165,8 +343,8 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@app.post("/chat-v2", response_model=ChatResponse)
-async def chat_langchain(request: ChatRequest):
+@app.post("/chat-v2", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat_langchain(request: ChatRequest, http_response: Response, raw_request: Request):
     """
     LangChain-powered chat endpoint.
     Features:
@@ -175,10 +353,9 @@ async def chat_langchain(request: ChatRequest):
     - Fixes "be descriptive" bug
     - Natural continuation handling
     """
-    if not langchain_rag_engine:
-        logger.error("[CHAT_V2_ERR] LangChain RAG engine not initialized")
-        raise HTTPException(status_code=503, detail="LangChain RAG engine unavailable")
+    langchain_rag_engine = await get_engine("langchain", "LangChain RAG engine")
     
+    capture_request("/chat-v2", request)
     try:
         if not request.chat_history:
             logger.warning("[CHAT_V2] Empty chat history")
@@ -196,19 +373,21 @@ async def chat_langchain(request: ChatRequest):
         if not current_query:
             raise HTTPException(status_code=400, detail="No user message")
         
-        logger.info(f"[CHAT_V2] Processing (LangChain): {current_query[:100]}...")
+        logger.info("[CHAT_V2] Processing (LangChain): %s...", current_query[:100])
         
-        response = langchain_rag_engine.process_query(
-            query=current_query,
-            chat_history=request.chat_history
-        )
+        timer = metrics.RequestTimer("langchain")
+        with profile_scope(raw_request, "/chat-v2") as profile_id:
+            response = langchain_rag_engine.process_query(
+                query=current_query,
+                chat_history=request.chat_history,
+                timer=timer
+            )
+        if profile_id:
+            http_response.headers["X-Profile-ID"] = profile_id
         
-        logger.info(f"[CHAT_V2_OK] Response type: {response['type']}")
+        logger.info("[CHAT_V2_OK] Response type: %s", response['type'])
         
-        return ChatResponse(
-            answer=response["answer"],
-            type=response["type"]
-        )
+        return traced_response(response, timer, debug_requested(request, raw_request), http_response)
     
     except HTTPException:
         raise
@@ -0,0 +1,217 @@
+"""
+Local Vector Index Snapshot Tests
+Exports a snapshot from an in-memory MongoDB stand-in and checks that the memory-mapped
+round trip (LocalVectorIndex.load_snapshot / bootstrap / MappedDocuments) searches exactly
+like an index loaded from the collection, for every prefilter mode. No network needed.
+
+Run: python -m pytest -q test_local_index.py   (or python test_local_index.py)
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import numpy as np
+
+# The collection is an in-memory stand-in; no Atlas database is contacted
+os.environ.setdefault("DB_NAME", "ai_shine_test")
+
+from Backend.local_vector_index import (
+    PREFILTER_MODES, SNAPSHOT_META, LocalVectorIndex, MappedDocuments, export_collection_snapshot
+)
+from Backend.mongodb_client import MongoDBClient
+from Backend.text_splitter import split_passages
+from Backend.vector_codec import encode_vector
+from benchmarks.fakes import FakeMongoClient, hashing_embedding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Parsed_Module1_KB.json")
+SOURCES = ("knowledge_base", "knowledge_base_chunk")
+
+
+def kb_documents():
+    """Module 1 topics and their passages as KB documents with hashed embeddings."""
+    with open(KB_PATH, "r", encoding="utf-8") as f:
+        entries = [e for e in json.load(f) if e.get("content")]
+    documents = []
+    for entry in entries:
+        texts = [("knowledge_base", entry["content"])]
+        texts += [("knowledge_base_chunk", passage) for passage in split_passages(entry["content"])]
+        for source, text in texts:
+            documents.append({
+                "topic": entry["topic"],
+                "content": text,
+                "source": source,
+                "module_name": "module1_kb",
+                "level": "advanced" if len(documents) % 2 else "beginner",
+                "embedding": encode_vector(hashing_embedding(text), "float32")
+            })
+    return documents
+
+
+def mongo_client():
+    return MongoDBClient(client=FakeMongoClient(kb_documents()))
+
+
+def queries():
+    """Query vectors close to, but not equal to, stored ones."""
+    with open(KB_PATH, "r", encoding="utf-8") as f:
+        topics = [e["topic"] for e in json.load(f) if e.get("topic")]
+    return [hashing_embedding(f"Explain {topic} with examples") for topic in topics[:12]]
+
+
+def ids(results):
+    return [(r["topic"], r["content"][:40], round(r["score"], 5)) for r in results]
+
+
+def test_snapshot_round_trip_matches_collection():
+    """Every prefilter mode searches a mapped snapshot like an exact index loaded from the collection."""
+    client = mongo_client()
+    exact = LocalVectorIndex(client, prefilter="none")
+    assert exact.load()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert export_collection_snapshot(client, path)
+
+        for mode in PREFILTER_MODES:
+            # min_prefilter_rows=0 forces the two-stage path; a factor of 1000 shortlists every row
+            for rerank_factor, must_match in ((1000, True), (10, False)):
+                mapped = LocalVectorIndex(None, prefilter=mode, rerank_factor=rerank_factor, min_prefilter_rows=0)
+                assert mapped.load_snapshot(path), mode
+                assert isinstance(mapped._state["matrix"], np.memmap)
+                assert isinstance(mapped._state["documents"], MappedDocuments)
+                assert mapped.version == exact.version
+
+                for query in queries():
+                    for source in (None,) + SOURCES:
+                        expected = exact.search(query, limit=3, similarity_threshold=0.45, source=source)
+                        got = mapped.search(query, limit=3, similarity_threshold=0.45, source=source)
+                        assert all(r["source"] == source for r in got if source)
+                        if must_match:
+                            assert ids(got) == ids(expected), (mode, source)
+                        else:
+                            # A real shortlist may miss rows, but what it returns is exactly scored
+                            assert got and got[0]["score"] <= expected[0]["score"] + 1e-6, (mode, source)
+
+
+def test_snapshot_metadata_filters():
+    client = mongo_client()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert export_collection_snapshot(client, path)
+        index = LocalVectorIndex(None, prefilter="none")
+        assert index.load_snapshot(path)
+        results = index.search(queries()[0], limit=10, similarity_threshold=0.0, metadata_filters={"level": "advanced"})
+        assert results and all(r["level"] == "advanced" for r in results)
+        assert index.search(queries()[0], source="presentation") == []
+
+
+def test_native_short_vectors_round_trip():
+    """Native first-pass vectors are exported next to the full ones and used with prefilter="short"."""
+    documents = kb_documents()
+    vectors = [doc.pop("embedding") for doc in documents]
+    short = [encode_vector(hashing_embedding(doc["content"], 256), "float32") for doc in documents]
+    built = LocalVectorIndex(None, prefilter="short", min_prefilter_rows=0, rerank_factor=1000)
+    built.build(documents, vectors, version=3, short_vectors=short)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert built.export_snapshot(path)
+        mapped = LocalVectorIndex(None, prefilter="short", min_prefilter_rows=0, rerank_factor=1000)
+        assert mapped.load_snapshot(path)
+        assert mapped._state["short_native"] and mapped._state["codes"].shape[1] == 256
+        assert mapped.version == 3
+        for text in ("What is machine learning?", "How do I write a better prompt?"):
+            query, short_query = hashing_embedding(text), hashing_embedding(text, 256)
+            assert ids(mapped.search(query, 3, 0.45, short_query_embedding=short_query)) == ids(
+                built.search(query, 3, 0.45, short_query_embedding=short_query)
+            )
+
+
+def test_mapped_documents():
+    client = mongo_client()
+    index = LocalVectorIndex(client, prefilter="none")
+    assert index.load()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert index.export_snapshot(path)
+        mapped = LocalVectorIndex(None)
+        assert mapped.load_snapshot(path)
+        documents = mapped._state["documents"]
+        assert len(documents) == len(index._state["documents"])
+        assert documents[0] == index._state["documents"][0]
+        assert documents[-1] == index._state["documents"][-1]
+        assert documents[2:5] == index._state["documents"][2:5]
+        assert "embedding" not in documents[0]
+
+
+def test_unusable_snapshot_is_rejected():
+    client = mongo_client()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert export_collection_snapshot(client, path)
+        meta_path = os.path.join(path, SNAPSHOT_META)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["count"] += 1
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        index = LocalVectorIndex(None)
+        assert not index.load_snapshot(path)
+        assert not index.ready
+
+
+def test_bootstrap_from_snapshot():
+    """
+    --snapshot / LOCAL_INDEX_SNAPSHOT path: a snapshot of the active version is served as is;
+    one of another version serves immediately and is replaced by a background reload;
+    without a snapshot the index loads from the collection.
+    """
+    client = mongo_client()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        assert export_collection_snapshot(client, path)
+
+        current = LocalVectorIndex(client)
+        assert current.bootstrap(path)
+        assert isinstance(current._state["documents"], MappedDocuments)
+        assert current.version == client.collection_version
+
+        stale_path = os.path.join(tmp, "stale")
+        assert export_collection_snapshot(client, stale_path, version=client.collection_version + 7)
+        stale = LocalVectorIndex(client)
+        assert stale.bootstrap(stale_path)
+        deadline = time.monotonic() + 30
+        while stale.version != client.collection_version and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert stale.version == client.collection_version
+        assert isinstance(stale._state["documents"], list)
+
+        missing = LocalVectorIndex(client)
+        assert missing.bootstrap(os.path.join(tmp, "does-not-exist"))
+        assert isinstance(missing._state["documents"], list)
+
+        offline = LocalVectorIndex(None)
+        assert not offline.bootstrap(os.path.join(tmp, "does-not-exist"))
+
+
+def run_all_tests():
+    """Run all test cases."""
+    for test in (
+        test_snapshot_round_trip_matches_collection,
+        test_snapshot_metadata_filters,
+        test_native_short_vectors_round_trip,
+        test_mapped_documents,
+        test_unusable_snapshot_is_rejected,
+        test_bootstrap_from_snapshot,
+    ):
+        test()
+        logger.info(f"✅ {test.__name__}")
+    logger.info("✅ ALL LOCAL INDEX TESTS PASSED")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -133,6 +133,8 @@ from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import json
+from Backend.collection_versions import resolve_active
+from Backend.vector_codec import decode_vector
 
 load_dotenv()
 
@@ -143,8 +145,10 @@ print("="*60)
 print("MONGODB STRUCTURE ANALYSIS")
 print("="*60)
 
-# Collection stats
-coll = db["module_vectors"]
+# Collection stats (the version the alias currently serves)
+active, version = resolve_active(db)
+print(f"\nActive collection: {active} (v{version})")
+coll = db[active]
 total = coll.count_documents({})
 pres_count = coll.count_documents({"source": "presentation"})
 kb_count = coll.count_documents({"source": "knowledge_base"})
@@ -164,7 +168,7 @@ if pres:
     print(f"Keywords (first 5): {pres.get('keywords', [])[:5]}")
     print(f"Has embedding: {'embedding' in pres}")
     if 'embedding' in pres:
-        print(f"Embedding dimension: {len(pres['embedding'])}")
+        print(f"Embedding dimension: {decode_vector(pres['embedding']).shape[0]}")
 
 # Sample KB doc
 print("\n" + "="*60)
@@ -177,7 +181,7 @@ if kb:
     print(f"Keywords (first 5): {kb.get('keywords', [])[:5]}")
     print(f"Has embedding: {'embedding' in kb}")
     if 'embedding' in kb:
-        print(f"Embedding dimension: {len(kb['embedding'])}")
+        print(f"Embedding dimension: {decode_vector(kb['embedding']).shape[0]}")
     print(f"\nContent preview (first 200 chars):")
     print(kb.get('content', '')[:200])
 